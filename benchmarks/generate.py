@@ -0,0 +1,124 @@
+# Генератор синтетических протоколов РКОТ для замеров производительности.
+# Книга повторяет структуру настоящего протокола: 16 строк шапки, строка заголовка таблицы,
+# строка названий операторов и строки показателей, сгруппированные по разделам. Для получения
+# нужного количества строк разделы повторяются (каждое повторение - отдельный маршрут измерений).
+# Значения случайные, но воспроизводимые (--seed); часть значений записывается текстом с десятичной
+# запятой, знаком процента или отметкой отсутствия значения, как это встречается в протоколах.
+# Формат xlsx (лист не может содержать больше MAX_ROWS строк).
+#   python benchmarks/generate.py <файл.xlsx> [--rows N] [--operators N] [--seed N]
+import argparse
+import random
+import sys
+
+MAX_ROWS = 1048576   # Предельное количество строк листа xlsx
+HEADER_ROW = 16      # Номер строки заголовка таблицы (с нуля), как в rkot.ingest.EXCEL_HEADER_ROW
+OPERATORS = ["Beeline", "MegaFon RUS", "MTS-RUS", "TELE2", "Yota", "Tinkoff", "SberMobile", "Motiv"]
+
+# Шапка протокола (строки до заголовка таблицы, None - пустая строка)
+PREAMBLE = [
+    "Приложение № 1 к Отчету",
+    None,
+    "ФЕДЕРАЛЬНАЯ СЛУЖБА ПО НАДЗОРУ В СФЕРЕ СВЯЗИ, ИНФОРМАЦИОННЫХ ТЕХНОЛОГИЙ",
+    "И МАССОВЫХ КОММУНИКАЦИЙ",
+    "ФЕДЕРАЛЬНОЕ ГОСУДАРСТВЕННОЕ УНИТАРНОЕ ПРЕДПРИЯТИЕ",
+    "ГЛАВНЫЙ РАДИОЧАСТОТНЫЙ ЦЕНТР",
+    "(ФГУП «ГРЧЦ»)",
+    "ФИЛИАЛ ФГУП «ГРЧЦ» В УРАЛЬСКОМ ФЕДЕРАЛЬНОМ ОКРУГЕ",
+    None,
+    "ПРОТОКОЛ КОНТРОЛЯ ПАРАМЕТРОВ КАЧЕСТВА УСЛУГ ПОДВИЖНОЙ РАДИОТЕЛЕФОННОЙ СВЯЗИ (синтетический)",
+    None,
+    "Объект контроля: операторы подвижной радиотелефонной связи",
+    "Время проведения контроля:  с 03.06.2019 по 23.07.2019",
+    "Место проведения контроля: г. Екатеринбург",
+    "Условия проведения контроля: нормальные условия",
+    "Измерительное оборудование: Радиоизмерительный комплекс TEMS Automatic",
+]
+
+# Разделы протокола: название раздела и показатели (название, требование, диапазон значений)
+SECTIONS = [
+    ("Показатели качества услуг подвижной радиотелефонной связи в части голосового соединения", [
+        ("Доля неуспешных попыток установления голосового соединения (Voice Service Non-Acessibility) [%]",
+         "не более 5", (0, 5)),
+        ("Доля обрывов голосовых соединений (Voice Service Cut-off Ratio) [%]", "не более 5", (0, 5)),
+        ("Средняя разборчивость речи на соединение (Speech Quality on Call basis (MOS POLQA))",
+         "не менее 2,6", (2.5, 4.5)),
+    ]),
+    ("Показатели качества услуг подвижной радиотелефонной связи в части передачи коротких текстовых сообщений", [
+        ("Доля недоставленных SMS сообщений [%]", None, (0, 10)),
+        ("Среднее время доставки SMS сообщений [сек]", None, (1, 20)),
+    ]),
+    ("Показатели качества услуг связи по передаче данных", [
+        ("Доля неуспешных сессий по протоколу HTTP (HTTP Session Failure Ratio) [%]", None, (0, 10)),
+        ("Среднее значение скорости передачи данных к абоненту (HTTP DL Mean User Data Rate) [kbit/sec]",
+         "не менее 80", (1000, 50000)),
+        ("Продолжительность успешной сессии (HTTP Session Time) [s]", None, (1, 30)),
+    ]),
+    ("Справочная информация", [
+        ("Общее количество тестовых голосовых соединений", None, None),
+        ("Общее количество отправленных SMS - сообщений", None, None),
+    ]),
+]
+
+# Функция для получения случайного значения показателя в том виде, в каком оно бывает в протоколах
+def cell_value(rng, value_range):
+    if value_range is None:
+        return rng.randint(100, 10000) # Количество - целое число
+    value = rng.uniform(*value_range)
+    kind = rng.random()
+    if kind < 0.01:
+        return "-" # Значение отсутствует
+    if kind < 0.03:
+        return f"{value:.2f}%".replace(".", ",")
+    if kind < 0.08:
+        return f"{value:.3f}".replace(".", ",")
+    return value
+
+# Функция для получения строк таблицы измерений: строка названий операторов, затем разделы
+def table_rows(rows, operators, rng):
+    yield [SECTIONS[0][0], None] + operators
+    written, route = 1, 1
+    while True:
+        for title, parameters in SECTIONS:
+            if written >= rows:
+                return
+            yield [f"{title} (маршрут {route})", None] + [None] * len(operators) # Строка названия раздела
+            written += 1
+            for name, requirement, value_range in parameters:
+                if written >= rows:
+                    return
+                yield [name, requirement] + [cell_value(rng, value_range) for _ in operators]
+                written += 1
+        route += 1
+
+# Функция для записи синтетического протокола с заданным количеством строк таблицы измерений.
+# Возвращает количество записанных строк таблицы
+def generate_protocol(path, rows=1000, operators=4, seed=1):
+    import openpyxl
+
+    rows = min(rows, MAX_ROWS - HEADER_ROW - 1)
+    operators = OPERATORS[:operators]
+    rng = random.Random(seed)
+    book = openpyxl.Workbook(write_only=True) # Строки записываются в файл по мере добавления
+    sheet = book.create_sheet("Протокол")
+    for line in PREAMBLE:
+        sheet.append([line if line is not None else ""])
+    sheet.append(["Параметры качества", "Требования к граничным значениям "] + ["Значение"] * len(operators))
+    for row in table_rows(rows, operators, rng):
+        sheet.append(row)
+    book.save(path)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор синтетических протоколов РКОТ")
+    parser.add_argument("output", help="путь к создаваемому файлу .xlsx")
+    parser.add_argument("--rows", type=int, default=1000, help=f"количество строк таблицы (не более {MAX_ROWS - HEADER_ROW - 1})")
+    parser.add_argument("--operators", type=int, default=4, choices=range(1, len(OPERATORS) + 1),
+                        help="количество операторов связи")
+    parser.add_argument("--seed", type=int, default=1, help="начальное значение генератора случайных чисел")
+    args = parser.parse_args(argv)
+    rows = generate_protocol(args.output, args.rows, args.operators, args.seed)
+    print(f"Записано строк: {rows} в {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
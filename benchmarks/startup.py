@@ -0,0 +1,125 @@
+# Замер времени запуска СПО РКОТ:
+#   - время импорта main.py по данным "python -X importtime" и самые долгие импорты верхнего уровня;
+#   - время от запуска процесса до первой отрисовки главного окна.
+# Каждый замер выполняется в новом процессе --runs раз, выводятся медиана и минимум.
+# По умолчанию используется пустая временная папка данных, --data задает папку с реестром отчетов.
+# Окно отрисовывается без вывода на экран (QT_QPA_PLATFORM=offscreen), если платформа Qt не задана явно.
+#   python benchmarks/startup.py [--runs 5] [--data <папка с БД>] [--json <файл результатов>]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Программа, запускающая приложение и завершающая его сразу после первой отрисовки главного окна
+FIRST_PAINT_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication
+import main
+
+paint_event = main.MainWindow.paintEvent
+
+def first_paint(self, event):
+    paint_event(self, event)
+    main.MainWindow.paintEvent = paint_event
+    print("painted", flush=True)
+    QTimer.singleShot(0, QApplication.quit)
+
+main.MainWindow.paintEvent = first_paint
+sys.exit(main.run(sys.argv[:1]))
+"""
+
+# Функция для замера времени импорта main.py. Возвращает (общее время в мс, {модуль: время в мс})
+# для модулей, импортируемых непосредственно из main.py
+def measure_import(env):
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    # Вложенные импорты выводятся перед импортом, в котором они выполнены, вложенность обозначается
+    # отступом имени модуля: импорты из main.py - строки с отступом 3 перед строкой " main"
+    total, children = 0.0, {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue # Строка заголовка
+        depth = len(name) - len(name.lstrip())
+        milliseconds = int(cumulative) / 1000
+        if depth == 3:
+            children[name.strip()] = milliseconds
+        elif depth == 1:
+            if name.strip() == "main":
+                return milliseconds, children
+            children = {}
+    return total, children
+
+# Функция для замера времени от запуска процесса до первой отрисовки главного окна в мс
+def measure_first_paint(env):
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", FIRST_PAINT_SCRIPT.format(root=ROOT)], cwd=ROOT, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in process.stdout:
+            if line.strip() == "painted":
+                return (time.perf_counter() - started) * 1000
+        raise RuntimeError("Главное окно не было отрисовано")
+    finally:
+        process.wait(timeout=60)
+
+# Функция для получения медианы и минимума серии замеров
+def describe(values):
+    return {"median": round(statistics.median(values), 1), "min": round(min(values), 1)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер времени запуска СПО РКОТ")
+    parser.add_argument("--runs", type=int, default=5, help="количество запусков каждого замера")
+    parser.add_argument("--data", help="папка с реестром отчетов (по умолчанию пустая временная папка)")
+    parser.add_argument("--top", type=int, default=10, help="количество выводимых самых долгих импортов")
+    parser.add_argument("--json", help="файл для записи результатов в формате JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        env = dict(os.environ, RKOT_DATA_DIR=os.path.abspath(args.data) if args.data else temp_folder)
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+        measure_first_paint(env) # Прогрев: создание реестра и кэшей байт-кода
+        interpreter, imports, paints, modules = [], [], [], {}
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+            interpreter.append((time.perf_counter() - started) * 1000)
+            total, run_modules = measure_import(env)
+            imports.append(total)
+            for name, milliseconds in run_modules.items():
+                modules.setdefault(name, []).append(milliseconds)
+            paints.append(measure_first_paint(env))
+
+    results = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "interpreter_ms": describe(interpreter),
+        "import_main_ms": describe(imports),
+        "first_paint_ms": describe(paints),
+        "top_imports_ms": dict(sorted(((name, round(statistics.median(values), 1)) for name, values in modules.items()),
+                                      key=lambda item: item[1], reverse=True)[:args.top]),
+    }
+    print(f"Запуск интерпретатора:      {results['interpreter_ms']['median']:8.1f} мс (мин. {results['interpreter_ms']['min']:.1f})")
+    print(f"Импорт main.py:             {results['import_main_ms']['median']:8.1f} мс (мин. {results['import_main_ms']['min']:.1f})")
+    print(f"До первой отрисовки окна:   {results['first_paint_ms']['median']:8.1f} мс (мин. {results['first_paint_ms']['min']:.1f})")
+    print("Самые долгие импорты из main.py:")
+    for name, milliseconds in results["top_imports_ms"].items():
+        print(f"  {name:<40} {milliseconds:8.1f} мс")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# Набор замеров производительности СПО РКОТ на синтетических протоколах (см. generate.py):
+#   generate      - создание протокола с --rows строками;
+#   import        - загрузка протокола в БД отчета (rkot.ingest.import_file), строк в секунду;
+#   register      - добавление отчета в реестр с индексацией для поиска и сводки;
+#   reimport      - повторная загрузка того же протокола из кэша;
+#   index         - индексация реестра из --reports отчетов для поиска;
+#   registry_load - создание и отображение главного окна с реестром;
+#   open_viewer   - открытие окна просмотра большого отчета;
+#   save          - сохранение отчета после изменения --edits ячеек;
+#   search        - поиск по реестру и содержимому отчетов (среднее время запроса).
+# Каждый замер выполняется в отдельном процессе, поэтому для него известен пиковый объем памяти.
+# Окна создаются без вывода на экран (QT_QPA_PLATFORM=offscreen), если платформа Qt не задана явно.
+# Набор выполняется --repeat раз в новых временных папках, выводятся медианы замеров.
+# Результаты записываются в JSON (--json) и сравниваются с результатами другой версии (--compare).
+#   python benchmarks/suite.py [--rows 100000] [--reports 1000] [--json <файл>] [--compare <файл>]
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STEPS = ["generate", "import", "register", "reimport", "index", "registry_load", "open_viewer", "save", "search"]
+SEARCH_TERMS = ["екатеринбург", "разборчивость речи", "уральский", "tele2", "нет такого отчета"]
+LOCATIONS = ["г. Екатеринбург", "г. Челябинск", "г. Тюмень", "г. Курган", "г. Сургут", "г. Салехард"]
+DISTRICTS = ["Уральский", "Сибирский", "Приволжский", "Центральный", "Северо-Западный", "Южный"]
+
+# Функция для получения пикового объема памяти текущего процесса в МБ
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = ProcessMemoryCounters(cb=ctypes.sizeof(ProcessMemoryCounters))
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return round(counters.PeakWorkingSetSize / 2 ** 20, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1) # В байтах на macOS, в КБ на Linux
+
+# Класс с путями к файлам набора замеров во временной папке
+class Workspace:
+    def __init__(self, folder):
+        self.folder = folder
+        self.protocol = os.path.join(folder, "protocol.xlsx")   # Большой протокол
+        self.small_protocol = os.path.join(folder, "small.xlsx") # Протокол отчетов, заполняющих реестр
+        self.data_folder = os.path.join(folder, "data")
+        self.report_db = os.path.join(self.data_folder, "database_benchmark.db")
+
+    def session(self):
+        from sqlalchemy.orm import Session
+        from rkot.registry import open_registry
+        return Session(bind=open_registry(self.data_folder))
+
+    # Метод для создания главного окна приложения без вывода на экран
+    def main_window(self):
+        import main
+        main.app = main.QApplication.instance() or main.QApplication([])
+        main.full_window_width, main.full_window_height = 1280, 800
+        window = main.MainWindow()
+        window.show()
+        main.app.processEvents()
+        return main, window
+
+# Замеры. Каждая функция возвращает словарь результатов, время замера - ключ "seconds"
+def step_generate(work, args):
+    from benchmarks.generate import generate_protocol
+    started = time.perf_counter()
+    rows = generate_protocol(work.protocol, args.rows, args.operators)
+    seconds = time.perf_counter() - started
+    generate_protocol(work.small_protocol, 50, args.operators)
+    return {"seconds": seconds, "rows": rows, "file_mb": round(os.path.getsize(work.protocol) / 2 ** 20, 2)}
+
+def step_import(work, args):
+    from rkot import cache, ingest, registry
+    os.makedirs(work.data_folder, exist_ok=True)
+    work.session().close() # Создание пустого реестра
+    result = ingest.import_file(work.protocol, work.report_db, registry.registry_path(work.data_folder),
+                                cache.cache_folder(work.data_folder))
+    with open(os.path.join(work.folder, "import.json"), "w", encoding="utf-8") as file:
+        json.dump(result._asdict(), file, default=str)
+    return {"seconds": result.seconds, "rows": result.row_count,
+            "rows_per_second": round(result.row_count / result.seconds) if result.seconds else None}
+
+def step_register(work, args):
+    from rkot import ingest, validation
+    with open(os.path.join(work.folder, "import.json"), encoding="utf-8") as file:
+        values = json.load(file)
+    values["mtime"] = datetime.datetime.fromisoformat(values["mtime"])
+    if values["validation"]:
+        report = validation.ValidationReport(*values["validation"])
+        period = report.period and tuple(datetime.date.fromisoformat(value) for value in report.period)
+        values["validation"] = report._replace(period=period)
+    session = work.session()
+    started = time.perf_counter()
+    ingest.register_batch(session, [ingest.ImportResult(**values)])
+    return {"seconds": time.perf_counter() - started}
+
+def step_reimport(work, args):
+    from rkot import cache, ingest
+    db_path = os.path.join(work.folder, "reimport.db")
+    result = ingest.import_file(work.protocol, db_path, cache_dir=cache.cache_folder(work.data_folder))
+    os.remove(db_path)
+    return {"seconds": result.seconds, "from_cache": result.from_cache}
+
+def step_index(work, args):
+    from rkot import ingest, search, stats
+    from rkot.registry import ReportData
+    # Реестр заполняется небольшими отчетами с разными округами и местами проведения контроля
+    small_db = os.path.join(work.data_folder, "database_small.db")
+    ingest.import_file(work.small_protocol, small_db)
+    session = work.session()
+    modified_at = datetime.datetime.now()
+    reports = []
+    for i in range(args.reports - 1):
+        report = ReportData(file_name=os.path.basename(small_db), db_path=small_db,
+                            federal_district=DISTRICTS[i % len(DISTRICTS)],
+                            control_location=LOCATIONS[i % len(LOCATIONS)])
+        report.set_modified(modified_at)
+        report.set_period(datetime.date(2019, 1 + i % 12, 1), datetime.date(2019, 1 + i % 12, 28))
+        reports.append(report)
+    session.add_all(reports)
+    session.commit()
+    # Статистика вычисляется при загрузке, у копий отчета она совпадает с исходной
+    report_stats = stats.compute(small_db)
+    connection = stats.connect(session.get_bind().url.database)
+    try:
+        for report in reports:
+            stats.write(connection, report.id, report_stats)
+    finally:
+        connection.close()
+    started = time.perf_counter()
+    search.ensure_index(work.session().get_bind().url.database)
+    return {"seconds": time.perf_counter() - started, "reports": args.reports}
+
+def step_registry_load(work, args):
+    started = time.perf_counter()
+    main, window = work.main_window()
+    return {"seconds": time.perf_counter() - started, "loaded_rows": window.registry_model.rowCount()}
+
+def step_open_viewer(work, args):
+    main, window = work.main_window()
+    started = time.perf_counter()
+    dialog = main.DataViewDialog(work.report_db, 1, window.engine, window)
+    dialog.show()
+    main.app.processEvents()
+    return {"seconds": time.perf_counter() - started, "loaded_rows": dialog.model.rowCount()}
+
+def step_save(work, args):
+    main, window = work.main_window()
+    dialog = main.DataViewDialog(work.report_db, 1, window.engine, window)
+    model = dialog.model
+    column = model.columnCount() - 1 # Столбец значений последнего оператора
+    step = max(model.rowCount() // args.edits, 1)
+    for row in range(0, model.rowCount(), step)[:args.edits]:
+        model.setData(model.index(row, column), "1,5")
+    started = time.perf_counter()
+    dialog.saveData()
+    return {"seconds": time.perf_counter() - started, "edits": args.edits}
+
+def step_search(work, args):
+    main, window = work.main_window()
+    timings = {}
+    for term in SEARCH_TERMS:
+        started = time.perf_counter()
+        for _ in range(args.search_runs):
+            window.search_in_table(term)
+            main.app.processEvents()
+        timings[term] = (time.perf_counter() - started) / args.search_runs
+    return {"seconds": statistics.mean(timings.values()),
+            "max_seconds": max(timings.values()), "terms": len(timings)}
+
+# Функция для выполнения замера в отдельном процессе. Возвращает словарь результатов с пиковой памятью
+def run_step(name, work, args, env):
+    command = [sys.executable, os.path.abspath(__file__), "--run-step", name, "--workdir", work.folder,
+               "--rows", str(args.rows), "--reports", str(args.reports), "--operators", str(args.operators),
+               "--edits", str(args.edits), "--search-runs", str(args.search_runs)]
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f"Замер {name} завершился с ошибкой:\n{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+# Функция для получения идентификатора версии кода (коммит git, если доступен)
+def code_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Функция для вывода сравнения результатов с результатами другой версии
+def print_comparison(results, baseline):
+    print(f"\nСравнение с {baseline['meta'].get('version') or 'базовыми результатами'}:")
+    print(f"  {'Замер':<16} {'было, с':>10} {'стало, с':>10} {'изменение':>10}")
+    for name, step in results["steps"].items():
+        before = baseline["steps"].get(name, {}).get("seconds")
+        if before is None:
+            continue
+        ratio = step["seconds"] / before if before else float("inf")
+        print(f"  {name:<16} {before:10.3f} {step['seconds']:10.3f} {ratio:9.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Набор замеров производительности СПО РКОТ")
+    parser.add_argument("--rows", type=int, default=100000, help="количество строк синтетического протокола")
+    parser.add_argument("--reports", type=int, default=1000, help="количество отчетов в реестре")
+    parser.add_argument("--operators", type=int, default=4, help="количество операторов связи в протоколе")
+    parser.add_argument("--edits", type=int, default=100, help="количество изменяемых ячеек перед сохранением")
+    parser.add_argument("--search-runs", type=int, default=5, help="количество повторов каждого поискового запроса")
+    parser.add_argument("--repeat", type=int, default=1, help="количество выполнений набора")
+    parser.add_argument("--steps", default=",".join(STEPS), help="выполняемые замеры через запятую")
+    parser.add_argument("--json", help="файл для записи результатов в формате JSON")
+    parser.add_argument("--compare", help="файл результатов другой версии для сравнения")
+    parser.add_argument("--run-step", choices=STEPS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_step: # Выполнение одного замера в дочернем процессе
+        result = globals()[f"step_{args.run_step}"](Workspace(args.workdir), args)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return 0
+
+    steps = [name for name in STEPS if name in args.steps.split(",")]
+    runs = {name: [] for name in steps}
+    for repeat in range(args.repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            work = Workspace(folder)
+            env = dict(os.environ, RKOT_DATA_DIR=work.data_folder)
+            env.setdefault("QT_QPA_PLATFORM", "offscreen")
+            for name in STEPS: # Замеры зависят от результатов предыдущих, поэтому выполняются все
+                result = run_step(name, work, args, env)
+                if name in runs:
+                    runs[name].append(result)
+                    print(f"[{repeat + 1}/{args.repeat}] {name:<14} {result['seconds']:8.3f} с, "
+                          f"память {result['peak_rss_mb']:.1f} МБ")
+            shutil.rmtree(work.data_folder, ignore_errors=True)
+
+    results = {
+        "meta": {"version": code_version(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "python": sys.version.split()[0], "platform": platform.platform(),
+                 "rows": args.rows, "reports": args.reports, "operators": args.operators,
+                 "edits": args.edits, "repeat": args.repeat},
+        "steps": {},
+    }
+    for name, values in runs.items():
+        step = dict(values[-1])
+        step["seconds"] = round(statistics.median(value["seconds"] for value in values), 4)
+        step["peak_rss_mb"] = max(value["peak_rss_mb"] for value in values)
+        results["steps"][name] = step
+
+    print(f"\n{'Замер':<16} {'время, с':>10} {'память, МБ':>11}")
+    for name, step in results["steps"].items():
+        print(f"{name:<16} {step['seconds']:10.3f} {step['peak_rss_mb']:11.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print_comparison(results, json.load(file))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,37 +1,188 @@
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableWidget, QTableWidgetItem,
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableView, QStyledItemDelegate, QStyleOptionButton, QStyle,
                              QPushButton, QVBoxLayout, QFileDialog, QDialog, QStyleFactory,
-                             QLineEdit, QLabel, QHBoxLayout, QGridLayout, QDateEdit, QMessageBox)
-from PyQt6.QtCore import Qt, QDate
+                             QLineEdit, QLabel, QHBoxLayout, QGridLayout, QDateEdit, QMessageBox, QProgressDialog,
+                             QComboBox, QAbstractItemView, QCheckBox, QTableWidget, QTableWidgetItem, QSpinBox)
+from PyQt6.QtCore import (Qt, QDate, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool,
+                          pyqtSignal, QSortFilterProxyModel, QPersistentModelIndex, QEvent, QTimer, QFileSystemWatcher)
 from PyQt6.QtGui import QIcon, QPalette, QAction, QKeySequence, QShortcut
-import matplotlib.pyplot as plt
-import pandas as pd
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import sessionmaker
-from functools import partial
+from collections import OrderedDict
+import multiprocessing
 import os
 import datetime
 import sys
 
-Base = declarative_base()
+from rkot.registry import ReportData, Session, get_data_folder, open_registry, query_reports, registry_path
+from rkot.export import ExportCancelled, export_reports, report_source
+from rkot.engines import get_engine
+from rkot import cache, diagnostics, integrity, maintenance, schema, search, stats, summary, sync, validation
+from rkot.schema import quote
+from rkot.diagnostics import log
 
-# Определение структуры базы данных в основном окне
-class ReportData(Base):
-    __tablename__ = 'reports'
-    id = Column(Integer, primary_key=True)
-    date_modified = Column(String)
-    file_name = Column(String)
-    federal_district = Column(String)
-    control_location = Column(String)
-    control_period = Column(String)
-    db_path = Column(String)
+# pandas, numpy, matplotlib и модуль загрузки excel файлов импортируются при первом обращении
+# (открытие сводки или загрузка), чтобы не замедлять запуск программы
 
-# Настройка подключения к базе данных и создание таблицы, если она не существует
-engine = create_engine('sqlite:///reports.db')
-Base.metadata.create_all(engine)
-
-# Создание сессии для взаимодействия с базой данных
-Session = sessionmaker(bind=engine)
+# Модель таблицы только для чтения, работающая напрямую с DataFrame (таблица окна сводки).
+# Представление запрашивает только видимые ячейки, поэтому объекты для каждой ячейки не создаются
+class DataFrameModel(QAbstractTableModel):
+    def __init__(self, df, parent=None):
+        super().__init__(parent)
+        self.df = df # Отображаемые данные
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.df.index)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.df.columns)
+
+    # Метод для получения значения ячейки для отображения
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        import pandas as pd
+
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self.df.iat[index.row(), index.column()]
+        return "" if pd.isna(value) else display_value(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return str(self.df.columns[section])
+        return str(section + 1)
+
+# Функция для получения текста ячейки: целые значения дробного столбца отображаются без ".0"
+def display_value(value):
+    if value is None:
+        return "" # Ячейки со значением NULL отображаются пустыми
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+REPORT_BLOCK_SIZE = 1000  # Количество строк отчета, читаемых из БД одним запросом
+REPORT_CACHE_BLOCKS = 32  # Количество блоков строк отчета, хранимых в памяти
+MIN_ROWID = -2 ** 63      # Ключ начала первого блока (меньше любого rowid)
+
+# Модель таблицы отчета с загрузкой строк из БД блоками по мере прокрутки.
+# Блок читается запросом по rowid (WHERE rowid > последний rowid предыдущего блока), поэтому время
+# чтения любого блока не зависит от его положения в таблице. Представление запрашивает следующие блоки
+# через canFetchMore/fetchMore, в памяти хранятся последние использованные REPORT_CACHE_BLOCKS блоков
+# и измененные ячейки: время открытия и расход памяти не зависят от размера отчета
+class ReportDataModel(QAbstractTableModel):
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        with get_engine(db_path).connect() as connection:
+            info = connection.exec_driver_sql("PRAGMA table_info(new_table)").fetchall()
+        self.columns = [row[1] for row in info] # Имена столбцов
+        self.types = [row[2] or None for row in info] # Объявленные типы столбцов в БД
+        self.block_keys = [MIN_ROWID]  # rowid, после которого начинается каждый блок
+        self.blocks = OrderedDict()     # Загруженные блоки: номер блока -> [(rowid, значения...), ...]
+        self.row_count = 0              # Количество строк, доступных представлению
+        self.exhausted = False          # Прочитан последний блок таблицы
+        self.dirty = {}                 # Измененные ячейки: (rowid, столбец) -> новое значение
+        self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    # Метод для загрузки следующего блока строк
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        rows = self.block(len(self.block_keys) - 1)
+        self.exhausted = len(rows) < REPORT_BLOCK_SIZE
+        if rows:
+            self.block_keys.append(rows[-1][0])
+            self.beginInsertRows(QModelIndex(), self.row_count, self.row_count + len(rows) - 1)
+            self.row_count += len(rows)
+            self.endInsertRows()
+
+    # Метод для получения блока строк из памяти или из БД с вытеснением давно не использованных блоков
+    def block(self, number):
+        rows = self.blocks.get(number)
+        if rows is not None:
+            self.blocks.move_to_end(number)
+            return rows
+        with get_engine(self.db_path).connect() as connection:
+            rows = connection.exec_driver_sql(
+                "SELECT rowid, * FROM new_table WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (self.block_keys[number], REPORT_BLOCK_SIZE)).fetchall()
+        self.blocks[number] = rows
+        while len(self.blocks) > REPORT_CACHE_BLOCKS:
+            self.blocks.popitem(last=False)
+        return rows
+
+    # Метод для получения строки таблицы (rowid, значения...) по номеру
+    def row(self, number):
+        block, offset = divmod(number, REPORT_BLOCK_SIZE)
+        return self.block(block)[offset]
+
+    # Метод для получения значения ячейки для отображения и редактирования
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        row = self.row(index.row())
+        key = (row[0], index.column())
+        return display_value(self.dirty[key] if key in self.dirty else row[index.column() + 1])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return str(self.columns[section])
+        return str(section + 1)
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemFlag.ItemIsEditable # Разрешение на редактирование
+
+    # Метод для запоминания отредактированного значения до сохранения отчета
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        row, col = self.row(index.row()), index.column()
+        try:
+            value = self.convert_value(col, value, row[col + 1])
+        except ValueError:
+            return False # Значение не соответствует типу столбца
+        self.dirty[(row[0], col)] = value
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    # Метод для приведения введенного текста к типу столбца.
+    # В столбец значений протокола (REAL) можно ввести только число, в том числе с запятой или знаком %.
+    # В столбце без объявленного типа числовая ячейка остается числом
+    def convert_value(self, col, value, current):
+        value = str(value).strip()
+        if value == "":
+            return None
+        if self.types[col] == schema.VALUE_TYPE:
+            return schema.parse_real(value)
+        if isinstance(current, (int, float)):
+            number = schema.parse_real(value)
+            if isinstance(current, int) and number is not None and number.is_integer():
+                return int(number)
+            return number
+        return value
+
+    # Метод для группировки измененных строк по набору измененных столбцов.
+    # Возвращает словарь {кортеж имен столбцов: [(значения..., rowid), ...]}
+    def dirty_updates(self):
+        values_by_row = {}
+        for (rowid, col), value in self.dirty.items():
+            values_by_row.setdefault(rowid, {})[col] = value
+
+        updates = {}
+        for rowid, values in values_by_row.items():
+            cols = sorted(values)
+            names = tuple(self.columns[col] for col in cols)
+            updates.setdefault(names, []).append(tuple(values[col] for col in cols) + (rowid,))
+        return updates
 
 class DataViewDialog(QDialog):
     # Конструктор класса для создания диалогового окна и редактирования данных
@@ -85,7 +236,7 @@ class DataViewDialog(QDialog):
         layout.addWidget(self.cancelButton, 5, 1)
 
         # Создание таблицы для отображения данных из БД
-        self.dbTable = QTableWidget(self)
+        self.dbTable = QTableView(self)
         layout.addWidget(self.dbTable, 6, 0, 1, 4)
         self.load_data_from_db()
         self.load_report_data()
@@ -96,13 +247,9 @@ class DataViewDialog(QDialog):
         if report:
             self.lineEdits[0].setText(report.federal_district or "")
             self.lineEdits[1].setText(report.control_location or "")
-            period = report.control_period.split(" - ") if report.control_period else ["", ""]
-
-            
-            start_date = QDate.fromString(period[0], "dd.MM.yyyy")
-            end_date = QDate.fromString(period[1], "dd.MM.yyyy")
-            self.dateStartEdit.setDate(start_date)
-            self.dateEndEdit.setDate(end_date )
+            if report.period_start and report.period_end:
+                self.dateStartEdit.setDate(QDate(report.period_start))
+                self.dateEndEdit.setDate(QDate(report.period_end))
         else:
             dlg = QMessageBox(self)
             dlg.setWindowTitle("Error!")
@@ -113,29 +260,16 @@ class DataViewDialog(QDialog):
 
     # Метод для загрузки данных из базы данных в таблицу
     def load_data_from_db(self):
-        engine = create_engine(f'sqlite:///{self.db_path}')
-        self.df = pd.read_sql('new_table', con=engine) # Сохраняем DataFrame для использования при сохранении
-        self.db_data = pd.read_sql('SELECT * FROM reports', con=self.engine)
-
-        self.dbTable.setColumnCount(len(self.df.columns))
-        self.dbTable.setHorizontalHeaderLabels(self.df.columns)
-        self.dbTable.setRowCount(len(self.df.index))
-
-        for i in range(len(self.df.index)):
-            for j in range(len(self.df.columns)):
-                value = self.df.iloc[i, j]
-                if pd.isna(value):
-                    continue # Пропускаем ячейки со значением NULL
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable) # Разрешение на редактирование
-                self.dbTable.setItem(i, j, item)
-        self.dbTable.resizeColumnsToContents()
-        engine.dispose() # Закрытие соединения с базой данных
-
-    @staticmethod
-    def convert_to_db_format(date):
-        return date.toString("dd.MM.yyyy")
-    
+        with diagnostics.span("Открытие отчета", file=os.path.basename(self.db_path)) as info:
+            # Читается только первый блок строк, остальные - по мере прокрутки (см. ReportDataModel).
+            # Движок файла берется из пула, повторное открытие отчета не требует нового подключения
+            self.model = ReportDataModel(self.db_path, self)
+            self.dbTable.setModel(self.model)
+            # Ширина столбцов рассчитывается только по видимым строкам
+            self.dbTable.horizontalHeader().setResizeContentsPrecision(100)
+            self.dbTable.resizeColumnsToContents()
+            info["rows"] = self.model.rowCount()
+
     # Метод для сохранения данных из полей ввода в главное окно и базу данных
     def saveData(self):
         # Получаем запись по ID
@@ -147,7 +281,7 @@ class DataViewDialog(QDialog):
             self.parent.session.add(report)
 
         # Обновляем данные
-        report.date_modified = datetime.datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+        report.set_modified(datetime.datetime.now())
         report.file_name = os.path.basename(self.db_path)
         report.federal_district = self.lineEdits[0].text()
         report.control_location = self.lineEdits[1].text()
@@ -162,29 +296,24 @@ class DataViewDialog(QDialog):
             dlg.exec()
             return
 
-        start_date = self.convert_to_db_format(date_from)
-        end_date = self.convert_to_db_format(date_to)
-        report.control_period = f"{start_date} - {end_date}"
+        report.set_period(date_from.toPyDate(), date_to.toPyDate())
         report.db_path = self.db_path
 
-        # Сохраняем изменения в таблице
-        updated_data = []
-        for row in range(self.dbTable.rowCount()):
-            row_data = []
-            for col in range(self.dbTable.columnCount()):
-                item = self.dbTable.item(row, col)
-                row_data.append(item.text() if item else None)
-            updated_data.append(row_data)
-
-        # Запись обновленных данных в базу данных
-        updated_df = pd.DataFrame(updated_data, columns=self.df.columns)
-        local_engine = create_engine(f'sqlite:///{self.db_path}')
-        updated_df.to_sql('new_table', con=local_engine, if_exists='replace', index=False)
-        local_engine.dispose()
-
-        # Сохраняем изменения в базе данных и обновляем данные в основном окне
-        self.parent.session.commit()
-        self.parent.load_data_from_db()
+        with diagnostics.span("Сохранение отчета", file=os.path.basename(self.db_path)) as info:
+            # Запись в базу данных только измененных ячеек одной транзакцией
+            updates = self.model.dirty_updates()
+            if updates:
+                with get_engine(self.db_path).begin() as connection:
+                    for columns, params in updates.items():
+                        assignments = ", ".join(f'{quote(name)} = ?' for name in columns)
+                        connection.exec_driver_sql(f'UPDATE new_table SET {assignments} WHERE rowid = ?', params)
+                self.model.dirty.clear()
+            info["rows"] = sum(len(params) for params in updates.values())
+
+            # Сохраняем изменения в базе данных и обновляем данные в основном окне
+            self.parent.session.commit()
+            sync.report_updated(self.parent.registry_path, report.id, self.db_path, data_changed=bool(updates))
+        self.parent.registry_model.update_report(report)
         self.accept()
 
 
@@ -206,6 +335,409 @@ class DataViewDialog(QDialog):
         return data
 
 
+# Сигналы фоновой загрузки файла (QRunnable не является QObject и не может их объявлять)
+class ImportSignals(QObject):
+    progress = pyqtSignal(int, int)  # Записано строк, всего строк
+    finished = pyqtSignal(object)    # ImportResult
+    failed = pyqtSignal(str)         # Текст ошибки
+    cancelled = pyqtSignal()
+
+# Задача для загрузки excel файла в БД в пуле потоков, чтобы не блокировать интерфейс
+class ImportWorker(QRunnable):
+    def __init__(self, excel_path, db_path, registry_path=None, cache_dir=None):
+        super().__init__()
+        self.excel_path = excel_path
+        self.db_path = db_path
+        self.registry_path = registry_path
+        self.cache_dir = cache_dir
+        self.signals = ImportSignals()
+        self.is_cancelled = False
+
+    # Метод для запроса отмены загрузки (проверяется перед записью каждой пачки строк)
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        from rkot.ingest import ImportCancelled, import_file
+
+        try:
+            result = import_file(self.excel_path, self.db_path, self.registry_path, self.cache_dir,
+                                 progress=self.signals.progress.emit,
+                                 cancelled=lambda: self.is_cancelled)
+        except ImportCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            log.exception("%s: ошибка загрузки", self.excel_path)
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+# Сигналы пакетной загрузки
+class BatchImportSignals(QObject):
+    progress = pyqtSignal(int, int)  # Обработано файлов, всего файлов
+    finished = pyqtSignal(list)      # ImportResult по успешно загруженным файлам
+    failed = pyqtSignal(str)
+
+# Задача для пакетной загрузки файлов: ожидает пул процессов, не блокируя интерфейс
+class BatchImportWorker(QRunnable):
+    def __init__(self, files, data_folder):
+        super().__init__()
+        self.files = files
+        self.data_folder = data_folder
+        self.signals = BatchImportSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        from rkot.ingest import import_batch
+
+        try:
+            results = import_batch(self.files, self.data_folder, progress=self.signals.progress.emit,
+                                   cancelled=lambda: self.is_cancelled)
+        except Exception as e:
+            log.exception("Ошибка пакетной загрузки")
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(results)
+
+# Сигналы выгрузки отчетов
+class ExportSignals(QObject):
+    progress = pyqtSignal(int, int)  # Выгружено отчетов, всего отчетов
+    finished = pyqtSignal(int, int)  # Количество отчетов, количество строк
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+# Задача для выгрузки отчетов в один файл (Parquet, Arrow IPC, CSV или XLSX) в пуле потоков
+class ExportWorker(QRunnable):
+    def __init__(self, reports, path):
+        super().__init__()
+        self.reports = reports
+        self.path = path
+        self.signals = ExportSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        try:
+            with diagnostics.span("Выгрузка отчетов", file=os.path.basename(self.path)) as info:
+                report_count, row_count = export_reports(self.reports, self.path,
+                                                         progress=self.signals.progress.emit,
+                                                         cancelled=lambda: self.is_cancelled)
+                info.update(rows=row_count, reports=report_count)
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            log.exception("%s: ошибка выгрузки", self.path)
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(report_count, row_count)
+
+# Сигналы обслуживания папки данных
+class MaintenanceSignals(QObject):
+    progress = pyqtSignal(int, int)  # Обработано файлов, всего файлов
+    finished = pyqtSignal(object)    # Список rkot.maintenance.StepResult
+    failed = pyqtSignal(str)
+
+# Задача обслуживания папки данных (удаление и архивирование старых отчетов, сжатие файлов БД) в пуле потоков.
+# Сессия главного окна не передается в другой поток, задача подключается к реестру сама
+class MaintenanceWorker(QRunnable):
+    def __init__(self, data_folder, keep_days, archive_after, vacuum):
+        super().__init__()
+        self.data_folder = data_folder
+        self.keep_days = keep_days
+        self.archive_after = archive_after
+        self.vacuum = vacuum
+        self.signals = MaintenanceSignals()
+
+    def run(self):
+        engine = open_registry(self.data_folder)
+        session = Session(bind=engine)
+        try:
+            steps = maintenance.maintain(session, self.data_folder, self.keep_days, self.archive_after, self.vacuum,
+                                         progress=self.signals.progress.emit)
+        except Exception as e:
+            log.exception("Ошибка обслуживания папки данных")
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(steps)
+        finally:
+            session.close()
+            engine.dispose()
+
+REGISTRY_PAGE_SIZE = 200      # Количество отчетов, загружаемых из реестра за один запрос
+REGISTRY_FIRST_PAGE_SIZE = 50 # Первая страница - примерно один экран, чтобы окно появилось быстрее
+
+# Модель реестра отчетов для таблицы главного окна.
+# Отчеты загружаются из БД страницами по мере прокрутки (canFetchMore/fetchMore), сортировка
+# выполняется запросом к БД по индексированным столбцам, после загрузки, сохранения и удаления
+# обновляется только соответствующая строка
+class ReportTableModel(QAbstractTableModel):
+    HEADERS = ["Дата изменения файла", "Имя файла БД", "Федеральный округ (ФО)",
+               "Место проведения контроля", "Период проведения контроля",
+               "Строк", "Значений", "Пустых ячеек",
+               "Добавление отчета", "Просмотр отчета", "Удаление отчета"]
+    FIELDS = ("date_modified", "file_name", "federal_district", "control_location", "control_period")
+    STATS_FIELDS = ("row_count", "value_count", "empty_count") # Статистика таблицы отчета (см. rkot.stats)
+    BUTTONS = {8: "Добавить", 9: "Просмотреть", 10: "❌"} # Столбцы с кнопками и их надписи
+    SORT_KEYS = {0: 'date', 2: 'district', 3: 'location', 4: 'period',
+                 5: 'rows', 6: 'values', 7: 'empty'} # Ключи сортировки rkot.registry
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.rows = []          # Строки реестра (у новой пустой строки id равен None)
+        self.search_keys = []   # Текст строк в нижнем регистре для поиска без обращения к БД
+        self.total = 0          # Количество отчетов в реестре с учетом фильтра
+        self.fetched = 0        # Количество отчетов, загруженных из БД
+        self.filter_ids = None  # Идентификаторы отчетов, найденных поиском (None - без фильтра)
+        self.filters = {}       # Условия отбора по статистике (аргументы query_reports)
+        self.column_stats = {}  # Статистика столбцов для подсказки по идентификатору отчета (до перезагрузки)
+        self.sort_key = 'id'    # Сортировка по умолчанию - порядок добавления отчетов
+        self.descending = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if index.column() in self.BUTTONS:
+                return self.BUTTONS[index.column()]
+            if index.column() == 1 and row.get("archived"):
+                return f"{row['file_name']} (архив)"
+            if index.column() >= len(self.FIELDS):
+                value = row[self.STATS_FIELDS[index.column() - len(self.FIELDS)]]
+                return "" if value is None else str(value)
+            return row[self.FIELDS[index.column()]] or ""
+        if role == Qt.ItemDataRole.ToolTipRole and index.column() == 6 and row["id"] is not None:
+            return self.stats_tooltip(row["id"])
+        if role == Qt.ItemDataRole.TextAlignmentRole and len(self.FIELDS) <= index.column() < min(self.BUTTONS):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.UserRole:
+            return row["id"]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    # Метод для получения флагов ячейки: элементы неизменяемые, "Просмотреть" недоступна без загруженного файла
+    def flags(self, index):
+        if index.column() == 9 and not self.rows[index.row()]["db_path"]:
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled
+
+    # Метод для получения текста подсказки со статистикой столбцов отчета. Статистика читается из реестра
+    # (файл отчета не открывается) при первом наведении и хранится до перезагрузки или изменения отчета
+    def stats_tooltip(self, report_id):
+        tooltip = self.column_stats.get(report_id)
+        if tooltip is None:
+            tooltip = self.column_stats[report_id] = "\n".join(
+                f"{name}: значений {count}, пустых {nulls}" +
+                (f", мин. {display_value(low)}, макс. {display_value(high)}, среднее {display_value(round(mean, 3))}"
+                 if count else "")
+                for name, count, nulls, low, high, mean in stats.column_stats(self.registry_path(), report_id))
+        return tooltip
+
+    # Метод для получения запроса к реестру с учетом фильтра поиска, отбора и сортировки
+    def query(self):
+        return query_reports(self.session, self.sort_key, self.descending, self.filter_ids, **self.filters)
+
+    # Метод для получения пути к реестру
+    def registry_path(self):
+        return self.session.get_bind().url.database
+
+    # Метод для сортировки реестра запросом к БД (column = -1 - порядок добавления отчетов)
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_key = self.SORT_KEYS.get(column, 'id')
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    # Метод для перезагрузки модели: подсчет отчетов и загрузка первой страницы
+    def reload(self):
+        with diagnostics.span("Загрузка реестра") as info:
+            self.beginResetModel()
+            self.rows = []
+            self.search_keys = []
+            self.column_stats = {}
+            self.fetched = 0
+            self.total = self.query().count()
+            self.endResetModel()
+            self.fetchMore()
+            info["rows"] = self.total
+
+    # Метод для установки условий отбора по статистике отчетов
+    def set_filters(self, filters):
+        if filters != self.filters:
+            self.filters = filters
+            self.reload()
+
+    # Метод для ограничения реестра отчетами, найденными поиском
+    def set_filter_ids(self, filter_ids):
+        if filter_ids != self.filter_ids:
+            self.filter_ids = filter_ids
+            self.reload()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.fetched < self.total
+
+    # Метод для загрузки следующей страницы отчетов
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        page_size = REGISTRY_PAGE_SIZE if self.fetched else REGISTRY_FIRST_PAGE_SIZE
+        reports = self.query().offset(self.fetched).limit(page_size).all()
+        if not reports:
+            self.total = self.fetched
+            return
+        position = len(self.rows)
+        self.beginInsertRows(QModelIndex(), position, position + len(reports) - 1)
+        for report in reports:
+            row = self.report_row(report)
+            self.rows.append(row)
+            self.search_keys.append(self.search_key(row))
+        self.fetched += len(reports)
+        self.endInsertRows()
+
+    # Метод для добавления нового отчета. Если загружены не все страницы или реестр отсортирован
+    # не по порядку добавления, отчет появится при прокрутке на своем месте.
+    # placeholder - пустая строка, из которой начата загрузка: она удаляется, ее место занимает отчет
+    def add_report(self, report, placeholder=None):
+        self.remove_placeholder(placeholder)
+        if self.filter_ids is not None or self.filters:
+            return # Новый отчет не входит в результаты поиска или может не удовлетворять условиям отбора
+        self.total += 1
+        if self.fetched == self.total - 1 and self.sort_key == 'id' and not self.descending:
+            position = len(self.rows)
+            self.beginInsertRows(QModelIndex(), position, position)
+            row = self.report_row(report)
+            self.rows.append(row)
+            self.search_keys.append(self.search_key(row))
+            self.fetched += 1
+            self.endInsertRows()
+
+    # Метод для обновления строки отчета после сохранения
+    def update_report(self, report):
+        self.column_stats.pop(report.id, None) # Статистика изменилась при сохранении
+        row = self.row_of(report.id)
+        if row is None:
+            return
+        self.rows[row] = self.report_row(report)
+        self.search_keys[row] = self.search_key(self.rows[row])
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+        # Позиция строки при сортировке по измененному столбцу обновится при следующей сортировке или поиске
+
+    # Метод для поиска строки таблицы по идентификатору отчета
+    def row_of(self, report_id):
+        for row, data in enumerate(self.rows):
+            if data["id"] == report_id:
+                return row
+        return None
+
+    # Метод для добавления пустой строки (отчет еще не загружен)
+    def add_empty_row(self):
+        position = len(self.rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.append(dict({field: None for field in self.FIELDS + self.STATS_FIELDS}, id=None, db_path=None))
+        self.search_keys.append("")
+        self.endInsertRows()
+
+    # Метод для удаления пустой строки, если она еще есть в таблице (строка ищется по ссылке,
+    # так как ее позиция могла измениться за время загрузки)
+    def remove_placeholder(self, placeholder):
+        for row, data in enumerate(self.rows):
+            if data is placeholder:
+                self.remove_row(row)
+                return
+
+    def remove_row(self, row):
+        if self.rows[row]["id"] is not None:
+            # Смещение следующей страницы уменьшается вместе с количеством отчетов в реестре
+            self.fetched -= 1
+            self.total -= 1
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        del self.search_keys[row]
+        self.endRemoveRows()
+
+    def report_id(self, row):
+        return self.rows[row]["id"]
+
+    @classmethod
+    def report_row(cls, report):
+        row = {field: getattr(report, field) for field in cls.FIELDS + cls.STATS_FIELDS}
+        row["id"] = report.id
+        row["db_path"] = report.db_path
+        row["archived"] = bool(report.archive_path)
+        return row
+
+    @classmethod
+    def search_key(cls, row):
+        return "\n".join(row[field] for field in cls.FIELDS if row[field]).lower()
+
+# Модель-фильтр для поиска по загруженным строкам реестра. Используется для коротких запросов,
+# которые не обрабатываются поисковым индексом (см. rkot.search)
+class ReportFilterProxyModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.term = ""
+
+    # Метод для установки поискового запроса
+    def set_filter(self, term):
+        self.term = term.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return not self.term or self.term in self.sourceModel().search_keys[source_row]
+
+# Делегат, рисующий кнопки в ячейках таблицы вместо отдельного виджета QPushButton для каждой строки
+class ButtonDelegate(QStyledItemDelegate):
+    clicked = pyqtSignal(QModelIndex)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pressed = None # Ячейка, на которой нажата кнопка мыши
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(1, 1, -1, -1)
+        button.text = index.data()
+        button.palette = QPalette(option.palette)
+        if index.flags() & Qt.ItemFlag.ItemIsEnabled:
+            button.state = QStyle.StateFlag.State_Enabled
+        else:
+            button.state = QStyle.StateFlag.State_None
+            button.palette.setCurrentColorGroup(QPalette.ColorGroup.Disabled)
+        if self.pressed is not None and self.pressed == index:
+            button.state |= QStyle.StateFlag.State_Sunken
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    # Метод для обработки нажатия на нарисованную кнопку
+    def editorEvent(self, event, model, option, index):
+        if not index.flags() & Qt.ItemFlag.ItemIsEnabled:
+            return False
+        if event.type() == QEvent.Type.MouseButtonPress and event.button() == Qt.MouseButton.LeftButton:
+            self.pressed = QPersistentModelIndex(index)
+            return True
+        if event.type() == QEvent.Type.MouseButtonRelease and self.pressed is not None:
+            was_pressed = self.pressed == index
+            self.pressed = None
+            if was_pressed and option.rect.contains(event.position().toPoint()):
+                self.clicked.emit(index)
+            return True
+        return False
+
 class ConfirmDeleteDialog(QDialog):
     # Конструктор класса для создания диалогового окна подтверждения удаления
     def __init__(self, parent=None):
@@ -232,6 +764,397 @@ class ConfirmDeleteDialog(QDialog):
         buttonLayout.addWidget(self.noButton)
         layout.addLayout(buttonLayout)
 
+# Окно условий отбора отчетов для выгрузки: часть названия федерального округа и места контроля,
+# период контроля и ограничение выделенными в реестре отчетами
+class ExportFilterDialog(QDialog):
+    def __init__(self, selected_count=0, parent=None):
+        super().__init__(parent)
+        self.selected_count = selected_count # Количество выделенных в реестре отчетов
+        self.initUI()
+
+    # Метод для инициализации пользовательского интерфейса диалога
+    def initUI(self):
+        self.setWindowTitle("Выгрузка отчетов")
+        layout = QGridLayout(self)
+
+        self.districtEdit = QLineEdit(self)
+        self.districtEdit.setPlaceholderText("все")
+        self.locationEdit = QLineEdit(self)
+        self.locationEdit.setPlaceholderText("все")
+        layout.addWidget(QLabel("Федеральный округ (ФО)", self), 0, 0)
+        layout.addWidget(self.districtEdit, 0, 1, 1, 2)
+        layout.addWidget(QLabel("Место проведения контроля", self), 1, 0)
+        layout.addWidget(self.locationEdit, 1, 1, 1, 2)
+
+        # Период отбора: отчеты, период контроля которых пересекается с заданным
+        self.periodBox = QCheckBox("Период контроля", self)
+        self.dateStartEdit = QDateEdit(QDate.currentDate().addYears(-1), self)
+        self.dateEndEdit = QDateEdit(QDate.currentDate(), self)
+        for dateEdit in (self.dateStartEdit, self.dateEndEdit):
+            dateEdit.setCalendarPopup(True)
+            dateEdit.setEnabled(False)
+            self.periodBox.toggled.connect(dateEdit.setEnabled)
+        layout.addWidget(self.periodBox, 2, 0)
+        layout.addWidget(self.dateStartEdit, 2, 1)
+        layout.addWidget(self.dateEndEdit, 2, 2)
+
+        self.selectedBox = QCheckBox(f"Только выделенные отчеты ({self.selected_count})", self)
+        self.selectedBox.setEnabled(self.selected_count > 0)
+        self.selectedBox.setChecked(self.selected_count > 0)
+        layout.addWidget(self.selectedBox, 3, 0, 1, 3)
+
+        self.exportButton = QPushButton("Выгрузить...", self)
+        self.exportButton.clicked.connect(self.accept)
+        self.cancelButton = QPushButton("Отмена", self)
+        self.cancelButton.clicked.connect(self.reject)
+        layout.addWidget(self.exportButton, 4, 1)
+        layout.addWidget(self.cancelButton, 4, 2)
+
+    # Метод для получения условий отбора в виде аргументов query_reports
+    def filters(self):
+        filters = {'district': self.districtEdit.text().strip() or None,
+                   'location': self.locationEdit.text().strip() or None}
+        if self.periodBox.isChecked():
+            filters['period_from'] = self.dateStartEdit.date().toPyDate()
+            filters['period_to'] = self.dateEndEdit.date().toPyDate()
+        return filters
+
+# Окно отбора отчетов реестра по статистике их таблиц (см. rkot.stats): количество строк и наличие
+# в выбранном столбце значений из заданного диапазона. Условия проверяются запросом к реестру
+class StatsFilterDialog(QDialog):
+    ANY = "любой" # Пункт списка столбцов без отбора по значениям
+
+    def __init__(self, columns, filters, parent=None):
+        super().__init__(parent)
+        self.columns = columns # Столбцы отчетов с числовыми значениями
+        self.initUI()
+        self.set_filters(filters)
+
+    # Метод для инициализации пользовательского интерфейса диалога
+    def initUI(self):
+        self.setWindowTitle("Отбор отчетов")
+        layout = QGridLayout(self)
+
+        self.rowsFromBox = QSpinBox(self)
+        self.rowsToBox = QSpinBox(self)
+        for spinBox in (self.rowsFromBox, self.rowsToBox):
+            spinBox.setRange(0, 2 ** 31 - 1)
+            spinBox.setSpecialValueText("-") # 0 - без ограничения
+        layout.addWidget(QLabel("Строк: от", self), 0, 0)
+        layout.addWidget(self.rowsFromBox, 0, 1)
+        layout.addWidget(QLabel("до", self), 0, 2)
+        layout.addWidget(self.rowsToBox, 0, 3)
+
+        self.columnBox = QComboBox(self)
+        self.columnBox.addItems([self.ANY] + self.columns)
+        layout.addWidget(QLabel("Значения в столбце", self), 1, 0)
+        layout.addWidget(self.columnBox, 1, 1, 1, 3)
+        self.valueFromEdit = QLineEdit(self)
+        self.valueToEdit = QLineEdit(self)
+        for lineEdit in (self.valueFromEdit, self.valueToEdit):
+            lineEdit.setPlaceholderText("-")
+        layout.addWidget(QLabel("от", self), 2, 0)
+        layout.addWidget(self.valueFromEdit, 2, 1)
+        layout.addWidget(QLabel("до", self), 2, 2)
+        layout.addWidget(self.valueToEdit, 2, 3)
+
+        self.applyButton = QPushButton("Применить", self)
+        self.applyButton.clicked.connect(self.apply)
+        self.resetButton = QPushButton("Сбросить", self)
+        self.resetButton.clicked.connect(lambda: self.set_filters({}))
+        self.cancelButton = QPushButton("Отмена", self)
+        self.cancelButton.clicked.connect(self.reject)
+        layout.addWidget(self.applyButton, 3, 1)
+        layout.addWidget(self.resetButton, 3, 2)
+        layout.addWidget(self.cancelButton, 3, 3)
+
+    # Метод для заполнения полей по текущим условиям отбора
+    def set_filters(self, filters):
+        self.rowsFromBox.setValue(filters.get('rows_from') or 0)
+        self.rowsToBox.setValue(filters.get('rows_to') or 0)
+        column = filters.get('column')
+        self.columnBox.setCurrentIndex(self.columns.index(column) + 1 if column in self.columns else 0)
+        for lineEdit, key in ((self.valueFromEdit, 'value_from'), (self.valueToEdit, 'value_to')):
+            lineEdit.setText("" if filters.get(key) is None else display_value(filters[key]))
+
+    # Метод для проверки введенных значений и закрытия диалога
+    def apply(self):
+        try:
+            self.filters()
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Границы значений должны быть числами!")
+            return
+        self.accept()
+
+    # Метод для получения условий отбора в виде аргументов query_reports
+    def filters(self):
+        filters = {}
+        if self.rowsFromBox.value():
+            filters['rows_from'] = self.rowsFromBox.value()
+        if self.rowsToBox.value():
+            filters['rows_to'] = self.rowsToBox.value()
+        if self.columnBox.currentIndex() > 0:
+            filters['column'] = self.columnBox.currentText()
+            for lineEdit, key in ((self.valueFromEdit, 'value_from'), (self.valueToEdit, 'value_to')):
+                text = lineEdit.text().strip().replace(",", ".")
+                if text:
+                    filters[key] = float(text)
+        return filters
+
+# Окно параметров обслуживания папки данных: сроки удаления и архивирования отчетов после окончания
+# периода контроля и сжатие файлов БД (см. rkot.maintenance)
+class MaintenanceDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.initUI()
+
+    # Метод для инициализации пользовательского интерфейса диалога
+    def initUI(self):
+        self.setWindowTitle("Обслуживание хранилища")
+        layout = QGridLayout(self)
+
+        self.keepBox = QSpinBox(self)
+        self.archiveBox = QSpinBox(self)
+        for row, (label, spinBox, days) in enumerate([
+                ("Удалять отчеты через, дней", self.keepBox, maintenance.RETENTION_DAYS),
+                ("Переносить отчеты в архив через, дней", self.archiveBox, maintenance.ARCHIVE_AFTER_DAYS)]):
+            spinBox.setRange(0, 36500)
+            spinBox.setSpecialValueText("нет")
+            spinBox.setValue(days)
+            layout.addWidget(QLabel(label, self), row, 0)
+            layout.addWidget(spinBox, row, 1)
+        layout.addWidget(QLabel("Сроки отсчитываются от окончания периода контроля", self), 2, 0, 1, 2)
+
+        self.vacuumBox = QCheckBox("Сжать файлы БД (VACUUM)", self)
+        self.vacuumBox.setChecked(True)
+        layout.addWidget(self.vacuumBox, 3, 0, 1, 2)
+
+        self.runButton = QPushButton("Выполнить", self)
+        self.runButton.clicked.connect(self.accept)
+        self.cancelButton = QPushButton("Отмена", self)
+        self.cancelButton.clicked.connect(self.reject)
+        layout.addWidget(self.runButton, 4, 0)
+        layout.addWidget(self.cancelButton, 4, 1)
+
+# Окно сводки показателей по выбранным отчетам: таблица средних значений показателя по операторам
+# и диаграмма. Агрегаты берутся из кэша report_kpis (см. rkot.summary), поэтому построение сводки
+# не требует чтения файлов отчетов, а построенные сводки запоминаются для мгновенного переключения
+class SummaryDialog(QDialog):
+    GROUPS = {
+        "Федеральный округ": 'district',
+        "Место проведения контроля": 'location',
+        "Период": 'period',
+    }
+
+    def __init__(self, registry_path, report_ids=None, parent=None):
+        super().__init__(parent)
+        self.registry_path = registry_path
+        self.report_ids = report_ids # None - все отчеты реестра
+        self.pivots = {}             # Построенные сводки по (показатель, измерение)
+        self.initUI()
+
+    # Метод для инициализации пользовательского интерфейса окна сводки
+    def initUI(self):
+        # matplotlib нужен только в окне сводки и импортируется при его открытии
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+
+        count = "все отчеты" if self.report_ids is None else f"отчетов: {len(self.report_ids)}"
+        self.setWindowTitle(f"Сводка ({count})")
+        self.resize(1000, 700)
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.parameterBox = QComboBox(self)
+        self.parameterBox.addItems(summary.parameters(self.registry_path, self.report_ids))
+        self.groupBox = QComboBox(self)
+        self.groupBox.addItems(self.GROUPS)
+        controls.addWidget(QLabel("Показатель", self))
+        controls.addWidget(self.parameterBox, 1)
+        controls.addWidget(QLabel("Группировка", self))
+        controls.addWidget(self.groupBox)
+        layout.addLayout(controls)
+
+        self.summaryTable = QTableView(self)
+        self.summaryTable.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.summaryTable, 1)
+
+        self.figure = Figure(figsize=(8, 4))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        layout.addWidget(self.canvas, 2)
+
+        self.parameterBox.currentTextChanged.connect(self.update_summary)
+        self.groupBox.currentTextChanged.connect(self.update_summary)
+        self.update_summary()
+
+    # Метод для получения сводки: строки - значения измерения, столбцы - операторы, значения - средние
+    def pivot(self, parameter, group):
+        import pandas as pd
+
+        key = (parameter, group)
+        if key not in self.pivots:
+            columns, rows = summary.summarize(self.registry_path, (group, 'operator'), parameter, self.report_ids)
+            df = pd.DataFrame(rows, columns=columns)
+            df[group] = df[group].fillna("не указан")
+            # Порядок строк и столбцов - как в результате запроса (периоды по дате начала)
+            self.pivots[key] = df.pivot_table(index=group, columns='operator', values='mean', sort=False)
+        return self.pivots[key]
+
+    # Метод для обновления таблицы и диаграммы по выбранным показателю и измерению
+    def update_summary(self):
+        import numpy as np
+        import pandas as pd
+
+        parameter = self.parameterBox.currentText()
+        group = self.GROUPS[self.groupBox.currentText()]
+        pivot = self.pivot(parameter, group) if parameter else pd.DataFrame()
+
+        table = pivot.round(3).reset_index()
+        table.columns = [self.groupBox.currentText()] + list(table.columns[1:])
+        model = DataFrameModel(table, parent=self)
+        self.summaryTable.setModel(model)
+        self.summaryTable.resizeColumnsToContents()
+
+        self.figure.clear()
+        axes = self.figure.add_subplot()
+        if not pivot.empty:
+            positions = np.arange(len(pivot.index))
+            width = 0.8 / len(pivot.columns)
+            for i, operator in enumerate(pivot.columns):
+                axes.bar(positions + i * width, pivot[operator].to_numpy(), width, label=operator)
+            axes.set_xticks(positions + 0.4 - width / 2, [str(value) for value in pivot.index],
+                            rotation=20, ha='right', fontsize=8)
+            axes.set_title(parameter, fontsize=9, wrap=True)
+            axes.legend(fontsize=8)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+# Окно диагностики: последние операции (см. rkot.diagnostics) с длительностью, количеством строк
+# и пиковым объемом памяти, включение профилирования cProfile и tracemalloc
+class DiagnosticsDialog(QDialog):
+    HEADERS = ["Время", "Операция", "Длительность, с", "Строк", "Пик памяти, МБ", "Подробности"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.initUI()
+
+    # Метод для инициализации пользовательского интерфейса окна диагностики
+    def initUI(self):
+        self.setWindowTitle("Диагностика")
+        self.resize(1000, 600)
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.cpuBox = QCheckBox("Профилирование (cProfile)", self)
+        self.cpuBox.setChecked(diagnostics.profile_cpu)
+        self.cpuBox.toggled.connect(lambda checked: diagnostics.set_profiling(cpu=checked))
+        self.memoryBox = QCheckBox("Пиковая память (tracemalloc)", self)
+        self.memoryBox.setChecked(diagnostics.profile_memory)
+        self.memoryBox.toggled.connect(lambda checked: diagnostics.set_profiling(memory=checked))
+        self.refreshButton = QPushButton("Обновить", self)
+        self.refreshButton.clicked.connect(self.refresh)
+        controls.addWidget(self.cpuBox)
+        controls.addWidget(self.memoryBox)
+        controls.addStretch(1)
+        controls.addWidget(self.refreshButton)
+        layout.addLayout(controls)
+
+        self.operationsTable = QTableWidget(0, len(self.HEADERS), self)
+        self.operationsTable.setHorizontalHeaderLabels(self.HEADERS)
+        self.operationsTable.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.operationsTable.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.operationsTable, 1)
+
+        folders = QLabel(f"Журнал: {diagnostics.log_file or 'не ведется'}\n"
+                         f"Профили: {diagnostics.profile_folder or 'временная папка'}", self)
+        folders.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(folders)
+        self.refresh()
+
+    # Метод для заполнения таблицы последними операциями, начиная с самой новой
+    def refresh(self):
+        operations = diagnostics.recent_operations()
+        self.operationsTable.setRowCount(len(operations))
+        for row, operation in enumerate(operations):
+            details = operation.details
+            if operation.profile_path:
+                details = f"{details}, профиль: {operation.profile_path}" if details else f"профиль: {operation.profile_path}"
+            values = [operation.started.strftime("%H:%M:%S"), operation.name, f"{operation.seconds:.3f}",
+                      "" if operation.rows is None else str(operation.rows),
+                      "" if operation.peak_mb is None else f"{operation.peak_mb:.1f}", details]
+            for column, value in enumerate(values):
+                self.operationsTable.setItem(row, column, QTableWidgetItem(value))
+        self.operationsTable.resizeColumnsToContents()
+
+INBOX_WORKERS = 2 # Количество файлов папки входящих протоколов, загружаемых одновременно
+
+# Наблюдение за папкой входящих протоколов в окне программы (см. rkot.inbox).
+# Изменения папки отслеживаются QFileSystemWatcher, а таймер повторяет проверку, пока копируемые файлы
+# не будут записаны полностью (и на случай сетевых папок, изменения которых не отслеживаются).
+# Файлы загружаются задачами ImportWorker в отдельном пуле потоков, в очереди находится не более
+# rkot.inbox.QUEUE_SIZE файлов, каждый загруженный файл добавляется в реестр отдельной транзакцией
+class InboxWatcher(QObject):
+    reportAdded = pyqtSignal(object) # Добавленный в реестр отчет (ReportData)
+    statusChanged = pyqtSignal(str)  # Текст состояния наблюдения
+
+    def __init__(self, folder, window):
+        super().__init__(window)
+        from rkot import inbox
+
+        self.folder = folder
+        self.window = window
+        self.inbox = inbox.Inbox(folder)
+        self.workers = {} # Выполняющиеся и ожидающие загрузки: задача -> путь к файлу
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(INBOX_WORKERS)
+        self.watcher = QFileSystemWatcher([folder], self)
+        self.watcher.directoryChanged.connect(self.scan)
+        self.timer = QTimer(self)
+        self.timer.setInterval(inbox.POLL_INTERVAL * 1000)
+        self.timer.timeout.connect(self.scan)
+        self.timer.start()
+        log.info("Наблюдение за папкой %s", folder)
+        self.scan()
+
+    # Метод для постановки в очередь файлов, готовых к загрузке
+    def scan(self):
+        from rkot import inbox
+
+        for path, _ in self.inbox.ready(inbox.QUEUE_SIZE - len(self.workers)):
+            worker = ImportWorker(path, integrity.new_db_path(self.window.data_folder), self.window.registry_path,
+                                  cache.cache_folder(self.window.data_folder))
+            worker.signals.finished.connect(lambda result, worker=worker: self.on_finished(worker, result))
+            worker.signals.failed.connect(lambda message, worker=worker: self.on_finished(worker))
+            worker.signals.cancelled.connect(lambda worker=worker: self.on_finished(worker))
+            self.workers[worker] = path
+            self.pool.start(worker)
+        self.update_status()
+
+    # Метод для добавления загруженного файла в реестр и освобождения места в очереди
+    def on_finished(self, worker, result=None):
+        from rkot import inbox
+
+        self.inbox.finished(self.workers.pop(worker))
+        if result is not None:
+            for report in inbox.register_result(self.window.session, result):
+                self.reportAdded.emit(report)
+        self.update_status()
+
+    def update_status(self):
+        queued = len(self.workers)
+        self.statusChanged.emit(f"Наблюдение за папкой {self.folder}" + (f", загружается файлов: {queued}" if queued else ""))
+
+    # Метод для остановки наблюдения: ожидающие загрузки отменяются, выполняющиеся прерываются
+    def stop(self):
+        self.timer.stop()
+        self.watcher.removePaths(self.watcher.directories())
+        self.pool.clear()
+        for worker in self.workers:
+            worker.cancel()
+        log.info("Наблюдение за папкой %s остановлено", self.folder)
+
+SEARCH_DEBOUNCE_MS = 250 # Задержка поиска после последнего нажатия клавиши
+
 class MainWindow(QMainWindow):
     # Конструктор класса для создания главного окна приложения
     def __init__(self):
@@ -243,18 +1166,20 @@ class MainWindow(QMainWindow):
         self.setPalette(self.dark_palette)
 
         # Определение пути к папке 'data' в директории исполняемого файла
-        executable_dir = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
-        self.data_folder = os.path.join(executable_dir, 'data')
-        if not os.path.exists(self.data_folder):
-            os.makedirs(self.data_folder)
+        self.data_folder = get_data_folder()
+        diagnostics.configure(self.data_folder) # Журнал операций в data/rkot.log
         
         # Изменение пути создания основной базы данных
-        self.engine = create_engine(f'sqlite:///{os.path.join(self.data_folder, "reports.db")}')
-        Base.metadata.create_all(self.engine)
+        self.engine = open_registry(self.data_folder)
+        self.registry_path = registry_path(self.data_folder)
         
         self.session = Session(bind=self.engine)
-        self.db_paths = {}       # Инициализация db_paths как пустого словаря путей к файлам
-        self.input_data = {}     # Инициализация input_data как пустого словаря введенной информации
+        integrity.collect_garbage(self.session, self.data_folder) # Удаление файлов, оставшихся после сбоев
+        search.ensure_index(self.registry_path) # Индексация отчетов, еще не попавших в поисковый индекс
+        stats.ensure_stats(self.registry_path)  # Статистика отчетов, загруженных предыдущей версией
+        self.import_workers = set() # Выполняющиеся фоновые загрузки и выгрузки
+        self.inbox_watcher = None   # Наблюдение за папкой входящих протоколов
+        self.input_data = {}     # Инициализация input_data как пустого словаря введенной информации (по id отчета)
         self.initUI()            # Инициализация интерфейса пользователя
         self.load_data_from_db() # Загрузка данных из базы при инициализации
         self._instrument()       # Инициализация пунктов меню и их функций
@@ -272,12 +1197,16 @@ class MainWindow(QMainWindow):
         icon_path = 'logo_xak.png'
         self.setWindowIcon(QIcon(icon_path))
 
-        # Создание таблицы для отображения данных
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(["Дата изменения файла", "Имя файла БД", "Федеральный округ (ФО)", 
-                                            "Место проведения контроля", "Период проведения контроля", 
-                                            "Добавление отчета", "Просмотр отчета", "Удаление отчета"])
+        # Создание таблицы для отображения данных: модель реестра, фильтр поиска и кнопки-делегаты
+        self.registry_model = ReportTableModel(self.session, self)
+        self.search_proxy = ReportFilterProxyModel(self)
+        self.search_proxy.setSourceModel(self.registry_model)
+        self.table = QTableView(self)
+        self.table.setModel(self.search_proxy)
+        self.button_delegate = ButtonDelegate(self.table)
+        self.button_delegate.clicked.connect(self.on_row_button_clicked)
+        for column in ReportTableModel.BUTTONS:
+            self.table.setItemDelegateForColumn(column, self.button_delegate)
         self.table.verticalHeader().setVisible(False)
         self.table.setGeometry(10, round(height * 0.057), round(width * 0.7), round(height * 0.54))
         self.table.resizeColumnsToContents()
@@ -286,11 +1215,15 @@ class MainWindow(QMainWindow):
         header = self.table.horizontalHeader()
         header.setStretchLastSection(True)
 
-        # Создаем поисковую строку
+        # Создаем поисковую строку. Поиск выполняется по мере ввода с задержкой после последнего нажатия
         self.searchbar = QLineEdit(self)
         self.searchbar.setGeometry(10, round(height * 0.0332), round(width * 0.2), round(height * 0.02))
-        self.searchbar.setText("Поиск")
-        self.searchbar.focusInEvent = self.on_searchbar_focus_in #Очистка поисковой строки при нажатии на неё
+        self.searchbar.setPlaceholderText("Поиск")
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.on_search_button_clicked)
+        self.searchbar.textChanged.connect(self.search_timer.start)
 
         # Кнопка поиска
         self.search_button = QPushButton("🔍", self)
@@ -351,209 +1284,323 @@ class MainWindow(QMainWindow):
         dlg.setWindowTitle("Справка")
         dlg.exec()
         
-    # Метод для очистка поля поиска при нажатии на него
-    def on_searchbar_focus_in(self, event):
-        if self.searchbar.text() == "Поиск":
-            self.searchbar.clear()
-
     # Метод для обработки нажатия на кнопку поиска
     def on_search_button_clicked(self):
+        self.search_timer.stop()
         # Получаем текущий текст в поисковой строке
         search_term = self.searchbar.text().lower()
         self.search_in_table(search_term)
         
-    # Метод поиска по таблице на основе введенного запроса
+    # Метод поиска по реестру и содержимому отчетов на основе введенного запроса.
+    # Найденные по индексу отчеты выбираются из БД, короткие запросы фильтруют загруженные строки
     def search_in_table(self, search_term):
-        for row in range(self.table.rowCount()):
-            row_visible = False
-            for col in range(self.table.columnCount()):
-                item = self.table.item(row, col)
-                if item and search_term in item.text().lower():
-                    row_visible = True
-                    break
-            self.table.setRowHidden(row, not row_visible)
+        with diagnostics.span("Поиск", term=search_term) as info:
+            matched_ids = search.search(self.registry_path, search_term) if search_term.strip() else None
+            self.registry_model.set_filter_ids(matched_ids)
+            self.search_proxy.set_filter(search_term if matched_ids is None else "")
+            info["rows"] = self.search_proxy.rowCount()
             
     # Метод для отмены фильтрации поиска и отображение всех строк
     def on_search_cancel_button_clicked(self):
-        for row in range(self.table.rowCount()):
-            self.table.setRowHidden(row, False)
+        self.searchbar.blockSignals(True)
+        self.searchbar.clear()
+        self.searchbar.blockSignals(False)
+        self.search_timer.stop()
+        self.search_proxy.set_filter("")
+        self.registry_model.set_filter_ids(None)
 
     # Метод для загрузки данных из базы данных и их отображение в таблице главного окна
     def load_data_from_db(self):
-        # Очищаем текущие данные в таблице
-        self.table.setRowCount(0)
-
-        # Загружаем данные из базы данных
-        for report in self.session.query(ReportData).all():
-            # Создаем новую строку в таблице для каждого отчета
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            
-            # Создаем и добавляем QTableWidgetItem с флагом ItemIsEnabled
-            items = [
-                QTableWidgetItem(report.date_modified),
-                QTableWidgetItem(report.file_name),
-                QTableWidgetItem(report.federal_district),
-                QTableWidgetItem(report.control_location),
-                QTableWidgetItem(report.control_period)
-            ]
-
-            for i, item in enumerate(items):
-                item.setFlags(Qt.ItemFlag.ItemIsEnabled) # Флаг делает элементы неизменяемыми
-                self.table.setItem(row_position, i, item)
-
-            # Добавляем кнопки управления для каждой строки
-            add_button = QPushButton("Добавить", self.table)
-            add_button.clicked.connect(lambda _, row=row_position: self.openFileDialog(row))
-            self.table.setCellWidget(row_position, 5, add_button)
-
-            view_button = QPushButton("Просмотреть", self.table)
-            # Передача id отчета вместо позиции строки
-            view_button.clicked.connect(lambda _, report_id=report.id: self.viewDialog(report_id))
-            self.table.setCellWidget(row_position, 6, view_button)
-
-            delete_button = QPushButton("❌", self.table)
-            delete_button.clicked.connect(partial(self.confirmDelete, delete_button))
-            self.table.setCellWidget(row_position, 7, delete_button)
-
-            # Обновляем словарь db_paths для текущего отчета
-            self.db_paths[report.id] = {
-                "view_button": view_button,
-                "db_path": report.db_path,
-                "report_id": report.id
-            }
-            self.print_db_contents()
-
-    # Метод для вывода содержимого базы данных в консоль для отладки
-    def print_db_contents(self):
-        print("Содержимое базы данных:")
-        for report in self.session.query(ReportData).all():
-            print(f"ID: {report.id}, Date Modified: {report.date_modified}, File Name: {report.file_name}, "
-                  f"Federal District: {report.federal_district}, Control Location: {report.control_location}, "
-                  f"Control Period: {report.control_period}, DB Path: {report.db_path}")
-        print("")
+        self.registry_model.reload()
+
+    # Метод для обработки нажатия кнопок в строке реестра
+    def on_row_button_clicked(self, index):
+        row = self.search_proxy.mapToSource(index).row()
+        if index.column() == 8:
+            # Загрузка из пустой строки заменяет эту строку загруженным отчетом
+            placeholder = self.registry_model.rows[row] if self.registry_model.report_id(row) is None else None
+            self.openFileDialog(placeholder)
+        elif index.column() == 9:
+            self.viewDialog(self.registry_model.report_id(row))
+        elif index.column() == 10:
+            self.confirmDelete(row)
 
     # Метод для добавления новой строки в таблицу
     def add_row(self):
-        # Получение текущего количества строк и добавление новой строки
-        row_position = self.table.rowCount()
-        self.table.insertRow(row_position)
-
-        # Инициализация db_paths для новой строки
-        self.db_paths[row_position] = {"view_button": None, "db_path": None}
-
-        # Для каждой ячейки создаем виджет QLabel (или другой виджет по выбору)
-        for i in range(self.table.columnCount() - 3):  # Исключая столбцы для кнопок
-            self.table.setCellWidget(row_position, i, QLabel(""))
-
-        # Кнопка "Добавить"
-        add_button = QPushButton("Добавить", self.table)
-        # Изменение лямбда-функции для передачи текущей строки
-        add_button.clicked.connect(lambda _, row=row_position: self.openFileDialog(row))
-        self.table.setCellWidget(row_position, 5, add_button)
-
-        # Создание кнопки "Просмотреть" и сохранение ссылки на неё в db_paths
-        view_button = QPushButton("Просмотреть", self.table)
-        view_button.setEnabled(False)
-        view_button.clicked.connect(lambda _, row=row_position: self.viewDialog(row))
-        self.table.setCellWidget(row_position, 6, view_button)
-        self.db_paths[row_position]["view_button"] = view_button
-
-        # Создание кнопки "Удалить"
-        delete_button = QPushButton("❌", self.table)
-        delete_button.clicked.connect(lambda: self.confirmDelete(delete_button))
-        self.table.setCellWidget(row_position, 7, delete_button)
+        self.registry_model.add_empty_row()
 
     # Метод для подтверждения удаления строки из таблицы
-    def confirmDelete(self, button):
-        row = self.table.indexAt(button.pos()).row()
-        if row >= 0:
-            confirm_dialog = ConfirmDeleteDialog(self)
-            if confirm_dialog.exec() == QDialog.DialogCode.Accepted:
-                report_id = self.get_report_id(row)
-                if report_id:
-                    self.delete_report_from_db(report_id)
-                self.table.removeRow(row)  # Удаляем строку из таблицы независимо от наличия в базе данных
-                self.update_ui_after_deletion(row)
-
-    # Метод доя получения идентификатора отчета на основе строки таблицы
-    def get_report_id(self, row):
-        # Получение даты и времени изменения файла из первой ячейки строки
-        date_modified_item = self.table.item(row, 0)
-        date_modified = date_modified_item.text() if date_modified_item else None
-
-        if date_modified:
-            # Поиск записи в базе данных по дате и времени изменения
-            report = self.session.query(ReportData).filter_by(date_modified=date_modified).first()
-            if report:
-                return report.id
-
-        return None
-
-    # Метод для удаления отчета из базы данных
+    def confirmDelete(self, row):
+        confirm_dialog = ConfirmDeleteDialog(self)
+        if confirm_dialog.exec() == QDialog.DialogCode.Accepted:
+            report_id = self.registry_model.report_id(row)
+            if report_id:
+                if not self.delete_report_from_db(report_id):
+                    return
+                self.input_data.pop(report_id, None)
+            self.registry_model.remove_row(row)  # Удаляем строку из таблицы независимо от наличия в базе данных
+
+    # Метод для удаления отчета из базы данных вместе с файлом БД (см. rkot.integrity.delete_report).
+    # Возвращает False, если файл не удалось удалить и отчет оставлен в реестре
     def delete_report_from_db(self, report_id):
         report = self.session.get(ReportData, report_id)
         if report:
             db_file_path = report.db_path
-            self.session.delete(report)
-            self.session.commit()
-
-            if db_file_path and os.path.exists(db_file_path):
-                try:
-                    os.remove(db_file_path)
-                    print(f"Файл {db_file_path} успешно удален")
-                except OSError as e:
-                    print(f"Ошибка при удалении файла {db_file_path}: {e.strerror}. Файл не удален.")
-                    self.session.add(report)
-                    self.session.commit()
-
-    # Метод для обновления пользовательского интерфейса после удаления строки
-    def update_ui_after_deletion(self, deleted_row):
-        if deleted_row in self.db_paths:
-            del self.db_paths[deleted_row]
-        if deleted_row in self.input_data:
-            del self.input_data[deleted_row]
-
-        # Обновление индексов в db_paths и input_data
-        new_db_paths = {}
-        new_input_data = {}
-        for row_index in range(self.table.rowCount()):
-            if row_index in self.db_paths:
-                new_db_paths[row_index] = self.db_paths[row_index]
-            if row_index in self.input_data:
-                new_input_data[row_index] = self.input_data[row_index]
-
-        self.db_paths = new_db_paths
-        self.input_data = new_input_data
+            try:
+                integrity.delete_report(self.session, report)
+            except OSError as e:
+                log.error("Ошибка при удалении файла %s: %s. Отчет не удален.", db_file_path, e.strerror)
+                QMessageBox.warning(self, "Удаление отчета",
+                                    f"Не удалось удалить файл {db_file_path}: {e.strerror}. Отчет не удален.")
+                return False
+            log.info("Отчет %s удален вместе с файлом %s", report_id, db_file_path)
+        return True
 
     # Метод для открытия диалога выбора файла и загрузки данных в БД
-    def openFileDialog(self, row):
+    def openFileDialog(self, placeholder=None):
         current_datetime = datetime.datetime.now()
         current_datetime = current_datetime.replace(microsecond=0)
-        datetime_for_name = current_datetime.strftime("%d%m%Y_%H%M%S")
-        datetime_for_db = current_datetime.strftime("%d.%m.%Y %H:%M:%S")
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите файл Excel", "", "Excel Files (*.xlsx *.xls)")
         if file_path:
-            db_path = self.excel_to_db(file_path, datetime_for_name)
-            db_file_name = os.path.basename(db_path)  # Получаем имя файла базы данных
-            print(f"Данные сохранены в {db_path}")
-
-            # Создаем новую запись в базе данных
-            report = ReportData(date_modified=datetime_for_db, file_name=db_file_name, db_path=db_path)
-            self.session.add(report)
+            self.excel_to_db(file_path, lambda result: self.register_report(result, current_datetime, placeholder))
+
+    # Метод для добавления записи о загруженном отчете после завершения фоновой загрузки.
+    # Если проверка протокола нашла ошибки, отчет добавляется только после подтверждения пользователя.
+    # placeholder - пустая строка таблицы, которую заменяет добавленный отчет
+    def register_report(self, result, modified_at, placeholder=None):
+        if result.duplicate_of is not None:
+            QMessageBox.information(self, "Загрузка отчета",
+                                    f"Файл {os.path.basename(result.excel_path)} уже загружен "
+                                    f"(отчет {result.duplicate_of}).")
+            return
+        db_path = result.db_path
+        db_file_name = os.path.basename(db_path)  # Получаем имя файла базы данных
+        report_check = result.validation
+        if report_check and report_check.error_count and QMessageBox.question(
+                self, "Проверка протокола",
+                f"Протокол {os.path.basename(result.excel_path)} не прошел проверку "
+                f"({validation.describe(report_check)}).\nДобавить отчет в реестр?"
+        ) != QMessageBox.StandardButton.Yes:
+            integrity.remove_file(db_path)
+            log.info("%s: отчет не добавлен в реестр после проверки", result.excel_path)
+            return
+        log.info("Данные сохранены в %s", db_path)
+
+        # Создаем новую запись в базе данных
+        report = ReportData(file_name=db_file_name, db_path=db_path)
+        report.set_modified(modified_at)
+        report.set_source(result.digest, result.size, result.mtime)
+        if report_check and report_check.period:
+            report.set_period(*report_check.period) # Период контроля из шапки протокола
+        self.session.add(report)
+        try:
             self.session.commit()
+        except Exception as e:
+            # Файл отчета без записи в реестре не сохраняется
+            self.session.rollback()
+            integrity.remove_file(db_path)
+            log.exception("%s: не удалось добавить отчет в реестр", db_path)
+            QMessageBox.warning(self, "Загрузка отчета", f"Не удалось добавить отчет в реестр!\n{e}")
+            return
+        sync.report_updated(self.registry_path, report.id, db_path, report_stats=result.stats)
+
+        # Добавляем строку в таблицу
+        self.registry_model.add_report(report, placeholder)
+
+    # Метод для пакетной загрузки всех excel файлов из выбранной папки
+    def openFolderDialog(self):
+        folder = QFileDialog.getExistingDirectory(self, "Выберите папку с протоколами")
+        if not folder:
+            return
+        from rkot.ingest import find_excel_files, register_batch
+
+        files = find_excel_files(folder)
+        if not files:
+            QMessageBox.information(self, "Пакетная загрузка", "В папке нет файлов Excel.")
+            return
+
+        worker = BatchImportWorker(files, self.data_folder)
+        progress_dialog = QProgressDialog(f"Загрузка файлов из {folder}...", "Отмена", 0, len(files), self)
+        progress_dialog.setWindowTitle("Пакетная загрузка")
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.canceled.connect(worker.cancel)
+
+        def finish():
+            progress_dialog.canceled.disconnect(worker.cancel)
+            progress_dialog.close()
+            self.import_workers.discard(worker)
+
+        def on_finished(results):
+            finish()
+            reports = register_batch(self.session, results)
+            for report in reports:
+                self.registry_model.add_report(report)
+            checked = sum(bool(result.validation and result.validation.path) for result in results)
+            QMessageBox.information(self, "Пакетная загрузка",
+                                    f"Загружено файлов: {len(reports)} из {len(files)}, "
+                                    f"пропущено уже загруженных: {len(results) - len(reports)}" +
+                                    (f"\nФайлов с замечаниями проверки: {checked} (отчеты в папке "
+                                     f"{validation.validation_folder(self.data_folder)})" if checked else ""))
+
+        def on_failed(message):
+            finish()
+            QMessageBox.warning(self, "Error!", f"Пакетная загрузка не выполнена!\n{message}")
+
+        worker.signals.progress.connect(lambda done, total: progress_dialog.setValue(done))
+        worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(on_failed)
+        self.import_workers.add(worker)
+        QThreadPool.globalInstance().start(worker)
+
+    # Метод для выгрузки всех отчетов реестра в файл Parquet или Arrow IPC в фоновом потоке
+    def exportDialog(self):
+        selected_ids = self.selected_report_ids()
+        filter_dialog = ExportFilterDialog(len(selected_ids), self)
+        if filter_dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        ids = selected_ids if filter_dialog.selectedBox.isChecked() else None
+        reports = [report_source(report) for report in query_reports(self.session, ids=ids, **filter_dialog.filters())]
+        if not reports:
+            QMessageBox.information(self, "Выгрузка отчетов", "Нет отчетов, удовлетворяющих условиям отбора.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Выгрузка отчетов", "reports.xlsx",
+                                              "Excel (*.xlsx);;CSV (*.csv);;Parquet (*.parquet);;Arrow IPC (*.arrow)")
+        if not path:
+            return
+        worker = ExportWorker(reports, path)
+        progress_dialog = QProgressDialog(f"Выгрузка в {os.path.basename(path)}...", "Отмена", 0, len(reports), self)
+        progress_dialog.setWindowTitle("Выгрузка отчетов")
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.canceled.connect(worker.cancel)
+
+        def finish():
+            progress_dialog.canceled.disconnect(worker.cancel)
+            progress_dialog.close()
+            self.import_workers.discard(worker)
+
+        def on_finished(report_count, row_count):
+            finish()
+            QMessageBox.information(self, "Выгрузка отчетов",
+                                    f"Выгружено отчетов: {report_count}, строк: {row_count}")
+
+        def on_failed(message):
+            finish()
+            QMessageBox.warning(self, "Error!", f"Выгрузка не выполнена!\n{message}")
+
+        worker.signals.progress.connect(lambda done, total: progress_dialog.setValue(done))
+        worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(on_failed)
+        worker.signals.cancelled.connect(finish)
+        self.import_workers.add(worker)
+        QThreadPool.globalInstance().start(worker)
+
+    # Метод для отбора отчетов реестра по статистике их таблиц
+    def statsFilterDialog(self):
+        dialog = StatsFilterDialog(stats.value_columns(self.registry_path), self.registry_model.filters, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.registry_model.set_filters(dialog.filters())
+        if self.registry_model.filters:
+            self.statusBar().showMessage(f"Отбор по статистике: отчетов {self.registry_model.total}")
+        else:
+            self.statusBar().clearMessage()
+
+    # Метод для обслуживания папки данных в фоновом потоке с отчетом об освобожденном месте
+    def maintenanceDialog(self):
+        dialog = MaintenanceDialog(self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        keep_days, archive_after = dialog.keepBox.value(), dialog.archiveBox.value()
+        if keep_days and QMessageBox.question(
+                self, "Обслуживание хранилища",
+                f"Отчеты, период контроля которых закончился более {keep_days} дней назад, будут удалены. Продолжить?"
+        ) != QMessageBox.StandardButton.Yes:
+            return
+        worker = MaintenanceWorker(self.data_folder, keep_days, archive_after, dialog.vacuumBox.isChecked())
+        progress_dialog = QProgressDialog("Обслуживание хранилища...", None, 0, 0, self)
+        progress_dialog.setWindowTitle("Обслуживание хранилища")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal) # Отчеты не открываются во время переноса
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+
+        def finish():
+            progress_dialog.close()
+            self.import_workers.discard(worker)
+            self.session.expire_all() # Отчеты изменены в другой сессии
+            self.registry_model.reload()
+
+        def on_finished(steps):
+            finish()
+            reclaimed = sum(step.size_before - step.size_after for step in steps) / 1024 / 1024
+            QMessageBox.information(self, "Обслуживание хранилища",
+                                    "\n".join(maintenance.describe(step) for step in steps) +
+                                    f"\n\nОсвобождено: {reclaimed:.1f} МБ за {sum(step.seconds for step in steps):.1f} с")
+
+        def on_failed(message):
+            finish()
+            QMessageBox.warning(self, "Error!", f"Обслуживание не выполнено!\n{message}")
+
+        def on_progress(done, total):
+            progress_dialog.setMaximum(total)
+            progress_dialog.setValue(done)
+
+        worker.signals.progress.connect(on_progress)
+        worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(on_failed)
+        self.import_workers.add(worker)
+        QThreadPool.globalInstance().start(worker)
+
+    # Метод для включения и отключения наблюдения за папкой входящих протоколов
+    def toggleInboxWatch(self, checked):
+        if self.inbox_watcher:
+            self.inbox_watcher.stop()
+            self.inbox_watcher = None
+            self.statusBar().clearMessage()
+        if not checked:
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Выберите папку входящих протоколов")
+        if not folder:
+            self.watch_action.blockSignals(True)
+            self.watch_action.setChecked(False)
+            self.watch_action.blockSignals(False)
+            return
+        self.inbox_watcher = InboxWatcher(folder, self)
+        self.inbox_watcher.reportAdded.connect(self.registry_model.add_report)
+        self.inbox_watcher.statusChanged.connect(self.statusBar().showMessage)
+        self.inbox_watcher.update_status()
+
+    # Метод для получения идентификаторов выделенных в реестре отчетов
+    def selected_report_ids(self):
+        rows = {self.search_proxy.mapToSource(index).row() for index in self.table.selectionModel().selectedIndexes()}
+        return sorted({self.registry_model.report_id(row) for row in rows} - {None})
 
-            # Обновляем таблицу и db_paths
-            self.load_data_from_db()
-            self.db_paths[report.id] = {
-                "view_button": self.table.cellWidget(row, 6),
-                "db_path": db_path
-            }
+    # Метод для открытия сводки по выделенным в реестре отчетам (если ничего не выделено - по всем)
+    def summaryDialog(self):
+        dialog = SummaryDialog(self.registry_path, self.selected_report_ids() or None, self)
+        dialog.exec()
+
+    # Метод для открытия окна диагностики
+    def diagnosticsDialog(self):
+        DiagnosticsDialog(self).exec()
 
     # Метод для открытия диалогового окна для просмотра и редактирования данных отчета
     def viewDialog(self, report_id):
         # Получаем путь к файлу базы данных и другие данные по ID отчета
         report = self.session.query(ReportData).filter(ReportData.id == report_id).first()
+        if report and report.archive_path:
+            # Архивный отчет восстанавливается в файл БД при открытии
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                maintenance.restore_report(self.session, report)
+            except Exception as e:
+                log.exception("Отчет %s: не удалось восстановить из архива", report_id)
+                QMessageBox.warning(self, "Error!", f"Не удалось восстановить отчет из архива!\n{e}")
+                return
+            finally:
+                QApplication.restoreOverrideCursor()
+            self.registry_model.update_report(report)
         if report and report.db_path:
             dialog = DataViewDialog(report.db_path, report_id, self.engine, self)
             if report_id in self.input_data:
@@ -561,22 +1608,47 @@ class MainWindow(QMainWindow):
             if dialog.exec() == QDialog.DialogCode.Accepted:
                 self.input_data[report_id] = dialog.get_input_data()
         else:
-            print("Файл не загружен.")
-
-    # Метод для чтения данных из excel файла и записи их в базу данных
-    def excel_to_db(self, excel_path, timestamp):
-        # Чтение данных из excel файла
-        df = pd.read_excel(excel_path, header=16)
+            log.warning("Отчет %s: файл не загружен.", report_id)
+
+    # Метод для чтения данных из excel файла и записи их в базу данных в фоновом потоке.
+    # По завершении загрузки вызывается on_finished(ImportResult)
+    def excel_to_db(self, excel_path, on_finished):
+        # Уникальное имя файла новой БД: загрузки, начатые в одну секунду, не должны использовать один файл.
+        # Файл отмечен как записываемый и не будет удален проверкой папки данных до добавления в реестр
+        db_path = integrity.new_db_path(self.data_folder)
+
+        worker = ImportWorker(excel_path, db_path, self.registry_path, cache.cache_folder(self.data_folder))
+        progress_dialog = QProgressDialog(f"Загрузка {os.path.basename(excel_path)}...", "Отмена", 0, 100, self)
+        progress_dialog.setWindowTitle("Загрузка отчета")
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.canceled.connect(worker.cancel)
+
+        # Метод для завершения загрузки: закрытие окна прогресса и освобождение задачи
+        def finish():
+            progress_dialog.canceled.disconnect(worker.cancel)
+            progress_dialog.close()
+            self.import_workers.discard(worker)
+
+        def on_failed(message):
+            finish()
+            dlg = QMessageBox(self)
+            dlg.setWindowTitle("Error!")
+            dlg.setIcon(QMessageBox.Icon.Warning)
+            dlg.setText(f"Не удалось загрузить файл!\n{message}")
+            dlg.exec()
 
-        # Создание уникального имени файла для новой БД
-        db_name = f"database_{timestamp}.db"
-        db_path = os.path.join(self.data_folder, db_name)
+        def on_success(result):
+            finish()
+            on_finished(result)
 
-        # Запись данных в новую БД
-        local_engine = create_engine(f'sqlite:///{db_path}')
-        df.to_sql('new_table', con=local_engine, if_exists='replace', index=False)
-        local_engine.dispose()  # Явное закрытие соединения с БД
-        return db_path
+        worker.signals.progress.connect(
+            lambda done, total: progress_dialog.setValue(round(done * 100 / total) if total else 0))
+        worker.signals.finished.connect(on_success)
+        worker.signals.failed.connect(on_failed)
+        worker.signals.cancelled.connect(finish)
+        self.import_workers.add(worker) # Храним ссылку, пока задача выполняется
+        QThreadPool.globalInstance().start(worker)
+        return worker
 
     # Метод для настройки пунктов меню и их функций
     def _instrument(self):
@@ -584,6 +1656,42 @@ class MainWindow(QMainWindow):
 
         file_menu = menu.addMenu("Инструменты")
 
+        # Пакетная загрузка папки с протоколами
+        batch_import_action = QAction("Пакетная загрузка...", self)
+        batch_import_action.triggered.connect(self.openFolderDialog)
+        file_menu.addAction(batch_import_action)
+
+        # Автоматическая загрузка новых файлов из папки входящих протоколов
+        self.watch_action = QAction("Наблюдение за папкой...", self)
+        self.watch_action.setCheckable(True)
+        self.watch_action.toggled.connect(self.toggleInboxWatch)
+        file_menu.addAction(self.watch_action)
+
+        # Выгрузка отобранных отчетов в один файл XLSX, CSV, Parquet или Arrow IPC
+        export_action = QAction("Выгрузка отчетов...", self)
+        export_action.triggered.connect(self.exportDialog)
+        file_menu.addAction(export_action)
+
+        # Сводка показателей по выбранным (или всем) отчетам
+        summary_action = QAction("Сводка...", self)
+        summary_action.triggered.connect(self.summaryDialog)
+        file_menu.addAction(summary_action)
+
+        # Отбор отчетов по количеству строк и диапазону значений столбца
+        stats_filter_action = QAction("Отбор отчетов...", self)
+        stats_filter_action.triggered.connect(self.statsFilterDialog)
+        file_menu.addAction(stats_filter_action)
+
+        # Удаление и архивирование старых отчетов, сжатие файлов БД
+        maintenance_action = QAction("Обслуживание хранилища...", self)
+        maintenance_action.triggered.connect(self.maintenanceDialog)
+        file_menu.addAction(maintenance_action)
+
+        # Последние операции с длительностью и включение профилирования
+        diagnostics_action = QAction("Диагностика...", self)
+        diagnostics_action.triggered.connect(self.diagnosticsDialog)
+        file_menu.addAction(diagnostics_action)
+
         # Создаем действия для сортировки
         sort_asc_fd_action = QAction("По федеральному округу", self)
         sort_asc_cl_action = QAction("По месту проведения контроля", self)
@@ -621,25 +1729,32 @@ class MainWindow(QMainWindow):
 
     # Метод для сортировки данных в таблице
     def sort_data(self, column, order):
-        self.table.sortItems(column, order)
+        self.registry_model.sort(column, order)
 
-    # Метод для сброса сортировки данных в таблице
+    # Метод для сброса сортировки данных в таблице (порядок добавления отчетов)
     def reset_sort(self):
-        self.table.sortItems(0, Qt.SortOrder.AscendingOrder)
-
-# Запуск приложения
-app = QApplication(sys.argv)
-main_window = MainWindow()
-
-# Установка корректного размера окна
-screen_size = app.primaryScreen().size()
-full_window_width = int(screen_size.width() * 0.9)
-full_window_height = int(screen_size.height() * 0.8)
-window_width = int(screen_size.width() * 0.82)
-window_height = int(screen_size.height() * 0.6)
-main_window.setMaximumSize(window_width, window_height)
-main_window.setMinimumSize(window_width, window_height)
-main_window.show()
-
-# Выход из приложения
-sys.exit(app.exec())
+        self.registry_model.sort(-1)
+
+# Функция для запуска приложения, возвращает код завершения
+def run(argv):
+    global app, full_window_width, full_window_height
+
+    app = QApplication(argv)
+    main_window = MainWindow()
+
+    # Установка корректного размера окна
+    screen_size = app.primaryScreen().size()
+    full_window_width = int(screen_size.width() * 0.9)
+    full_window_height = int(screen_size.height() * 0.8)
+    window_width = int(screen_size.width() * 0.82)
+    window_height = int(screen_size.height() * 0.6)
+    main_window.setMaximumSize(window_width, window_height)
+    main_window.setMinimumSize(window_width, window_height)
+    main_window.show()
+    return app.exec()
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support() # Поддержка пула процессов в собранном исполняемом файле
+
+    # Запуск приложения и выход из него
+    sys.exit(run(sys.argv))
@@ -0,0 +1,2 @@
+# Ядро СПО РКОТ: реестр отчетов, загрузка протоколов и выгрузка данных.
+# Не зависит от PyQt6, поэтому может использоваться на серверах без графического интерфейса
@@ -0,0 +1,9 @@
+# Запуск командной строки: python -m rkot
+import multiprocessing
+import sys
+
+from rkot.cli import main
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support() # Поддержка пула процессов в собранном исполняемом файле
+    sys.exit(main())
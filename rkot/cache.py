@@ -0,0 +1,78 @@
+# Определение содержимого загружаемых файлов по хэшу и кэш разобранных книг.
+# Хэш SHA-256 исходного файла сохраняется в реестре и позволяет не загружать повторно уже
+# загруженную книгу. Разобранная таблица сохраняется в папке data/cache в формате Parquet под именем
+# по хэшу: повторная загрузка той же книги (например, после удаления отчета) читает Parquet вместо excel.
+# Общий размер кэша ограничен, при превышении удаляются файлы, к которым дольше всего не обращались.
+# Без установленного pyarrow кэш не используется, проверка повторной загрузки работает всегда
+import datetime
+import hashlib
+import os
+
+from rkot import columnar, schema
+from rkot.diagnostics import log
+
+HASH_CHUNK_SIZE = 1024 * 1024  # Размер блока чтения файла при вычислении хэша
+CACHE_MAX_BYTES = int(os.environ.get('RKOT_CACHE_MAX_MB', 512)) * 1024 * 1024  # Предельный размер кэша
+
+# Функция для получения хэша содержимого, размера и времени изменения файла
+def file_signature(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    stat = os.stat(path)
+    return digest.hexdigest(), stat.st_size, datetime.datetime.fromtimestamp(stat.st_mtime)
+
+# Функция для получения пути к папке кэша в папке данных
+def cache_folder(data_folder):
+    return os.path.join(data_folder, "cache")
+
+# Функция для получения пути к файлу кэша по хэшу книги.
+# Версия схемы в имени файла исключает использование таблиц, разобранных по прежним правилам
+def cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, f"{digest}.v{schema.SCHEMA_VERSION}.parquet")
+
+# Функция для поиска разобранной книги в кэше. Возвращает путь к файлу или None.
+# Время изменения файла обновляется и служит временем последнего обращения при вытеснении
+def lookup(cache_dir, digest):
+    path = cache_path(cache_dir, digest)
+    if not columnar.is_available() or not os.path.exists(path):
+        return None
+    os.utime(path)
+    return path
+
+# Функция для сохранения таблицы загруженного отчета в кэш с последующим вытеснением старых файлов.
+# Ошибка записи кэша не прерывает загрузку. Возвращает путь к файлу кэша или None
+def store(cache_dir, digest, db_path, max_bytes=CACHE_MAX_BYTES):
+    if not columnar.is_available():
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, digest)
+    partial = f"{path}.{os.getpid()}.tmp"
+    try:
+        columnar.sqlite_to_parquet(db_path, partial)
+        os.replace(partial, path)
+    except Exception as e:
+        log.warning("%s: не удалось сохранить в кэш - %s", db_path, e)
+        if os.path.exists(partial):
+            os.remove(partial)
+        return None
+    evict(cache_dir, max_bytes)
+    return path
+
+# Функция для удаления файлов кэша, к которым дольше всего не обращались, пока размер кэша превышает max_bytes
+def evict(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name.endswith(".parquet"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue # Файл читается другим процессом, будет удален при следующей записи
+        total -= size
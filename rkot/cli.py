@@ -0,0 +1,299 @@
+# Командная строка СПО РКОТ для работы без графического интерфейса:
+#   python -m rkot import <папка или шаблон> [--workers N] [--strict]
+#   python -m rkot validate <папка или шаблон>
+#   python -m rkot list [--sort date|district|location|period|rows|values|empty] [--desc] [--limit N] [--offset N]
+#                       [--min-rows N] [--max-rows N] [--column СТОЛБЕЦ] [--value-from ЧИСЛО] [--value-to ЧИСЛО]
+#   python -m rkot stats <id отчета>
+#   python -m rkot export <id отчета> <файл.csv|.parquet|.arrow>
+#   python -m rkot export-all <файл.parquet|.arrow|.csv|.xlsx> [--district ФО] [--location МЕСТО] [--from ДАТА] [--to ДАТА]
+#   python -m rkot migrate
+#   python -m rkot query [--column ОПЕРАТОР] [--parameter ПОКАЗАТЕЛЬ] [--district ФО] [--location МЕСТО]
+#   python -m rkot summary [--by operator,district,location,period] [--parameter ПОКАЗАТЕЛЬ]
+#   python -m rkot cleanup
+#   python -m rkot watch <папка> [--interval 2] [--queue 8] [--workers N]
+#   python -m rkot maintain [--keep ДНЕЙ] [--archive-after ДНЕЙ] [--no-vacuum]
+import argparse
+import datetime
+import sys
+
+from rkot import diagnostics
+from rkot.registry import (ReportData, Session, PERIOD_DATE_FORMAT, SORT_COLUMNS, get_data_folder, open_registry,
+                           query_reports, registry_path)
+
+# Команда пакетной загрузки файлов
+def command_import(args, data_folder, session):
+    from rkot import validation
+    from rkot.ingest import find_excel_files, import_batch, register_batch
+
+    files = find_excel_files(args.source)
+    if not files:
+        print(f"Файлы Excel не найдены: {args.source}")
+        return 1
+    results = import_batch(files, data_folder, args.workers, strict=args.strict or None)
+    reports = register_batch(session, results)
+    print(f"Добавлено в реестр отчетов: {len(reports)}")
+    for result in results:
+        if result.validation and result.validation.path:
+            print(f"{result.excel_path}: замечания проверки - {validation.describe(result.validation)}")
+    return 0
+
+# Команда проверки протоколов без загрузки: выводит замечания по строкам, код возврата 1 при ошибках
+def command_validate(args, data_folder, session):
+    from rkot import validation
+    from rkot.ingest import find_excel_files
+
+    files = find_excel_files(args.source)
+    if not files:
+        print(f"Файлы Excel не найдены: {args.source}")
+        return 1
+    failed = False
+    for excel_path in files:
+        try:
+            report = validation.validate_file(excel_path)
+        except Exception as e:
+            print(f"{excel_path}: ошибка чтения - {e}")
+            failed = True
+            continue
+        print(f"{excel_path}: {validation.describe(report)}")
+        for issue in report.issues:
+            print("\t".join(["" if value is None else str(value) for value in (
+                issue.row, issue.column, issue.rule, validation.SEVERITY_NAMES[issue.severity], issue.value,
+                issue.message)]))
+        failed = failed or bool(report.error_count)
+    return 1 if failed else 0
+
+# Команда вывода реестра отчетов со статистикой таблиц (строк, числовых значений, пустых ячеек)
+def command_list(args, data_folder, session):
+    from rkot import stats
+
+    stats.ensure_stats(registry_path(data_folder))
+    query = query_reports(session, args.sort, args.desc, rows_from=args.min_rows, rows_to=args.max_rows,
+                          column=args.column, value_from=args.value_from, value_to=args.value_to)
+    query = query.offset(args.offset)
+    if args.limit:
+        query = query.limit(args.limit)
+    for report in query:
+        print("\t".join(str(value) if value is not None else "" for value in (
+            report.id, report.date_modified, report.file_name, report.federal_district,
+            report.control_location, report.control_period, report.row_count, report.value_count,
+            report.empty_count)))
+    return 0
+
+# Команда вывода статистики столбцов отчета (без чтения файла отчета)
+def command_stats(args, data_folder, session):
+    from rkot import stats
+
+    stats.ensure_stats(registry_path(data_folder), [args.report_id])
+    columns = stats.column_stats(registry_path(data_folder), args.report_id)
+    if not columns:
+        print(f"Статистика отчета {args.report_id} не найдена")
+        return 1
+    print("\t".join(["column", "values", "empty", "min", "max", "mean"]))
+    for row in columns:
+        print("\t".join("" if value is None else str(value) for value in row))
+    return 0
+
+# Команда выгрузки отчета в CSV файл или в колоночном формате (по расширению файла)
+def command_export(args, data_folder, session):
+    from rkot.export import export_report_csv, export_reports_arrow, report_source
+
+    report = session.get(ReportData, args.report_id)
+    if not report or not report.db_path:
+        print(f"Отчет {args.report_id} не найден")
+        return 1
+    if report.archive_path:
+        from rkot.maintenance import restore_report
+
+        restore_report(session, report)
+        print(f"Отчет {args.report_id} восстановлен из архива")
+    if args.output.lower().endswith('.csv'):
+        row_count = export_report_csv(report.db_path, args.output)
+    else:
+        _, row_count = export_reports_arrow([report_source(report)], args.output)
+    print(f"Выгружено строк: {row_count} в {args.output}")
+    return 0
+
+# Команда выгрузки всех отчетов реестра в один файл Parquet или Arrow IPC
+def command_export_all(args, data_folder, session):
+    from rkot.export import export_reports, report_source
+
+    reports = [report_source(report) for report in query_reports(
+        session, district=args.district, location=args.location, period_from=args.period_from,
+        period_to=args.period_to)]
+    report_count, row_count = export_reports(
+        reports, args.output, progress=lambda done, total: print(f"{done}/{total}", end="\r"))
+    print(f"Выгружено отчетов: {report_count}, строк: {row_count} в {args.output}")
+    return 0
+
+# Команда переноса отчетов в сводное хранилище измерений
+def command_migrate(args, data_folder, session):
+    from rkot import store
+
+    migrated, row_count = store.migrate(registry_path(data_folder),
+                                        progress=lambda done, total: print(f"{done}/{total}", end="\r"))
+    print(f"Перенесено отчетов: {migrated}, значений в сводной таблице: {row_count}")
+    return 0
+
+# Команда выборки значений из сводного хранилища
+def command_query(args, data_folder, session):
+    from rkot import store
+
+    path = registry_path(data_folder)
+    if not store.is_enabled(path):
+        print("Сводное хранилище не создано, выполните: python -m rkot migrate")
+        return 1
+    for row in store.query_measurements(path, args.column, args.parameter, args.district, args.location):
+        print("\t".join("" if value is None else str(value) for value in row))
+    return 0
+
+# Команда вывода сводки показателей по всем отчетам
+def command_summary(args, data_folder, session):
+    from rkot import summary
+
+    by = [group for group in args.by.split(",") if group]
+    unknown = [group for group in by if group not in summary.GROUPS]
+    if unknown or not by:
+        print(f"Неизвестное измерение группировки: {', '.join(unknown)}; допустимые: {', '.join(summary.GROUPS)}")
+        return 1
+    columns, rows = summary.summarize(registry_path(data_folder), by, args.parameter)
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+    return 0
+
+# Команда проверки папки данных: удаление файлов и записей реестра, оставшихся после сбоев
+def command_cleanup(args, data_folder, session):
+    from rkot import integrity
+
+    files, reports = integrity.collect_garbage(session, data_folder)
+    print(f"Удалено файлов: {files}, записей реестра без файла: {reports}")
+    return 0
+
+# Функция для разбора даты периода контроля в аргументе командной строки
+def parse_date(value):
+    try:
+        return datetime.datetime.strptime(value, PERIOD_DATE_FORMAT).date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается дата в формате ДД.ММ.ГГГГ: {value}")
+
+# Команда наблюдения за папкой входящих протоколов (до прерывания Ctrl+C)
+def command_watch(args, data_folder, session):
+    from rkot import inbox
+
+    try:
+        inbox.watch(args.folder, data_folder, session, args.workers, args.queue, args.interval)
+    except KeyboardInterrupt:
+        print("Наблюдение остановлено")
+    return 0
+
+# Команда обслуживания папки данных: удаление и архивирование старых отчетов, сжатие файлов БД
+def command_maintain(args, data_folder, session):
+    from rkot import maintenance
+
+    keep_days = maintenance.RETENTION_DAYS if args.keep is None else args.keep
+    archive_after = maintenance.ARCHIVE_AFTER_DAYS if args.archive_after is None else args.archive_after
+    steps = maintenance.maintain(session, data_folder, keep_days, archive_after, not args.no_vacuum)
+    for step in steps:
+        print(maintenance.describe(step))
+    reclaimed = sum(step.size_before - step.size_after for step in steps)
+    print(f"Освобождено: {reclaimed / 1024 / 1024:.1f} МБ за {sum(step.seconds for step in steps):.1f} с")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rkot", description="СПО РКОТ")
+    parser.add_argument('--data', help="папка с базами данных (по умолчанию data рядом с программой)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="пакетная загрузка файлов из папки или по шаблону")
+    import_parser.add_argument('source', help="папка или шаблон имени, например \"protocols/*.xls\"")
+    import_parser.add_argument('--workers', type=int, default=None, help="количество процессов загрузки")
+    import_parser.add_argument('--strict', action='store_true',
+                               help="не загружать протоколы с ошибками проверки (по умолчанию RKOT_STRICT_VALIDATION)")
+    import_parser.set_defaults(handler=command_import)
+
+    validate_parser = commands.add_parser('validate', help="проверка протоколов без загрузки в реестр")
+    validate_parser.add_argument('source', help="файл, папка или шаблон имени, например \"protocols/*.xls\"")
+    validate_parser.set_defaults(handler=command_validate)
+
+    list_parser = commands.add_parser('list', help="список загруженных отчетов")
+    list_parser.add_argument('--sort', choices=SORT_COLUMNS, default='id', help="столбец сортировки")
+    list_parser.add_argument('--desc', action='store_true', help="сортировка по убыванию")
+    list_parser.add_argument('--limit', type=int, default=None, help="количество выводимых отчетов")
+    list_parser.add_argument('--offset', type=int, default=0, help="количество пропускаемых отчетов")
+    list_parser.add_argument('--min-rows', type=int, help="не меньше N строк в таблице отчета")
+    list_parser.add_argument('--max-rows', type=int, help="не больше N строк в таблице отчета")
+    list_parser.add_argument('--column', help="столбец (оператор), по значениям которого отбираются отчеты")
+    list_parser.add_argument('--value-from', type=float, help="в столбце --column есть значения не меньше заданного")
+    list_parser.add_argument('--value-to', type=float, help="в столбце --column есть значения не больше заданного")
+    list_parser.set_defaults(handler=command_list)
+
+    stats_parser = commands.add_parser('stats', help="статистика столбцов отчета")
+    stats_parser.add_argument('report_id', type=int, help="идентификатор отчета (см. list)")
+    stats_parser.set_defaults(handler=command_stats)
+
+    export_parser = commands.add_parser('export', help="выгрузка отчета в CSV, Parquet или Arrow IPC файл")
+    export_parser.add_argument('report_id', type=int, help="идентификатор отчета (см. list)")
+    export_parser.add_argument('output', help="путь к файлу .csv, .parquet или .arrow")
+    export_parser.set_defaults(handler=command_export)
+
+    export_all_parser = commands.add_parser('export-all', help="выгрузка отчетов в один файл Parquet, Arrow IPC, CSV или XLSX")
+    export_all_parser.add_argument('output', help="путь к файлу .parquet, .arrow, .csv или .xlsx")
+    export_all_parser.add_argument('--district', help="часть названия федерального округа")
+    export_all_parser.add_argument('--location', help="часть названия места проведения контроля")
+    export_all_parser.add_argument('--from', dest='period_from', type=parse_date,
+                                   help="начало периода контроля (ДД.ММ.ГГГГ)")
+    export_all_parser.add_argument('--to', dest='period_to', type=parse_date,
+                                   help="конец периода контроля (ДД.ММ.ГГГГ)")
+    export_all_parser.set_defaults(handler=command_export_all)
+
+    migrate_parser = commands.add_parser('migrate', help="перенос отчетов в сводное хранилище измерений")
+    migrate_parser.set_defaults(handler=command_migrate)
+
+    query_parser = commands.add_parser('query', help="выборка значений по всем отчетам из сводного хранилища")
+    query_parser.add_argument('--column', help="столбец (оператор связи)")
+    query_parser.add_argument('--parameter', help="часть названия показателя")
+    query_parser.add_argument('--district', help="федеральный округ")
+    query_parser.add_argument('--location', help="место проведения контроля")
+    query_parser.set_defaults(handler=command_query)
+
+    summary_parser = commands.add_parser('summary', help="сводка показателей по операторам, округам и периодам")
+    summary_parser.add_argument('--by', default='operator',
+                                help="измерения группировки через запятую: operator, district, location, period")
+    summary_parser.add_argument('--parameter', help="показатель (по умолчанию все)")
+    summary_parser.set_defaults(handler=command_summary)
+
+    cleanup_parser = commands.add_parser('cleanup', help="удаление файлов и записей реестра, оставшихся после сбоев")
+    cleanup_parser.set_defaults(handler=command_cleanup)
+
+    watch_parser = commands.add_parser('watch', help="загрузка новых и измененных файлов из папки по мере их появления")
+    watch_parser.add_argument('folder', help="папка входящих протоколов")
+    watch_parser.add_argument('--interval', type=float, default=2, help="интервал проверки папки в секундах")
+    watch_parser.add_argument('--queue', type=int, default=8, help="предельное количество одновременно загружаемых файлов")
+    watch_parser.add_argument('--workers', type=int, help="количество процессов загрузки")
+    watch_parser.set_defaults(handler=command_watch)
+
+    maintain_parser = commands.add_parser('maintain', help="удаление и архивирование старых отчетов, сжатие файлов БД")
+    maintain_parser.add_argument('--keep', type=int,
+                                 help="удалять отчеты через N дней после окончания периода контроля "
+                                      "(0 - не удалять, по умолчанию RKOT_RETENTION_DAYS)")
+    maintain_parser.add_argument('--archive-after', type=int,
+                                 help="переносить отчеты в архив через N дней после окончания периода контроля "
+                                      "(0 - не переносить, по умолчанию RKOT_ARCHIVE_AFTER_DAYS)")
+    maintain_parser.add_argument('--no-vacuum', action='store_true', help="не сжимать файлы БД")
+    maintain_parser.set_defaults(handler=command_maintain)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    data_folder = get_data_folder(args.data)
+    diagnostics.configure(data_folder)
+    engine = open_registry(data_folder)
+    session = Session(bind=engine)
+    try:
+        return args.handler(args, data_folder, session)
+    finally:
+        session.close()
+        engine.dispose()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# Перенос таблицы new_table отчета между SQLite и колоночным форматом Parquet (Apache Arrow).
+# Столбцы протокола РКОТ могут содержать значения разных типов (например, названия операторов
+# в первой строке и числа ниже), а столбец Arrow имеет один тип. Такой столбец сохраняется несколькими
+# столбцами Arrow - по одному на каждый тип значений SQLite, с суффиксом "::тип" в имени, поэтому
+# обратное преобразование восстанавливает значения и их типы без потерь. Типы значений каждого столбца
+# и объявленные типы SQLite записываются в метаданные схемы. pyarrow импортируется при первом обращении
+import json
+import sqlite3
+
+from rkot import schema
+from rkot.schema import quote
+
+ARROW_BATCH_SIZE = 5000         # Количество строк в одной пачке (row group) Parquet
+METADATA_KEY = b"rkot.columns"  # Ключ метаданных схемы с описанием столбцов
+STORAGE_CLASSES = {             # Типы значений SQLite и соответствующие им типы Python
+    'integer': int,
+    'real': float,
+    'text': str,
+    'blob': bytes,
+}
+
+# Функция для проверки, установлен ли pyarrow
+def is_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+# Функция для определения типов значений в столбцах таблицы.
+# Возвращает список словарей {name, decltype, parts}, parts - типы значений из STORAGE_CLASSES
+def column_kinds(connection, table="new_table"):
+    kinds = []
+    for _, name, decltype, *_ in connection.execute(f"PRAGMA table_info({table})").fetchall():
+        types = {row[0] for row in connection.execute(f"SELECT DISTINCT typeof({quote(name)}) FROM {table}")}
+        # Столбец без значений сохраняется как текстовый
+        parts = [part for part in STORAGE_CLASSES if part in types] or ['text']
+        kinds.append({'name': name, 'decltype': decltype, 'parts': parts})
+    return kinds
+
+# Функция для получения имени столбца Arrow для части столбца SQLite
+def part_name(column, part):
+    return column['name'] if len(column['parts']) == 1 else f"{column['name']}::{part}"
+
+# Функция для получения полей Arrow по описанию столбцов.
+# Текст столбцов, объявленных как TEXT (показатели и требования протокола, которые повторяются
+# из строки в строку и из отчета в отчет), хранится с кодированием словарем
+def arrow_fields(kinds):
+    import pyarrow as pa
+
+    types = {'integer': pa.int64(), 'real': pa.float64(), 'text': pa.string(), 'blob': pa.binary()}
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    return [pa.field(part_name(column, part),
+                     categorical if part == 'text' and column['decltype'] == schema.TEXT_TYPE else types[part])
+            for column in kinds for part in column['parts']]
+
+# Функция для получения схемы Arrow по описанию столбцов
+def arrow_schema(kinds):
+    import pyarrow as pa
+
+    return pa.schema(arrow_fields(kinds), metadata={METADATA_KEY: json.dumps(kinds, ensure_ascii=False)})
+
+# Функция для разбора пачки строк SQLite на списки значений полей Arrow (в порядке arrow_fields)
+def column_values(rows, kinds):
+    arrays = []
+    for i, column in enumerate(kinds):
+        values = [row[i] for row in rows]
+        if len(column['parts']) == 1:
+            arrays.append(values)
+            continue
+        for part in column['parts']:
+            accepted = (STORAGE_CLASSES[part],)
+            if part == 'real' and 'integer' not in column['parts']:
+                accepted = (int, float) # Целые числа объединены с дробными (см. merge_kinds)
+            arrays.append([v if type(v) in accepted else None for v in values])
+    return arrays
+
+# Функция для преобразования пачки строк SQLite в пачку Arrow
+def record_batch(rows, kinds, schema):
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(column_values(rows, kinds), schema)],
+        schema=schema)
+
+# Функция для объединения описаний столбцов нескольких таблиц в одно (для выгрузки нескольких отчетов
+# в один файл). Столбцы упорядочиваются по первому появлению, типы значений объединяются.
+# Целые и дробные числа в одном столбце хранятся одним дробным столбцом, удобным для анализа
+def merge_kinds(kinds_list):
+    merged = {}
+    for kinds in kinds_list:
+        for column in kinds:
+            parts = merged.setdefault(column['name'], {'name': column['name'], 'decltype': column['decltype'],
+                                                       'parts': []})['parts']
+            parts.extend(part for part in column['parts'] if part not in parts)
+    for column in merged.values():
+        if 'integer' in column['parts'] and 'real' in column['parts']:
+            column['parts'].remove('integer')
+        column['parts'].sort(key=list(STORAGE_CLASSES).index)
+    return list(merged.values())
+
+# Функция для потоковой записи таблицы new_table файла БД отчета в Parquet файл.
+# Возвращает количество строк
+def sqlite_to_parquet(db_path, parquet_path, batch_size=ARROW_BATCH_SIZE):
+    import pyarrow.parquet as pq
+
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        kinds = column_kinds(connection)
+        schema = arrow_schema(kinds)
+        cursor = connection.execute("SELECT * FROM new_table ORDER BY rowid")
+        row_count = 0
+        with pq.ParquetWriter(parquet_path, schema, compression='zstd') as writer:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                writer.write_batch(record_batch(rows, kinds, schema))
+                row_count += len(rows)
+    finally:
+        connection.close()
+    return row_count
+
+# Функция для получения описания столбцов (см. column_kinds) из метаданных Parquet файла,
+# записанного sqlite_to_parquet. Данные файла не читаются
+def parquet_kinds(parquet_path):
+    import pyarrow.parquet as pq
+
+    return json.loads(pq.read_schema(parquet_path).metadata[METADATA_KEY])
+
+# Функция для потокового чтения Parquet файла, записанного sqlite_to_parquet.
+# Возвращает (имена столбцов, объявленные типы SQLite, количество строк, генератор строк)
+def read_parquet(parquet_path, batch_size=ARROW_BATCH_SIZE):
+    import pyarrow.parquet as pq
+
+    file = pq.ParquetFile(parquet_path)
+    kinds = json.loads(file.schema_arrow.metadata[METADATA_KEY])
+
+    def rows():
+        for batch in file.iter_batches(batch_size=batch_size):
+            columns = iter(batch.columns)
+            values = []
+            for column in kinds:
+                parts = [next(columns).to_pylist() for _ in column['parts']]
+                if len(parts) == 1:
+                    values.append(parts[0])
+                else:
+                    # В каждой строке значение есть не более чем в одной части
+                    values.append([next((v for v in row if v is not None), None) for row in zip(*parts)])
+            yield from (list(row) for row in zip(*values))
+
+    return ([column['name'] for column in kinds], [column['decltype'] for column in kinds],
+            file.metadata.num_rows, rows())
+
+# Функция для получения имен столбцов и различных текстовых значений Parquet файла, записанного
+# sqlite_to_parquet (для поискового индекса). Читаются только текстовые столбцы
+def parquet_text_values(parquet_path):
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    kinds = parquet_kinds(parquet_path)
+    values = {column['name'] for column in kinds}
+    text_columns = [part_name(column, 'text') for column in kinds if 'text' in column['parts']]
+    if text_columns:
+        for column in pq.read_table(parquet_path, columns=text_columns).itercolumns():
+            values.update(value for value in pc.unique(column).to_pylist() if value is not None)
+    return values
@@ -0,0 +1,157 @@
+# Диагностика СПО РКОТ: журнал операций с длительностью и количеством строк и профилирование по запросу.
+# Операции замеряются контекстным менеджером span и записываются в журнал "rkot" (модуль logging),
+# последние RECENT_SIZE операций хранятся в памяти для окна "Диагностика".
+# Профилирование включается из меню или переменной окружения RKOT_PROFILE (через запятую):
+# cpu - профиль cProfile каждой операции сохраняется в папку profiles, memory - для операции
+# записывается пиковый объем выделенной памяти по данным tracemalloc
+from collections import deque, namedtuple
+from contextlib import contextmanager
+import datetime
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+
+log = logging.getLogger("rkot")
+
+RECENT_SIZE = 200                # Количество последних операций, хранимых для окна диагностики
+LOG_FILE_NAME = "rkot.log"       # Файл журнала в папке данных
+LOG_MAX_BYTES = 1024 * 1024      # Размер файла журнала, после которого начинается новый файл
+LOG_BACKUP_COUNT = 3             # Количество хранимых старых файлов журнала
+PROFILE_FOLDER_NAME = "profiles" # Папка профилей cProfile в папке данных
+PROFILE_TOP = 15                 # Количество самых долгих функций профиля, выводимых в журнал
+
+# Запись об операции: время начала, название, длительность в секундах, количество строк,
+# подробности, пиковый объем памяти в МБ (при профилировании памяти) и путь к файлу профиля
+Operation = namedtuple('Operation', 'started name seconds rows details peak_mb profile_path')
+
+recent = deque(maxlen=RECENT_SIZE)
+profile_cpu = False
+profile_memory = False
+profile_folder = None
+log_file = None
+_lock = threading.Lock()
+_local = threading.local() # Глубина вложенных операций потока: профилируется только внешняя
+
+# Функция для настройки журнала: вывод в stderr и, если задана папка данных, в файл rkot.log.
+# Уровень журнала задается переменной окружения RKOT_LOG_LEVEL (по умолчанию INFO)
+def configure(data_folder=None, level=None):
+    global log_file, profile_folder
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+        handler.close()
+    log.setLevel(level or os.environ.get("RKOT_LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    handlers = [logging.StreamHandler()]
+    if data_folder:
+        os.makedirs(data_folder, exist_ok=True)
+        log_file = os.path.join(data_folder, LOG_FILE_NAME)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"))
+        profile_folder = os.path.join(data_folder, PROFILE_FOLDER_NAME)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        log.addHandler(handler)
+
+    modes = {mode.strip().lower() for mode in os.environ.get("RKOT_PROFILE", "").split(",")}
+    set_profiling(cpu="cpu" in modes or profile_cpu, memory="memory" in modes or profile_memory)
+
+# Функция для отключения журнала и профилирования в дочерних процессах пакетной загрузки:
+# о результатах загрузки файлов сообщает основной процесс
+def detach():
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+    set_profiling(cpu=False, memory=False)
+
+# Функция для включения и отключения профилирования (None - оставить как есть)
+def set_profiling(cpu=None, memory=None):
+    global profile_cpu, profile_memory
+    if cpu is not None:
+        profile_cpu = cpu
+    if memory is not None and memory != profile_memory:
+        import tracemalloc
+        if memory:
+            tracemalloc.start()
+        else:
+            tracemalloc.stop()
+        profile_memory = memory
+
+# Функция для добавления записи об операции в журнал и список последних операций
+def record(name, seconds, rows=None, details=None, peak_mb=None, profile_path=None):
+    details = ", ".join(f"{key}={value}" for key, value in (details or {}).items() if value is not None)
+    operation = Operation(datetime.datetime.now() - datetime.timedelta(seconds=seconds), name, seconds, rows,
+                          details, peak_mb, profile_path)
+    with _lock:
+        recent.append(operation)
+    log.info("%s: %.3f с%s%s%s", name, seconds,
+             f", строк: {rows}" if rows is not None else "",
+             f", пик памяти: {peak_mb:.1f} МБ" if peak_mb is not None else "",
+             f" ({details})" if details else "")
+    return operation
+
+# Функция для получения последних операций, начиная с самой новой
+def recent_operations():
+    with _lock:
+        return list(reversed(recent))
+
+# Контекстный менеджер для замера операции. Возвращает словарь подробностей, в который операция
+# записывает количество обработанных строк (ключ "rows") и другие сведения
+@contextmanager
+def span(name, **details):
+    info = dict(details, rows=None)
+    depth = getattr(_local, "depth", 0)
+    profiler = None
+    if depth == 0 and profile_cpu:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # Профилировщик уже запущен в другом потоке
+            profiler = None
+    if depth == 0 and profile_memory:
+        import tracemalloc
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    _local.depth = depth + 1
+    started = time.perf_counter()
+    try:
+        yield info
+    except BaseException as e:
+        info["error"] = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _local.depth = depth
+        peak_mb = profile_path = None
+        if profiler:
+            profiler.disable()
+            profile_path = save_profile(name, profiler)
+        if depth == 0 and profile_memory:
+            import tracemalloc
+            peak_mb = max(tracemalloc.get_traced_memory()[1] - memory_before, 0) / 2 ** 20
+        rows = info.pop("rows")
+        record(name, seconds, rows, info, peak_mb, profile_path)
+
+# Функция для сохранения профиля операции в файл и вывода самых долгих функций в журнал (уровень DEBUG).
+# Возвращает путь к файлу профиля, который открывается, например, командой python -m pstats <файл>
+def save_profile(name, profiler):
+    import io
+    import pstats
+    import tempfile
+
+    folder = profile_folder or tempfile.gettempdir()
+    os.makedirs(folder, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    slug = re.sub(r"\W+", "_", name).strip("_")
+    path = os.path.join(folder, f"{timestamp}_{slug}.prof")
+    profiler.dump_stats(path)
+    if log.isEnabledFor(logging.DEBUG):
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        log.debug("Профиль операции %s (%s):\n%s", name, path, stream.getvalue())
+    return path
@@ -0,0 +1,60 @@
+# Пул движков SQLAlchemy для файлов БД отчетов.
+# Движок создается при первом обращении к файлу и вместе с открытым соединением (и кэшем
+# подготовленных запросов sqlite3) переиспользуется при повторном открытии и сохранении отчета.
+# Количество открытых файлов ограничено: при превышении закрывается движок, к которому дольше всего
+# не обращались. Файлы отчетов работают в режиме WAL: фиксация изменений дописывает журнал,
+# а не перезаписывает страницы файла, и чтение не блокируется записью.
+# Перед удалением или заменой файла его движок нужно закрыть функцией release_engine
+# (удаление файла отчета вместе с файлами журнала выполняет rkot.integrity.delete_report)
+from collections import OrderedDict
+import atexit
+import threading
+
+from sqlalchemy import create_engine, event
+
+ENGINE_POOL_SIZE = 8          # Количество одновременно открытых файлов отчетов
+STATEMENT_CACHE_SIZE = 256    # Количество подготовленных запросов, хранимых соединением sqlite3
+
+_engines = OrderedDict()      # Движки по пути к файлу в порядке последнего обращения
+_lock = threading.Lock()
+
+# Функция для получения движка файла БД отчета из пула (с созданием при первом обращении)
+def get_engine(db_path):
+    with _lock:
+        engine = _engines.get(db_path)
+        if engine is not None:
+            _engines.move_to_end(db_path)
+            return engine
+
+        engine = create_engine(f'sqlite:///{db_path}', pool_size=1,
+                               connect_args={'cached_statements': STATEMENT_CACHE_SIZE})
+        event.listen(engine, 'connect', configure_connection)
+        _engines[db_path] = engine
+        while len(_engines) > ENGINE_POOL_SIZE:
+            _, oldest = _engines.popitem(last=False)
+            oldest.dispose()
+        return engine
+
+# Функция для настройки нового соединения с файлом отчета
+def configure_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL") # В режиме WAL достаточно для сохранности данных
+    cursor.close()
+
+# Функция для закрытия движка файла (перед удалением или заменой файла)
+def release_engine(db_path):
+    with _lock:
+        engine = _engines.pop(db_path, None)
+    if engine is not None:
+        engine.dispose()
+
+# Функция для закрытия всех движков пула (журналы WAL переносятся в файлы отчетов)
+def dispose_all():
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+atexit.register(dispose_all)
@@ -0,0 +1,253 @@
+# Выгрузка данных отчетов из баз данных в файлы
+from contextlib import contextmanager
+from itertools import islice
+import csv
+import os
+import sqlite3
+
+from rkot import columnar
+from rkot.schema import quote
+
+EXPORT_BATCH_SIZE = 5000  # Количество строк, читаемых из БД за один вызов fetchmany
+ARROW_FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+TABLE_FORMATS = {'.csv': 'csv', '.xlsx': 'xlsx'}
+XLSX_MAX_ROWS = 1048576   # Предельное количество строк листа xlsx (вместе со строкой заголовка)
+# Поля реестра, которыми дополняется каждая строка отчета при выгрузке нескольких отчетов
+REPORT_COLUMNS = ['report_id', 'row_id', 'federal_district', 'control_location', 'period_start', 'period_end']
+
+# Исключение для прерывания выгрузки по запросу пользователя
+class ExportCancelled(Exception):
+    pass
+
+# Функция для потоковой выгрузки таблицы new_table отчета в CSV файл.
+# Строки читаются пачками, поэтому расход памяти не зависит от размера отчета. Возвращает количество строк
+def export_report_csv(db_path, csv_path, batch_size=EXPORT_BATCH_SIZE):
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        cursor = connection.execute('SELECT * FROM new_table')
+        # utf-8-sig, чтобы Excel корректно открывал кириллицу
+        with open(csv_path, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(column[0] for column in cursor.description)
+            row_count = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                row_count += len(rows)
+    finally:
+        connection.close()
+    return row_count
+
+# Функция для определения колоночного формата по расширению файла: parquet или arrow (Arrow IPC)
+def arrow_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ARROW_FORMATS:
+        raise ValueError(f"Неизвестный формат файла {path}: ожидается {', '.join(ARROW_FORMATS)}")
+    return ARROW_FORMATS[extension]
+
+# Функция для получения полей реестра, добавляемых к строкам отчета при выгрузке в колоночном формате.
+# Возвращает словарь, который можно передавать в другой поток (в отличие от объекта сессии)
+def report_source(report):
+    return {
+        'report_id': report.id,
+        'federal_district': report.federal_district,
+        'control_location': report.control_location,
+        'period_start': report.period_start,
+        'period_end': report.period_end,
+        'db_path': report.db_path,
+        'archive_path': report.archive_path,
+    }
+
+# Функция для проверки наличия таблицы отчета: файла БД или архивного файла (см. rkot.maintenance)
+def has_table(report):
+    path = report['archive_path'] or report['db_path']
+    return bool(path) and os.path.exists(path)
+
+# Функция для получения описания столбцов таблицы отчета (см. columnar.column_kinds).
+# Для архивного отчета описание берется из метаданных Parquet без чтения данных
+def report_kinds(report):
+    if report['archive_path']:
+        return columnar.parquet_kinds(report['archive_path'])
+    connection = sqlite3.connect(f"file:{report['db_path']}?mode=ro", uri=True)
+    try:
+        return columnar.column_kinds(connection)
+    finally:
+        connection.close()
+
+# Функция для получения имен столбцов таблицы отчета
+def report_columns(report):
+    if report['archive_path']:
+        return [column['name'] for column in columnar.parquet_kinds(report['archive_path'])]
+    connection = sqlite3.connect(f"file:{report['db_path']}?mode=ro", uri=True)
+    try:
+        return [row[1] for row in connection.execute("PRAGMA table_info(new_table)")]
+    finally:
+        connection.close()
+
+# Генератор пачек строк таблицы отчета в виде (rowid, значения столбцов columns).
+# Столбцы, которых нет в отчете, заполняются NULL. Архивный отчет читается из Parquet без восстановления
+# файла БД, строки нумеруются по порядку, как в восстановленном файле
+def report_batches(report, columns, batch_size=EXPORT_BATCH_SIZE):
+    if report['archive_path']:
+        names, _, _, rows = columnar.read_parquet(report['archive_path'], batch_size)
+        positions = {name: i for i, name in enumerate(names)}
+        picked = [positions.get(name) for name in columns]
+        rowid = 0
+        while batch := list(islice(rows, batch_size)):
+            yield [(rowid + n, *(None if i is None else row[i] for i in picked)) for n, row in enumerate(batch, 1)]
+            rowid += len(batch)
+        return
+
+    connection = sqlite3.connect(f"file:{report['db_path']}?mode=ro", uri=True)
+    try:
+        names = {row[1] for row in connection.execute("PRAGMA table_info(new_table)")}
+        select = ", ".join(quote(name) if name in names else "NULL" for name in columns)
+        cursor = connection.execute(f"SELECT rowid, {select} FROM new_table ORDER BY rowid")
+        while rows := cursor.fetchmany(batch_size):
+            yield rows
+    finally:
+        connection.close()
+
+# Функция для потоковой выгрузки таблиц отчетов в один файл Parquet или Arrow IPC (по расширению path).
+# reports - список словарей report_source. Каждая строка дополняется столбцами report_id, row_id,
+# federal_district, control_location, period_start и period_end, столбцы измерений объединяются
+# по всем отчетам и получают тип Arrow по типам значений (см. columnar.merge_kinds).
+# progress(выгружено отчетов, всего) вызывается после каждого отчета, cancelled() прерывает выгрузку.
+# Возвращает (количество отчетов, количество строк)
+def export_reports_arrow(reports, path, batch_size=EXPORT_BATCH_SIZE, progress=None, cancelled=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    file_format = arrow_format(path)
+    reports = [report for report in reports if has_table(report)]
+    kinds = columnar.merge_kinds([report_kinds(report) for report in reports])
+    report_fields = [
+        pa.field('report_id', pa.int64()),
+        pa.field('row_id', pa.int64()),
+        pa.field('federal_district', pa.string()),
+        pa.field('control_location', pa.string()),
+        pa.field('period_start', pa.date32()),
+        pa.field('period_end', pa.date32()),
+    ]
+    schema = pa.schema(report_fields + columnar.arrow_fields(kinds))
+
+    writer = pq.ParquetWriter(path, schema, compression='zstd') if file_format == 'parquet' \
+        else pa.ipc.new_file(path, schema)
+    row_count = 0
+    try:
+        with writer:
+            for done, report in enumerate(reports, start=1):
+                if cancelled and cancelled():
+                    raise ExportCancelled()
+                for rows in report_batches(report, [column['name'] for column in kinds], batch_size):
+                    count = len(rows)
+                    arrays = [[report['report_id']] * count, [row[0] for row in rows],
+                              [report['federal_district']] * count, [report['control_location']] * count,
+                              [report['period_start']] * count, [report['period_end']] * count]
+                    arrays += columnar.column_values([row[1:] for row in rows], kinds)
+                    writer.write_batch(pa.RecordBatch.from_arrays(
+                        [pa.array(values, type=field.type) for values, field in zip(arrays, schema)],
+                        schema=schema))
+                    row_count += len(rows)
+                if progress:
+                    progress(done, len(reports))
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path) # Недописанный файл не должен попасть в анализ
+        raise
+    return len(reports), row_count
+
+# Функция для выгрузки нескольких отчетов в один файл: Parquet или Arrow IPC (export_reports_arrow),
+# CSV или XLSX (export_reports_table) по расширению path
+def export_reports(reports, path, batch_size=EXPORT_BATCH_SIZE, progress=None, cancelled=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in TABLE_FORMATS:
+        return export_reports_table(reports, path, batch_size, progress, cancelled)
+    if extension in ARROW_FORMATS:
+        return export_reports_arrow(reports, path, batch_size, progress, cancelled)
+    raise ValueError(f"Неизвестный формат файла {path}: ожидается "
+                     f"{', '.join(list(TABLE_FORMATS) + list(ARROW_FORMATS))}")
+
+# Функция для потоковой выгрузки таблиц отчетов в один файл CSV или XLSX.
+# reports - список словарей report_source. Строки дополняются столбцами REPORT_COLUMNS, столбцы
+# измерений объединяются по всем отчетам в порядке их появления (отсутствующие в отчете остаются пустыми).
+# Строки читаются и записываются пачками, XLSX пишется в режиме write-only, поэтому расход памяти
+# не зависит от количества и размера отчетов. Строки сверх предела листа xlsx переносятся на следующий лист.
+# progress(выгружено отчетов, всего) вызывается после каждого отчета, cancelled() прерывает выгрузку.
+# Возвращает (количество отчетов, количество строк)
+def export_reports_table(reports, path, batch_size=EXPORT_BATCH_SIZE, progress=None, cancelled=None):
+    reports = [report for report in reports if has_table(report)]
+    columns = []
+    for report in reports:
+        columns += [name for name in report_columns(report) if name not in columns]
+
+    row_count = 0
+    try:
+        with table_writer(path, REPORT_COLUMNS + columns) as write_rows:
+            for done, report in enumerate(reports, start=1):
+                if cancelled and cancelled():
+                    raise ExportCancelled()
+                source = (report['federal_district'], report['control_location'],
+                          report['period_start'], report['period_end'])
+                for rows in report_batches(report, columns, batch_size):
+                    write_rows((report['report_id'], row[0]) + source + row[1:] for row in rows)
+                    row_count += len(rows)
+                if progress:
+                    progress(done, len(reports))
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path) # Недописанный файл не должен попасть к получателю
+        raise
+    return len(reports), row_count
+
+# Контекстный менеджер для построчной записи таблицы в файл CSV или XLSX (по расширению path).
+# Возвращает функцию write_rows(строки). CSV пишется с разделителем ";" в кодировке utf-8-sig,
+# XLSX - через openpyxl в режиме write-only (строки сбрасываются во временный файл по мере записи)
+@contextmanager
+def table_writer(path, header):
+    extension = os.path.splitext(path)[1].lower()
+    if TABLE_FORMATS.get(extension) == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(header)
+            yield writer.writerows
+        return
+    if TABLE_FORMATS.get(extension) != 'xlsx':
+        raise ValueError(f"Неизвестный формат файла {path}: ожидается {', '.join(TABLE_FORMATS)}")
+
+    import openpyxl
+    book = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows = None, XLSX_MAX_ROWS
+
+    def write_rows(rows):
+        nonlocal sheet, sheet_rows
+        for row in rows:
+            if sheet_rows >= XLSX_MAX_ROWS: # Лист заполнен, строки продолжаются на следующем
+                number = len(book.worksheets) + 1
+                sheet = book.create_sheet("Отчеты" if number == 1 else f"Отчеты {number}")
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+
+    yield write_rows
+    if sheet is None: # Нет ни одной строки: лист только с заголовком
+        sheet = book.create_sheet("Отчеты")
+        sheet.append(header)
+    book.save(path)
+
+# Функция для чтения файла, выгруженного export_reports_arrow, в таблицу pyarrow.
+# Файл Arrow IPC отображается в память без копирования: данные читаются с диска по мере обращения
+# к столбцам, поэтому открытие большого файла не требует памяти под его содержимое.
+# Parquet сжат и при чтении распаковывается, отображение в память лишь ускоряет чтение файла.
+# columns - список читаемых столбцов (по умолчанию все). Для pandas: read_export(path).to_pandas()
+def read_export(path, columns=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if arrow_format(path) == 'arrow':
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, memory_map=True)
@@ -0,0 +1,113 @@
+# Наблюдение за папкой входящих протоколов и автоматическая загрузка новых и измененных файлов.
+# Inbox определяет файлы, готовые к загрузке: новые или измененные с прошлой загрузки excel файлы,
+# размер и время изменения которых не менялись между двумя проверками и не менее SETTLE_SECONDS
+# (файл, который еще копируется в папку, не загружается). Количество одновременно загружаемых файлов
+# ограничено размером очереди: пока очередь заполнена, новые файлы не принимаются и остаются в папке
+# до следующей проверки. Каждый загруженный файл добавляется в реестр отдельной транзакцией.
+# watch - наблюдение без графического интерфейса (опрос папки, загрузка в пуле процессов),
+# в окне программы то же выполняется через QFileSystemWatcher (см. main.py)
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+import time
+
+from rkot import cache, diagnostics, ingest, integrity
+from rkot.diagnostics import log
+from rkot.registry import registry_path
+
+SETTLE_SECONDS = 2     # Время без изменений, после которого файл считается полностью записанным
+POLL_INTERVAL = 2      # Интервал проверки папки в секундах
+QUEUE_SIZE = 8         # Предельное количество одновременно загружаемых файлов
+
+# Класс для отслеживания файлов папки входящих протоколов
+class Inbox:
+    def __init__(self, folder, settle_seconds=SETTLE_SECONDS):
+        self.folder = folder
+        self.settle_seconds = settle_seconds
+        self.observed = {}      # Файлы, ожидающие готовности: путь -> (размер, время изменения)
+        self.handled = {}       # Обработанные файлы: путь -> (размер, время изменения) на момент загрузки
+        self.in_progress = {}   # Загружаемые файлы: путь -> (размер, время изменения)
+
+    # Метод для получения не более limit файлов, готовых к загрузке. Возвращает [(путь, подпись)],
+    # возвращенные файлы считаются загружаемыми до вызова finished
+    def ready(self, limit):
+        now = time.time()
+        present = set()
+        ready = []
+        for path in ingest.find_excel_files(self.folder):
+            present.add(path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if path in self.in_progress or self.handled.get(path) == signature:
+                continue
+            previous = self.observed.get(path)
+            self.observed[path] = signature
+            settled = previous == signature and now - stat.st_mtime >= self.settle_seconds
+            if settled and len(ready) < limit:
+                ready.append((path, signature))
+        for path, signature in ready:
+            del self.observed[path]
+            self.in_progress[path] = signature
+        # Удаленные из папки файлы забываются: файл с тем же именем будет загружен как новый
+        for files in (self.observed, self.handled):
+            for path in set(files) - present:
+                del files[path]
+        return ready
+
+    # Метод для отметки файла обработанным (загружен, уже был загружен ранее или не загружен из-за ошибки).
+    # Файл будет загружен повторно, только если изменится
+    def finished(self, path):
+        signature = self.in_progress.pop(path, None)
+        if signature is not None:
+            self.handled[path] = signature
+
+    def queued(self):
+        return len(self.in_progress)
+
+# Функция для наблюдения за папкой folder и загрузки новых и измененных файлов в пуле процессов.
+# Работает, пока stop() не вернет True. on_report(отчет) вызывается после добавления каждого отчета
+def watch(folder, data_folder, session, workers=None, queue_size=QUEUE_SIZE, interval=POLL_INTERVAL,
+          stop=None, on_report=None):
+    inbox = Inbox(folder)
+    registry, cache_dir = registry_path(data_folder), cache.cache_folder(data_folder)
+    log.info("Наблюдение за папкой %s (очередь: %d)", folder, queue_size)
+    with ProcessPoolExecutor(max_workers=workers, initializer=diagnostics.detach) as pool:
+        futures = {}
+        while not (stop and stop()):
+            for path, _ in inbox.ready(queue_size - len(futures)):
+                future = pool.submit(ingest.import_file, path, integrity.new_db_path(data_folder), registry, cache_dir)
+                futures[future] = path
+            if not futures:
+                time.sleep(interval)
+                continue
+            done, _ = wait(futures, timeout=interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures.pop(future)
+                inbox.finished(path)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    log.error("%s: ошибка загрузки - %s", path, e)
+                    continue
+                if result.duplicate_of is None:
+                    # Загрузка выполнялась в другом процессе, запись об операции добавляется здесь
+                    diagnostics.record("Загрузка файла", result.seconds, result.row_count,
+                                       {"file": os.path.basename(path), "from_cache": result.from_cache or None})
+                for report in register_result(session, result):
+                    if on_report:
+                        on_report(report)
+
+# Функция для добавления в реестр результата загрузки файла из папки входящих протоколов.
+# Возвращает список добавленных отчетов (пустой, если файл с тем же содержимым уже загружен)
+def register_result(session, result):
+    if result.duplicate_of is not None:
+        log.info("%s: уже загружен (отчет %s)", result.excel_path, result.duplicate_of)
+        return []
+    reports = ingest.register_batch(session, [result])
+    for report in reports:
+        log.info("%s: добавлен отчет %s", result.excel_path, report.id)
+    if not reports:
+        log.info("%s: уже загружен", result.excel_path)
+    return reports
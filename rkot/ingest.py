@@ -0,0 +1,371 @@
+# Загрузка протоколов РКОТ из excel файлов в базы данных отчетов.
+# Модуль не зависит от PyQt6 и pandas, библиотеки чтения excel импортируются при первом обращении
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from itertools import chain, islice
+import datetime
+import glob
+import os
+import sqlite3
+import time
+
+from rkot.registry import ReportData, registry_path
+from rkot import cache, columnar, diagnostics, integrity, schema, stats, sync, validation
+from rkot.diagnostics import log
+
+EXCEL_HEADER_ROW = 16     # Номер строки заголовка таблицы измерений в протоколе РКОТ (с нуля)
+IMPORT_BATCH_SIZE = 5000  # Количество строк, записываемых в БД за один вызов executemany
+
+# Результат загрузки файла: путь к БД, количество строк, время загрузки в секундах, хэш, размер и время
+# изменения исходного файла, id ранее загруженного отчета с тем же содержимым, признак загрузки из кэша
+# статистика таблицы (rkot.stats.ReportStats) и результат проверки протокола (rkot.validation.ValidationReport,
+# None при загрузке из кэша: в кэш попадают только книги без ошибок проверки)
+ImportResult = namedtuple('ImportResult', 'excel_path db_path row_count seconds digest size mtime '
+                                          'duplicate_of from_cache stats validation', defaults=(None, None))
+
+# Исключение для прерывания загрузки файла по запросу пользователя
+class ImportCancelled(Exception):
+    pass
+
+# Функция для открытия первого листа excel файла на построчное чтение без загрузки всей книги в память.
+# Возвращает количество строк листа (для отображения прогресса) и генератор строк
+def open_excel_rows(excel_path):
+    if excel_path.lower().endswith('.xls'):
+        import xlrd
+        book = xlrd.open_workbook(excel_path, on_demand=True)
+        sheet = book.sheet_by_index(0)
+
+        def rows():
+            try:
+                for i in range(sheet.nrows):
+                    yield [xls_cell_value(cell, book.datemode) for cell in sheet.row(i)]
+            finally:
+                book.release_resources()
+        return sheet.nrows, rows()
+
+    import openpyxl
+    book = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    sheet = book.worksheets[0]
+
+    def rows():
+        try:
+            for row in sheet.iter_rows(values_only=True):
+                yield [cell_value(value) for value in row]
+        finally:
+            book.close()
+    return sheet.max_row or 0, rows()
+
+# Функция для получения значения ячейки xls файла в виде, пригодном для записи в БД
+def xls_cell_value(cell, datemode):
+    import xlrd
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return cell_value(xlrd.xldate_as_datetime(cell.value, datemode))
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return int(cell.value)
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    return cell_value(cell.value)
+
+# Функция для приведения значения ячейки к типу, который принимает sqlite3
+def cell_value(value):
+    if value == "":
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()
+    return value
+
+# Функция для формирования уникальных имен столбцов по строке заголовка (как это делает pandas)
+def unique_column_names(header):
+    while header and header[-1] is None:
+        header = header[:-1] # Отбрасываем пустые ячейки в конце строки заголовка
+    names = []
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        candidate, n = name, 0
+        while candidate in names:
+            n += 1
+            candidate = f"{name}.{n}"
+        names.append(candidate)
+    return names
+
+# Функция для потоковой записи строк excel файла в таблицу new_table новой БД.
+# Строки читаются и записываются пачками в одной транзакции, поэтому расход памяти не зависит от размера файла.
+# progress(записано, всего) вызывается после каждой пачки, cancelled() позволяет прервать загрузку.
+# validator (rkot.validation.Validator) проверяет шапку и пачки строк параллельно с записью.
+# Если db_path равен None, строки только читаются и проверяются, таблица не записывается
+def excel_to_sqlite(excel_path, db_path, batch_size=IMPORT_BATCH_SIZE, progress=None, cancelled=None,
+                    validator=None):
+    total, rows = open_excel_rows(excel_path)
+    total = max(total - EXCEL_HEADER_ROW - 1, 0)
+    try:
+        preamble = list(islice(rows, EXCEL_HEADER_ROW))
+        header = next(rows, None)
+        if header is None:
+            raise ValueError(f"В файле {excel_path} нет строки заголовка таблицы измерений")
+        columns = unique_column_names(header)
+        width = len(columns)
+        numbers = array('L') # Номера строк листа для прочитанных строк (для отчета проверки)
+
+        # Пустые строки пропускаются, строки приводятся к ширине заголовка
+        def data_rows():
+            for number, row in enumerate(rows, start=EXCEL_HEADER_ROW + 2):
+                if any(value is not None for value in row[:width]):
+                    numbers.append(number)
+                    yield row[:width] + [None] * (width - len(row))
+        data = data_rows()
+
+        # Таблица протокола РКОТ записывается с объявленными типами столбцов (см. rkot.schema),
+        # таблица другого вида - как есть, без типов
+        types = schema.protocol_types(columns)
+        header_columns, normalize = columns, None
+        if types:
+            columns, data = lift_operator_names(columns, types, data)
+            normalize = partial(schema.normalize_batch, types=types)
+        if validator:
+            validator.start(preamble, header_columns, columns, types)
+            normalize = validator.checked(normalize)
+        if db_path is None:
+            row_count = read_batches(data, batch_size, normalize)
+        else:
+            row_count = write_table(db_path, columns, data, total, types, batch_size=batch_size,
+                                    normalize=normalize, progress=progress, cancelled=cancelled)
+        if validator:
+            validator.finish(numbers, row_count)
+        return row_count
+    finally:
+        if validator:
+            validator.stop()
+        rows.close()
+
+# Функция для чтения строк пачками без записи в БД: каждая пачка передается в normalize
+# (проверка протокола без загрузки). Возвращает количество строк
+def read_batches(data, batch_size=IMPORT_BATCH_SIZE, normalize=None):
+    row_count = 0
+    while batch := list(islice(data, batch_size)):
+        if normalize:
+            normalize(batch)
+        row_count += len(batch)
+    return row_count
+
+# Функция для переноса названий операторов из первой строки данных протокола в имена столбцов значений.
+# Строка остается в таблице с пустыми значениями (в ней же записано название раздела показателей).
+# Возвращает (имена столбцов, генератор строк)
+def lift_operator_names(columns, types, data):
+    first = next(data, None)
+    names = schema.operator_names(first, types) if first is not None else None
+    if names is None:
+        return columns, (data if first is None else chain([first], data))
+
+    names = iter(names)
+    columns = unique_column_names([(next(names) or column) if column_type == schema.VALUE_TYPE else column
+                                   for column, column_type in zip(columns, types)])
+    first = [None if column_type == schema.VALUE_TYPE else value for value, column_type in zip(first, types)]
+    if any(value is not None for value in first):
+        data = chain([first], data)
+    return columns, data
+
+# Функция для записи строк в таблицу new_table новой БД пачками в одной транзакции.
+# types - объявленные типы столбцов (по умолчанию столбцы без типа), normalize(пачка) - приведение
+# значений пачки строк к типам столбцов перед записью. Возвращает количество строк
+def write_table(db_path, columns, data, total=0, types=None, batch_size=IMPORT_BATCH_SIZE,
+                normalize=None, progress=None, cancelled=None):
+    with diagnostics.span("Запись в БД", file=os.path.basename(db_path)) as info:
+        info["rows"] = row_count = _write_table(db_path, columns, data, total, types, batch_size, normalize,
+                                                progress, cancelled)
+    return row_count
+
+def _write_table(db_path, columns, data, total, types, batch_size, normalize, progress, cancelled):
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Журнал в памяти и отключенная синхронизация ускоряют массовую запись в новый файл
+        connection.execute("PRAGMA journal_mode = MEMORY")
+        connection.execute("PRAGMA synchronous = OFF")
+        # Свободные страницы можно вернуть без перезаписи файла (см. rkot.maintenance)
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("BEGIN")
+        connection.execute("DROP TABLE IF EXISTS new_table")
+        types = types or [None] * len(columns)
+        column_list = ", ".join(schema.quote(name) + (f" {decltype}" if decltype else "")
+                                for name, decltype in zip(columns, types))
+        connection.execute(f"CREATE TABLE new_table ({column_list})")
+        insert = f"INSERT INTO new_table VALUES ({', '.join('?' * len(columns))})"
+        row_count = 0
+        while True:
+            batch = list(islice(data, batch_size))
+            if not batch:
+                break
+            if cancelled and cancelled():
+                raise ImportCancelled()
+            if normalize:
+                batch = normalize(batch)
+            connection.executemany(insert, batch)
+            row_count += len(batch)
+            if progress:
+                progress(row_count, max(total, row_count))
+        connection.execute("COMMIT")
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+    return row_count
+
+# Функция для поиска excel файлов по пути к папке или шаблону имени (например, "protocols/*.xls")
+def find_excel_files(source):
+    pattern = os.path.join(source, '*') if os.path.isdir(source) else source
+    return sorted(path for path in glob.glob(pattern)
+                  if os.path.isfile(path) and path.lower().endswith(('.xls', '.xlsx')))
+
+# Функция для загрузки одного файла (в окне программы или в процессе пакетной загрузки).
+# Если файл с тем же содержимым уже есть в реестре registry_path, таблица не создается и в результате
+# указывается id найденного отчета (duplicate_of). Разобранная книга берется из кэша cache_dir,
+# если она там есть, иначе читается excel файл и результат сохраняется в кэш.
+# Статистика таблицы вычисляется здесь же, в процессе загрузки, пока файл находится в кэше ОС.
+# Книга проверяется при чтении (см. rkot.validation), отчет проверки с замечаниями сохраняется в папке
+# data/validation. В строгом режиме (strict, по умолчанию rkot.validation.STRICT) протокол с ошибками
+# не загружается (ValidationFailed)
+def import_file(excel_path, db_path, registry_path=None, cache_dir=None, progress=None, cancelled=None,
+                strict=None):
+    strict = validation.STRICT if strict is None else strict
+    started = time.perf_counter()
+    with diagnostics.span("Загрузка файла", file=os.path.basename(excel_path)) as info:
+        digest, size, mtime = cache.file_signature(excel_path)
+        duplicate_of = find_report_by_digest(registry_path, digest) if registry_path else None
+        if duplicate_of is not None:
+            info["duplicate_of"] = duplicate_of
+            return ImportResult(excel_path, None, 0, time.perf_counter() - started, digest, size, mtime,
+                                duplicate_of, False)
+
+        # Таблица записывается во временный файл, который переносится на место файла отчета целиком:
+        # при ошибке, отмене или аварийном завершении недописанный файл не появляется под именем отчета
+        partial_db = integrity.partial_path(db_path)
+        cached = cache.lookup(cache_dir, digest) if cache_dir else None
+        report = None
+        try:
+            if cached:
+                columns, types, total, data = columnar.read_parquet(cached)
+                row_count = write_table(partial_db, columns, data, total, types, progress=progress,
+                                        cancelled=cancelled)
+            else:
+                validator = validation.Validator()
+                row_count = excel_to_sqlite(excel_path, partial_db, progress=progress, cancelled=cancelled,
+                                            validator=validator)
+                report = validator.report
+                if report.error_count or report.warning_count:
+                    report = validation.write_report(report, validation.report_path(os.path.dirname(db_path),
+                                                                                    db_path))
+                    log.warning("%s: замечания проверки протокола - %s", excel_path, validation.describe(report))
+                    info["issues"] = report.error_count + report.warning_count
+                if strict and report.error_count:
+                    raise validation.ValidationFailed(f"Протокол {os.path.basename(excel_path)} не прошел проверку "
+                                                      f"({validation.describe(report)})")
+            integrity.place_database(partial_db, db_path)
+        except BaseException:
+            integrity.remove_file(partial_db)
+            raise
+        if cache_dir and not cached and not report.error_count:
+            # Книга с ошибками в кэш не попадает и при повторной загрузке проверяется снова
+            cache.store(cache_dir, digest, db_path)
+        report_stats = stats.compute(db_path)
+        info.update(rows=row_count, from_cache=bool(cached) or None)
+    return ImportResult(excel_path, db_path, row_count, time.perf_counter() - started, digest, size, mtime,
+                        None, bool(cached), report_stats, report)
+
+# Функция для поиска в реестре отчета, загруженного из файла с тем же хэшем содержимого.
+# Используется sqlite3, чтобы проверку можно было выполнять в процессах пакетной загрузки
+def find_report_by_digest(registry_path, digest):
+    connection = sqlite3.connect(f'file:{registry_path}?mode=ro', uri=True)
+    try:
+        row = connection.execute("SELECT id FROM reports WHERE source_digest = ? ORDER BY id LIMIT 1",
+                                 (digest,)).fetchone()
+    finally:
+        connection.close()
+    return row[0] if row else None
+
+# Функция для параллельной загрузки списка файлов в пуле процессов.
+# Записывает в журнал время загрузки каждого файла и итоговую производительность, возвращает список ImportResult.
+# progress(обработано, всего) вызывается после каждого файла, cancelled() отменяет еще не начатые загрузки.
+# strict - отклонять протоколы с ошибками проверки (см. import_file)
+def import_batch(files, data_folder, workers=None, progress=None, cancelled=None, strict=None):
+    registry, cache_dir = registry_path(data_folder), cache.cache_folder(data_folder)
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=diagnostics.detach) as pool:
+        futures = {}
+        for excel_path in files:
+            # Файлы отмечаются в этом процессе: они добавляются в реестр после завершения всего пакета
+            db_path = integrity.new_db_path(data_folder)
+            futures[pool.submit(import_file, excel_path, db_path, registry, cache_dir, strict=strict)] = excel_path
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            excel_path = futures[future]
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                log.error("%s: ошибка загрузки - %s", excel_path, e)
+            else:
+                results.append(result)
+                if result.duplicate_of is not None:
+                    log.info("%s: уже загружен (отчет %s)", excel_path, result.duplicate_of)
+                else:
+                    # Загрузка выполнялась в другом процессе, запись об операции добавляется здесь
+                    diagnostics.record("Загрузка файла", result.seconds, result.row_count,
+                                       {"file": os.path.basename(excel_path), "from_cache": result.from_cache or None})
+            if progress:
+                progress(done, len(files))
+            if cancelled and cancelled():
+                # Уже выполняющиеся загрузки завершаются и попадают в результат, остальные отменяются
+                for pending in futures:
+                    pending.cancel()
+
+    elapsed = time.perf_counter() - started
+    row_count = sum(result.row_count for result in results)
+    duplicates = sum(result.duplicate_of is not None for result in results)
+    log.info("Загружено файлов: %d из %d, уже загруженных: %d, строк: %d, время: %.2f с (%.2f файлов/с, %.0f строк/с)",
+             len(results) - duplicates, len(files), duplicates, row_count, elapsed,
+             len(results) / elapsed if elapsed else 0, row_count / elapsed if elapsed else 0)
+    return results
+
+# Функция для добавления записей о загруженных файлах в реестр отчетов одной транзакцией.
+# Файлы, уже загруженные ранее, пропускаются, из одинаковых файлов пакета регистрируется первый.
+# Реестр проверяется повторно: файл с тем же содержимым мог быть добавлен другим процессом во время загрузки.
+# Период контроля заполняется по шапке протокола, если он прошел проверку
+def register_batch(session, results):
+    modified_at = datetime.datetime.now()
+    reports, registered = [], []
+    loaded = [result.digest for result in results if result.duplicate_of is None]
+    digests = {digest for (digest,) in session.query(ReportData.source_digest).filter(
+        ReportData.source_digest.in_(loaded))} if loaded else set()
+    for result in results:
+        if result.duplicate_of is not None:
+            continue
+        if result.digest in digests:
+            os.remove(result.db_path)
+            continue
+        digests.add(result.digest)
+        report = ReportData(file_name=os.path.basename(result.db_path), db_path=result.db_path)
+        report.set_modified(modified_at)
+        report.set_source(result.digest, result.size, result.mtime)
+        if result.validation and result.validation.period:
+            report.set_period(*result.validation.period)
+        reports.append(report)
+        registered.append(result)
+    # Файлы отчетов, не попавшие в реестр из-за ошибки фиксации, удаляются
+    try:
+        session.add_all(reports)
+        session.commit()
+    except BaseException:
+        session.rollback()
+        for report in reports:
+            integrity.remove_file(report.db_path)
+        raise
+
+    registry_path = session.get_bind().url.database
+    for report, result in zip(reports, registered):
+        sync.report_updated(registry_path, report.id, report.db_path, report_stats=result.stats)
+    return reports
@@ -0,0 +1,272 @@
+# Согласованность папки данных и реестра отчетов.
+# Файл БД отчета появляется под своим именем только целиком: загрузка пишет во временный файл
+# <имя>.partial, который после успешной записи атомарно переименовывается (place_database).
+# Удаление отчета сначала переименовывает файл в <имя>.deleted и только затем удаляет запись реестра,
+# поэтому при ошибке фиксации файл возвращается на место, а запись реестра не остается без файла.
+# Если программа завершилась аварийно между этими шагами, при запуске collect_garbage удаляет
+# недописанные и удаляемые файлы, файлы БД и архивные файлы, на которые не ссылается реестр,
+# и записи реестра, файлы которых в папке данных отсутствуют.
+# Файлы, которые записываются и еще не добавлены в реестр, процесс перечисляет в своем файле отметок
+# writing_<pid>_<номер>.lock (protect) и держит на нем блокировку до завершения. Пока отметки заблокированы,
+# collect_garbage не удаляет перечисленные в них файлы, сколько бы ни длилась загрузка. Отметки
+# завершившегося процесса не заблокированы: они удаляются, а его недописанные файлы считаются оставшимися после сбоя
+from itertools import count
+import atexit
+import datetime
+import os
+import threading
+
+try:
+    import msvcrt
+except ImportError: # Не Windows
+    msvcrt = None
+    import fcntl
+
+from rkot import diagnostics, sync, validation
+from rkot.diagnostics import log
+from rkot.engines import release_engine
+from rkot.registry import ReportData
+
+PARTIAL_SUFFIX = ".partial"  # Суффикс файла, в который выполняется загрузка
+DELETED_SUFFIX = ".deleted"  # Суффикс файла удаляемого отчета
+SIDECAR_SUFFIXES = ("-wal", "-shm", "-journal") # Служебные файлы SQLite рядом с файлом БД
+LOCK_PREFIX = "writing_"     # Начало имени файла отметок процесса
+LOCK_SUFFIX = ".lock"        # Суффикс файла отметок процесса
+LOCK_OFFSET = 1 << 30        # Блокируется байт за концом списка: в Windows блокировка запрещает и чтение
+
+_marks = {}                  # Файлы отметок этого процесса по папке
+_marks_lock = threading.Lock()
+_mark_numbers = count()
+_db_numbers = count()
+
+# Функция для блокировки файла отметок (blocking=False - без ожидания). Возвращает True, если блокировка получена
+def lock_file(file, blocking=True):
+    try:
+        if msvcrt:
+            file.seek(LOCK_OFFSET)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+# Функция для снятия блокировки файла отметок
+def unlock_file(file):
+    if msvcrt:
+        file.seek(LOCK_OFFSET)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+# Функция для создания заблокированного файла отметок этого процесса в папке folder
+def open_marks(folder):
+    while True:
+        path = os.path.join(folder, f"{LOCK_PREFIX}{os.getpid()}_{next(_mark_numbers):04d}{LOCK_SUFFIX}")
+        try:
+            file = open(path, "xb")
+        except FileExistsError: # Отметки завершившегося процесса с тем же идентификатором
+            continue
+        # Пока файл не заблокирован, проверка папки в другом процессе может принять его за отметки
+        # завершившегося процесса и удалить. Тогда создается новый файл
+        try:
+            if lock_file(file) and os.path.samestat(os.fstat(file.fileno()), os.stat(path)):
+                return file
+        except FileNotFoundError:
+            pass
+        file.close()
+
+# Функция для отметки файла, который записывается этим процессом и еще не добавлен в реестр
+# (или удаляется, переносится в архив, восстанавливается из архива). Отметка действует до завершения
+# процесса: collect_garbage не удаляет отмеченный файл и его временные и служебные файлы
+def protect(path):
+    folder = os.path.dirname(os.path.abspath(path))
+    with _marks_lock:
+        file = _marks.get(folder)
+        if file is None:
+            file = _marks[folder] = open_marks(folder)
+        file.seek(0, os.SEEK_END)
+        file.write(os.path.basename(path).encode("utf-8") + b"\n")
+        file.flush() # Отметка должна быть видна другим процессам до создания файла
+
+# Функция для удаления файлов отметок при завершении процесса. Процессы загрузки, созданные
+# копированием (fork), наследуют открытые файлы, но отметки родительского процесса не удаляют
+def release_marks():
+    with _marks_lock:
+        for file in _marks.values():
+            file.close()
+            if os.path.basename(file.name).startswith(f"{LOCK_PREFIX}{os.getpid()}_"):
+                remove_file(file.name)
+        _marks.clear()
+
+atexit.register(release_marks)
+
+# Функция для получения файлов, отмеченных выполняющимися процессами, по файлам отметок marks.
+# Отметки завершившихся процессов удаляются
+def protected_paths(marks):
+    protected = set()
+    for path in marks:
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            continue
+        with file:
+            held = not lock_file(file, blocking=False)
+            if held:
+                file.seek(0)
+                folder = os.path.dirname(path)
+                protected.update(normalize_path(os.path.join(folder, name.decode("utf-8")))
+                                 for name in file.read().splitlines())
+            else:
+                unlock_file(file)
+        if not held:
+            try:
+                os.remove(path)
+            except OSError: # Файл открыт процессом, который только что его создал
+                pass
+    return protected
+
+# Функция для получения имени нового файла БД отчета в папке данных. Файл отмечается как записываемый
+# (см. protect), поэтому проверка папки данных не удалит его до добавления отчета в реестр
+def new_db_path(data_folder):
+    timestamp = datetime.datetime.now().strftime("%d%m%Y_%H%M%S")
+    while True:
+        db_path = os.path.join(data_folder, f"database_{timestamp}_{os.getpid()}_{next(_db_numbers):04d}.db")
+        if not os.path.exists(db_path):
+            protect(db_path)
+            return db_path
+
+# Функция для получения пути к временному файлу загрузки
+def partial_path(db_path):
+    return db_path + PARTIAL_SUFFIX
+
+# Функция для атомарного переноса записанного временного файла на место файла БД отчета
+def place_database(partial, db_path):
+    os.replace(partial, db_path)
+
+# Функция для удаления файла без ошибки, если его уже нет
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Функция для удаления служебных файлов SQLite, оставшихся от файла БД
+def remove_sidecars(db_path):
+    for suffix in SIDECAR_SUFFIXES:
+        remove_file(db_path + suffix)
+
+# Функция для получения пути к файлу, временным или служебным файлом которого является path
+def base_path(path):
+    for suffixes in (SIDECAR_SUFFIXES, (PARTIAL_SUFFIX, DELETED_SUFFIX)):
+        for suffix in suffixes:
+            if path.endswith(suffix):
+                path = path[:-len(suffix)]
+                break
+    return path
+
+# Функция для удаления отчета из реестра вместе с файлом БД (а также архивным файлом и отчетом проверки).
+# Если файл нельзя переместить (например, он открыт другой программой), отчет не удаляется и
+# выбрасывается OSError. Если не удалось зафиксировать удаление записи, файл возвращается на место
+def delete_report(session, report):
+    registry_path = session.get_bind().url.database
+    report_id, db_path, archive_path = report.id, report.db_path, report.archive_path
+    deleted = None
+    if db_path and os.path.exists(db_path):
+        protect(db_path) # Файл <имя>.deleted не должен быть удален проверкой папки до фиксации
+        release_engine(db_path) # Открытый файл нельзя переименовать в Windows
+        deleted = db_path + DELETED_SUFFIX
+        os.replace(db_path, deleted)
+    try:
+        session.delete(report)
+        session.commit()
+    except BaseException:
+        session.rollback()
+        if deleted:
+            os.replace(deleted, db_path)
+        raise
+    sync.report_removed(registry_path, report_id)
+
+    related = [archive_path, db_path and validation.report_path(os.path.dirname(db_path), db_path)]
+    for path in filter(None, related):
+        try:
+            remove_file(path)
+        except OSError as e:
+            log.warning("Не удалось удалить файл %s: %s", path, e.strerror)
+    if deleted:
+        try:
+            os.remove(deleted)
+            remove_sidecars(db_path)
+        except OSError as e:
+            # Запись реестра уже удалена, файл будет удален при следующей проверке папки данных
+            log.warning("Не удалось удалить файл %s: %s", deleted, e.strerror)
+
+# Функция для приведения пути к виду, пригодному для сравнения
+def normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+# Функция для проверки папки данных при запуске: удаление недописанных и удаляемых файлов,
+# файлов БД и архивных файлов (папка archive) без записи в реестре и записей реестра без файла
+# в папке данных. Файл БД архивного отчета, оставшийся после архивирования, тоже удаляется.
+# Записи, ссылающиеся на файлы вне папки данных (например, после ее переноса), не удаляются.
+# Файлы, отмеченные выполняющимися процессами (см. protect), и их записи реестра не удаляются.
+# Выполняется один просмотр папки и один запрос к реестру. Возвращает (удалено файлов, удалено записей)
+def collect_garbage(session, data_folder):
+    from rkot.maintenance import archive_folder
+
+    registry_path = session.get_bind().url.database
+    folder = normalize_path(data_folder)
+    with diagnostics.span("Проверка папки данных") as info:
+        # Папка просматривается до чтения отметок и реестра: процесс отмечает файл до его создания,
+        # а отметки снимаются только с завершением процесса, поэтому каждый найденный файл либо
+        # отмечен, либо уже есть в реестре, либо остался после сбоя
+        entries = list(os.scandir(data_folder))
+        if os.path.isdir(archive_folder(data_folder)):
+            entries += os.scandir(archive_folder(data_folder))
+        protected = protected_paths([entry.path for entry in entries
+                                     if entry.name.startswith(LOCK_PREFIX) and entry.name.endswith(LOCK_SUFFIX)])
+
+        reports = session.query(ReportData.id, ReportData.db_path, ReportData.archive_path).filter(
+            ReportData.db_path.isnot(None)).all()
+        referenced = {normalize_path(db_path) for _, db_path, archive_path in reports if not archive_path}
+        archives = {normalize_path(archive_path) for _, _, archive_path in reports if archive_path}
+
+        removed_files = 0
+        for entry in entries:
+            if not entry.is_file() or normalize_path(base_path(entry.path)) in protected:
+                continue
+            name = entry.name
+            if name.endswith((PARTIAL_SUFFIX, DELETED_SUFFIX)):
+                orphan = True
+            elif name.startswith("database_") and name.endswith(".db"):
+                orphan = normalize_path(entry.path) not in referenced
+            elif name.startswith("database_") and name.endswith(".parquet"):
+                orphan = normalize_path(entry.path) not in archives
+            elif name.endswith(SIDECAR_SUFFIXES):
+                orphan = not os.path.exists(entry.path[:entry.path.rindex("-")])
+            else:
+                continue
+            if orphan:
+                try:
+                    if name.endswith(".db"):
+                        release_engine(entry.path)
+                    os.remove(entry.path)
+                    if name.endswith(".db"):
+                        remove_sidecars(entry.path)
+                except OSError as e:
+                    log.warning("Не удалось удалить файл %s: %s", entry.path, e.strerror)
+                else:
+                    log.info("Удален файл без записи в реестре: %s", entry.path)
+                    removed_files += 1
+
+        missing = [report_id for report_id, db_path, archive_path in reports
+                   if os.path.dirname(normalize_path(db_path)) == folder and
+                   normalize_path(db_path) not in protected and not os.path.exists(archive_path or db_path)]
+        if missing:
+            session.query(ReportData).filter(ReportData.id.in_(missing)).delete(synchronize_session=False)
+            session.commit()
+            for report_id in missing:
+                sync.report_removed(registry_path, report_id)
+            log.info("Удалены записи реестра без файла БД: %s", ", ".join(map(str, missing)))
+        info.update(rows=removed_files + len(missing), files=removed_files, reports=len(missing))
+    return removed_files, len(missing)
@@ -0,0 +1,218 @@
+# Обслуживание папки данных: сжатие файлов БД, архивирование и удаление старых отчетов.
+# Страницы, освобожденные при изменении и удалении строк, остаются в файле SQLite, поэтому файлы
+# отчетов и реестр со временем растут. vacuum_database переводит файл в режим auto_vacuum = INCREMENTAL
+# (однократным VACUUM), после чего свободные страницы возвращаются быстрым incremental_vacuum.
+# Отчеты, период контроля которых закончился давно, переносятся в папку data/archive в виде Parquet
+# со сжатием zstd (archive_report), файл БД отчета при этом удаляется. Архивный отчет остается в реестре,
+# в поиске и в сводке, а при открытии в окне просмотра восстанавливается в файл БД (restore_report).
+# Отчеты старше срока хранения удаляются из реестра вместе с файлами
+from collections import namedtuple
+import datetime
+import os
+import sqlite3
+import time
+
+from rkot import columnar, diagnostics, integrity, stats, summary
+from rkot.diagnostics import log
+from rkot.engines import release_engine
+from rkot.registry import ReportData
+
+# Сроки в днях после окончания периода контроля, по истечении которых отчет переносится в архив
+# и удаляется (0 - не переносить и не удалять)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('RKOT_ARCHIVE_AFTER_DAYS', 0))
+RETENTION_DAYS = int(os.environ.get('RKOT_RETENTION_DAYS', 0))
+INCREMENTAL = 2 # Значение PRAGMA auto_vacuum для режима INCREMENTAL
+
+# Результат шага обслуживания: количество обработанных файлов, общий размер до и после, время в секундах
+StepResult = namedtuple('StepResult', 'name files size_before size_after seconds')
+
+# Функция для получения пути к папке архива в папке данных
+def archive_folder(data_folder):
+    return os.path.join(data_folder, "archive")
+
+# Функция для получения пути к архивному файлу отчета
+def archive_path(data_folder, db_path):
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(archive_folder(data_folder), f"{name}.parquet")
+
+# Функция для получения размера файла БД вместе со служебными файлами SQLite (0, если файла нет)
+def file_size(path):
+    size = 0
+    for name in [path] + [path + suffix for suffix in integrity.SIDECAR_SUFFIXES]:
+        try:
+            size += os.path.getsize(name)
+        except OSError:
+            continue
+    return size
+
+# Функция для возврата свободных страниц файла SQLite. Файл, созданный без auto_vacuum = INCREMENTAL,
+# переводится в этот режим полным VACUUM (перезапись файла), в остальных случаях выполняется
+# incremental_vacuum, который только отрезает свободные страницы. Журнал WAL переносится в файл.
+# Возвращает (размер до, размер после)
+def vacuum_database(path):
+    release_engine(path) # Соединения пула не должны удерживать файл
+    size_before = file_size(path)
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL:
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute("VACUUM")
+        elif connection.execute("PRAGMA freelist_count").fetchone()[0]:
+            connection.execute("PRAGMA incremental_vacuum")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        connection.close()
+    return size_before, file_size(path)
+
+# Функция для переноса отчета в архив: таблица записывается в Parquet со сжатием, в реестре
+# сохраняется путь к архивному файлу, после чего файл БД удаляется. Агрегаты сводки и статистика
+# таблицы вычисляются до переноса, строки сводного хранилища и поисковый индекс не изменяются.
+# Возвращает (размер файла БД, размер архивного файла)
+def archive_report(session, report, data_folder):
+    registry_path = session.get_bind().url.database
+    path = archive_path(data_folder, report.db_path)
+    with diagnostics.span("Архивирование отчета", file=os.path.basename(report.db_path)) as info:
+        connection = summary.connect(registry_path)
+        try:
+            summary.ensure_reports(connection, [report.id])
+        finally:
+            connection.close()
+        stats.ensure_stats(registry_path, [report.id])
+
+        release_engine(report.db_path) # Журнал WAL переносится в файл при закрытии соединений
+        size_before = file_size(report.db_path)
+        os.makedirs(archive_folder(data_folder), exist_ok=True)
+        integrity.protect(path) # Архивный файл не попадет в реестр до фиксации
+        partial = integrity.partial_path(path)
+        try:
+            info["rows"] = columnar.sqlite_to_parquet(report.db_path, partial)
+            os.replace(partial, path)
+            report.archive_path = path
+            session.commit()
+        except BaseException:
+            session.rollback()
+            integrity.remove_file(partial)
+            integrity.remove_file(path)
+            raise
+
+        try:
+            os.remove(report.db_path)
+            integrity.remove_sidecars(report.db_path)
+        except OSError as e:
+            # Файл архивного отчета будет удален при следующей проверке папки данных
+            log.warning("Не удалось удалить файл %s: %s", report.db_path, e.strerror)
+    return size_before, os.path.getsize(path)
+
+# Функция для восстановления архивного отчета в файл БД (перед открытием в окне просмотра или выгрузкой).
+# Файл записывается во временный файл и переносится на место целиком, архивный файл удаляется
+# после фиксации реестра. Возвращает количество строк
+def restore_report(session, report):
+    from rkot.ingest import write_table
+
+    path = report.archive_path
+    with diagnostics.span("Восстановление отчета из архива", file=os.path.basename(report.db_path)) as info:
+        columns, types, total, data = columnar.read_parquet(path)
+        integrity.protect(report.db_path) # Пока в реестре указан архивный файл, файл БД считается лишним
+        partial = integrity.partial_path(report.db_path)
+        try:
+            info["rows"] = row_count = write_table(partial, columns, data, total, types)
+            release_engine(report.db_path)
+            integrity.place_database(partial, report.db_path)
+        except BaseException:
+            integrity.remove_file(partial)
+            raise
+        try:
+            report.archive_path = None
+            session.commit()
+        except BaseException:
+            session.rollback()
+            integrity.remove_file(report.db_path)
+            raise
+        integrity.remove_file(path)
+    return row_count
+
+# Функция для получения строки описания шага обслуживания (для вывода в командной строке и окне программы)
+def describe(step):
+    megabytes = 1024 * 1024
+    return (f"{step.name}: файлов {step.files}, {step.size_before / megabytes:.1f} -> "
+            f"{step.size_after / megabytes:.1f} МБ (освобождено {(step.size_before - step.size_after) / megabytes:.1f} МБ), "
+            f"{step.seconds:.1f} с")
+
+# Функция для получения даты, раньше которой закончился период контроля отчетов, подлежащих обработке
+def cutoff_date(days, today=None):
+    return (today or datetime.date.today()) - datetime.timedelta(days=days)
+
+# Функция для обслуживания папки данных. Шаги выполняются по порядку:
+# удаление отчетов, период контроля которых закончился более keep_days дней назад (0 - не удалять),
+# архивирование отчетов, период которых закончился более archive_after дней назад (0 - не архивировать,
+# требуется pyarrow), и сжатие файлов БД оставшихся отчетов и реестра (vacuum).
+# progress(выполнено, всего) вызывается после каждого файла. Возвращает список StepResult
+def maintain(session, data_folder, keep_days=RETENTION_DAYS, archive_after=ARCHIVE_AFTER_DAYS, vacuum=True,
+             today=None, progress=None):
+    expired, cold, active = [], [], []
+    if keep_days:
+        expired = session.query(ReportData).filter(ReportData.period_end < cutoff_date(keep_days, today)).all()
+    skipped = {report.id for report in expired} # Отчеты, обрабатываемые предыдущими шагами
+    if archive_after:
+        if not columnar.is_available():
+            raise RuntimeError("Для архивирования отчетов требуется pyarrow")
+        cold = session.query(ReportData).filter(ReportData.period_end < cutoff_date(archive_after, today),
+                                                ReportData.archive_path.is_(None),
+                                                ReportData.db_path.isnot(None)).all()
+        cold = [report for report in cold if report.id not in skipped and os.path.exists(report.db_path)]
+        skipped.update(report.id for report in cold)
+    if vacuum:
+        active = [db_path for report_id, db_path in session.query(ReportData.id, ReportData.db_path).filter(
+                      ReportData.archive_path.is_(None), ReportData.db_path.isnot(None))
+                  if report_id not in skipped and os.path.exists(db_path)]
+    total = len(expired) + len(cold) + len(active) + bool(vacuum)
+    done = 0
+
+    def advance():
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, total)
+
+    results = []
+    with diagnostics.span("Обслуживание папки данных") as info:
+        if keep_days:
+            started, size_before, deleted = time.perf_counter(), 0, 0
+            for report in expired:
+                size = file_size(report.db_path) if report.db_path else 0
+                size += os.path.getsize(report.archive_path) if report.archive_path and \
+                    os.path.exists(report.archive_path) else 0
+                try:
+                    integrity.delete_report(session, report)
+                except OSError as e:
+                    log.warning("Отчет %s не удален: %s", report.id, e.strerror)
+                else:
+                    size_before += size
+                    deleted += 1
+                advance()
+            results.append(StepResult("Удаление отчетов старше срока хранения", deleted, size_before, 0,
+                                      time.perf_counter() - started))
+
+        if archive_after:
+            started, size_before, size_after = time.perf_counter(), 0, 0
+            for report in cold:
+                before, after = archive_report(session, report, data_folder)
+                size_before += before
+                size_after += after
+                advance()
+            results.append(StepResult("Архивирование отчетов", len(cold), size_before, size_after,
+                                      time.perf_counter() - started))
+
+        if vacuum:
+            started, size_before, size_after = time.perf_counter(), 0, 0
+            session.commit() # Сессия не должна удерживать транзакцию реестра
+            for path in active + [session.get_bind().url.database]:
+                before, after = vacuum_database(path)
+                size_before += before
+                size_after += after
+                advance()
+            results.append(StepResult("Сжатие файлов БД", len(active) + 1, size_before, size_after,
+                                      time.perf_counter() - started))
+        info.update(rows=done, reclaimed_mb=round(sum(r.size_before - r.size_after for r in results) / 2 ** 20, 1))
+    return results
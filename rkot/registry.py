@@ -0,0 +1,172 @@
+# Реестр загруженных отчетов РКОТ (база данных reports.db в папке data)
+from sqlalchemy.orm import declarative_base
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, DateTime, Date, bindparam
+from sqlalchemy.orm import sessionmaker
+import datetime
+import os
+import sys
+
+Base = declarative_base()
+
+DATE_MODIFIED_FORMAT = "%d.%m.%Y %H:%M:%S" # Формат даты изменения для отображения
+PERIOD_DATE_FORMAT = "%d.%m.%Y"            # Формат дат периода проведения контроля
+
+# Определение структуры базы данных в основном окне.
+# Текстовые date_modified и control_period используются для отображения, а типизированные
+# modified_at, period_start и period_end - для сортировки и отбора в запросах к реестру.
+# source_digest, source_size и source_mtime описывают исходный excel файл и позволяют не загружать его повторно.
+# archive_path - сжатая копия таблицы отчета, перенесенного в архив (файл db_path в это время отсутствует).
+# row_count, value_count и empty_count - количество строк, числовых значений и пустых ячеек таблицы
+# отчета (см. rkot.stats), NULL - статистика еще не вычислена
+class ReportData(Base):
+    __tablename__ = 'reports'
+    id = Column(Integer, primary_key=True)
+    date_modified = Column(String)
+    file_name = Column(String)
+    federal_district = Column(String, index=True)
+    control_location = Column(String, index=True)
+    control_period = Column(String)
+    db_path = Column(String)
+    modified_at = Column(DateTime, index=True)
+    period_start = Column(Date, index=True)
+    period_end = Column(Date)
+    source_digest = Column(String, index=True)
+    source_size = Column(Integer)
+    source_mtime = Column(DateTime)
+    archive_path = Column(String)
+    row_count = Column(Integer, index=True)
+    value_count = Column(Integer)
+    empty_count = Column(Integer)
+
+    # Метод для установки даты изменения отчета
+    def set_modified(self, when):
+        when = when.replace(microsecond=0)
+        self.modified_at = when
+        self.date_modified = when.strftime(DATE_MODIFIED_FORMAT)
+
+    # Метод для установки периода проведения контроля
+    def set_period(self, start, end):
+        self.period_start = start
+        self.period_end = end
+        self.control_period = f"{start.strftime(PERIOD_DATE_FORMAT)} - {end.strftime(PERIOD_DATE_FORMAT)}"
+
+    # Метод для сохранения хэша содержимого, размера и времени изменения исходного файла
+    def set_source(self, digest, size, mtime):
+        self.source_digest = digest
+        self.source_size = size
+        self.source_mtime = mtime.replace(microsecond=0)
+
+# Столбцы реестра, по которым возможна сортировка
+SORT_COLUMNS = {
+    'id': ReportData.id,
+    'date': ReportData.modified_at,
+    'district': ReportData.federal_district,
+    'location': ReportData.control_location,
+    'period': ReportData.period_start,
+    'rows': ReportData.row_count,
+    'values': ReportData.value_count,
+    'empty': ReportData.empty_count,
+}
+
+# Условие отбора отчетов, в столбце column которых есть числовые значения в диапазоне [value_from, value_to]
+# (по минимуму и максимуму из статистики столбцов rkot.stats, без чтения файлов отчетов)
+COLUMN_RANGE = text(
+    "EXISTS (SELECT 1 FROM report_column_stats s WHERE s.report_id = reports.id AND s.column_name = :column "
+    "AND s.value_count > 0 AND (:value_from IS NULL OR s.value_max >= :value_from) "
+    "AND (:value_to IS NULL OR s.value_min <= :value_to))")
+
+# Фабрика сессий, движок передается при создании сессии: Session(bind=engine)
+Session = sessionmaker()
+
+# Функция для определения пути к папке 'data' в директории исполняемого файла.
+# Путь можно передать явно или задать переменной окружения RKOT_DATA_DIR (например, на сервере)
+def get_data_folder(data_folder=None):
+    data_folder = data_folder or os.environ.get('RKOT_DATA_DIR')
+    if not data_folder:
+        executable_dir = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) \
+            else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        data_folder = os.path.join(executable_dir, 'data')
+    if not os.path.exists(data_folder):
+        os.makedirs(data_folder)
+    return data_folder
+
+# Функция для получения пути к файлу реестра отчетов
+def registry_path(data_folder):
+    return os.path.join(data_folder, "reports.db")
+
+# Функция для подключения к реестру отчетов и создания таблиц, если они не существуют
+def open_registry(data_folder):
+    from rkot import stats
+
+    engine = create_engine(f'sqlite:///{registry_path(data_folder)}')
+    Base.metadata.create_all(engine)
+    upgrade_registry(engine)
+    stats.ensure_schema(registry_path(data_folder)) # Таблица статистики столбцов отчетов
+    return engine
+
+# Функция для добавления в реестр, созданный предыдущей версией программы, новых столбцов и индексов.
+# Типизированные даты заполняются по текстовым значениям
+def upgrade_registry(engine):
+    existing = {column['name'] for column in inspect(engine).get_columns('reports')}
+    missing = [column for column in ReportData.__table__.columns if column.name not in existing]
+    if missing:
+        with engine.begin() as connection:
+            for column in missing:
+                column_type = column.type.compile(engine.dialect)
+                connection.execute(text(f'ALTER TABLE reports ADD COLUMN {column.name} {column_type}'))
+        fill_typed_dates(engine)
+    for index in ReportData.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+# Функция для заполнения типизированных дат по текстовым date_modified и control_period
+def fill_typed_dates(engine):
+    session = Session(bind=engine)
+    try:
+        reports = session.query(ReportData).filter(
+            (ReportData.modified_at.is_(None) & ReportData.date_modified.isnot(None)) |
+            (ReportData.period_start.is_(None) & ReportData.control_period.isnot(None)))
+        for report in reports:
+            try:
+                if report.modified_at is None and report.date_modified:
+                    report.modified_at = datetime.datetime.strptime(report.date_modified, DATE_MODIFIED_FORMAT)
+                if report.period_start is None and report.control_period:
+                    start, end = report.control_period.split(" - ")
+                    report.period_start = datetime.datetime.strptime(start, PERIOD_DATE_FORMAT).date()
+                    report.period_end = datetime.datetime.strptime(end, PERIOD_DATE_FORMAT).date()
+            except ValueError:
+                continue # Значение в нестандартном формате остается только текстовым
+        session.commit()
+    finally:
+        session.close()
+
+# Функция для получения запроса к реестру с сортировкой на стороне БД.
+# sort - ключ SORT_COLUMNS, ids - ограничение набора отчетов (например, результатами поиска),
+# district и location - часть названия федерального округа и места проведения контроля,
+# period_from и period_to - отбор отчетов, период контроля которых пересекается с заданным,
+# rows_from и rows_to - отбор по количеству строк, column, value_from и value_to - отбор отчетов,
+# в столбце column которых есть значения в заданном диапазоне (по статистике rkot.stats)
+def query_reports(session, sort='id', descending=False, ids=None, district=None, location=None,
+                  period_from=None, period_to=None, rows_from=None, rows_to=None, column=None,
+                  value_from=None, value_to=None):
+    query = session.query(ReportData)
+    if ids is not None:
+        query = query.filter(ReportData.id.in_(ids))
+    if district:
+        query = query.filter(ReportData.federal_district.contains(district, autoescape=True))
+    if location:
+        query = query.filter(ReportData.control_location.contains(location, autoescape=True))
+    if period_from:
+        query = query.filter(ReportData.period_end >= period_from)
+    if period_to:
+        query = query.filter(ReportData.period_start <= period_to)
+    if rows_from is not None:
+        query = query.filter(ReportData.row_count >= rows_from)
+    if rows_to is not None:
+        query = query.filter(ReportData.row_count <= rows_to)
+    if column:
+        query = query.filter(COLUMN_RANGE.bindparams(bindparam('column', column), bindparam('value_from', value_from),
+                                                     bindparam('value_to', value_to)))
+    order = SORT_COLUMNS[sort]
+    if descending:
+        return query.order_by(order.desc(), ReportData.id.desc())
+    return query.order_by(order, ReportData.id)
@@ -0,0 +1,76 @@
+# Схема таблицы измерений протокола РКОТ и приведение значений к типам столбцов.
+# Таблица протокола состоит из столбца показателей, столбца требований к граничным значениям и столбцов
+# значений по операторам связи. Названия операторов в протоколе записаны в первой строке под заголовком
+# таблицы, поэтому при загрузке они переносятся в имена столбцов значений, а сами столбцы значений
+# объявляются как REAL: числа, записанные текстом (с десятичной запятой, знаком процента, пробелами
+# между разрядами), преобразуются в числа, отметки отсутствия значения ("-", "н/д") - в NULL.
+# Текст, который не удалось разобрать как число, сохраняется без изменений, чтобы не потерять данные
+SCHEMA_VERSION = 2   # Версия схемы, меняется при изменении правил приведения (входит в ключ кэша загрузки)
+
+TEXT_TYPE = 'TEXT'   # Тип столбцов показателей и требований
+VALUE_TYPE = 'REAL'  # Тип столбцов значений
+PROTOCOL_COLUMNS = ("Параметры качества", "Требования к граничным значениям")  # Первые столбцы протокола
+BLANK_MARKERS = {"-", "–", "—", "--", "н/д", "нд", "нет данных", "n/a", "na", "x", "х"}  # Отметки отсутствия значения
+
+# Функция для приведения заголовка столбца к виду для сравнения (без лишних пробелов и регистра)
+def normalize_name(name):
+    return " ".join(str(name).split()).casefold()
+
+# Функция для определения типов столбцов по строке заголовка таблицы.
+# Возвращает список объявленных типов или None, если таблица не похожа на таблицу протокола РКОТ
+def protocol_types(columns):
+    if len(columns) <= len(PROTOCOL_COLUMNS) or any(
+            normalize_name(column) != normalize_name(expected) for column, expected in zip(columns, PROTOCOL_COLUMNS)):
+        return None
+    return [TEXT_TYPE] * len(PROTOCOL_COLUMNS) + [VALUE_TYPE] * (len(columns) - len(PROTOCOL_COLUMNS))
+
+# Функция для получения названий операторов из первой строки данных.
+# Возвращает список названий (None для столбцов без названия) или None, если в столбцах значений
+# строки есть числа, то есть строка не является строкой названий операторов
+def operator_names(row, types):
+    names = []
+    for value, column_type in zip(row, types):
+        if column_type != VALUE_TYPE:
+            continue
+        if value is not None and to_real(value) is not value:
+            return None # Число или отметка отсутствия значения
+        names.append(value.strip() if isinstance(value, str) and value.strip() else None)
+    return names if any(names) else None
+
+# Функция для разбора числа, записанного текстом. Возвращает float, None для пустого значения
+# и отметок отсутствия значения. Если текст не является числом, возбуждает ValueError
+def parse_real(value):
+    if value is None or isinstance(value, float):
+        return value
+    if isinstance(value, int):
+        return float(value)
+    text = str(value).strip()
+    if not text or text.casefold() in BLANK_MARKERS:
+        return None
+    # Пробелы между разрядами (в том числе неразрывные), десятичная запятая и знак процента
+    text = text.replace("\xa0", "").replace("\u202f", "").replace(" ", "").replace(",", ".")
+    if text.endswith("%"):
+        text = text[:-1]
+    return float(text)
+
+# Функция для приведения значения к числу при загрузке: текст, который не является числом, не изменяется
+def to_real(value):
+    try:
+        return parse_real(value)
+    except ValueError:
+        return value
+
+# Функция для приведения пачки строк к объявленным типам столбцов.
+# Преобразование выполняется по столбцам: для каждого столбца функция приведения выбирается один раз
+def normalize_batch(rows, types):
+    columns = [list(column) for column in zip(*rows)]
+    for i, column_type in enumerate(types):
+        if column_type == VALUE_TYPE:
+            columns[i] = [value if value is None or type(value) is float else to_real(value)
+                          for value in columns[i]]
+    return [list(row) for row in zip(*columns)]
+
+# Функция для экранирования имени столбца в запросе SQLite (кавычки в имени удваиваются).
+# Используется всеми модулями, которые строят запросы по именам столбцов таблицы отчета
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
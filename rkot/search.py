@@ -0,0 +1,124 @@
+# Полнотекстовый поисковый индекс по реестру отчетов и содержимому их таблиц.
+# Используется таблица FTS5 с триграммным токенизатором: поиск подстроки без учета регистра
+# (в том числе для кириллицы) выполняется по индексу, без перебора ячеек.
+# Для запросов короче трех символов индекс неприменим, и search() возвращает None
+import sqlite3
+
+from rkot import columnar, diagnostics
+from rkot.schema import quote
+
+MIN_TERM_LENGTH = 3 # Минимальная длина запроса для триграммного индекса
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_search USING fts5(
+    registry, contents, tokenize = 'trigram case_sensitive 0'
+)
+"""
+
+# Поля реестра, по которым выполняется поиск
+REGISTRY_FIELDS = ("date_modified", "file_name", "federal_district", "control_location", "control_period")
+
+# Функция для подключения к реестру без автоматического открытия транзакций
+def connect(registry_path):
+    return sqlite3.connect(registry_path, isolation_level=None)
+
+# Функция для создания индекса и добавления в него отчетов, которые еще не проиндексированы.
+# Возвращает False, если SQLite собран без FTS5 или триграммного токенизатора
+def ensure_index(registry_path):
+    connection = connect(registry_path)
+    try:
+        connection.execute(SCHEMA)
+        missing = connection.execute(
+            "SELECT id FROM reports WHERE id NOT IN (SELECT rowid FROM reports_search)").fetchall()
+        if missing:
+            with diagnostics.span("Индексация отчетов") as info:
+                for (report_id,) in missing:
+                    write_report(connection, report_id)
+                info["rows"] = len(missing)
+        connection.execute("DELETE FROM reports_search WHERE rowid NOT IN (SELECT id FROM reports)")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+# Функция для проверки наличия поискового индекса
+def is_enabled(connection):
+    return connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_search'").fetchone() is not None
+
+# Функция для получения различных текстовых значений таблицы отчета (названия показателей, операторов и т.п.)
+def report_contents(db_path):
+    try:
+        connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    except sqlite3.Error:
+        return ""
+    try:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(new_table)")]
+        values = set(columns)
+        for column in columns:
+            name = quote(column)
+            values.update(value for (value,) in connection.execute(
+                f"SELECT DISTINCT {name} FROM new_table WHERE typeof({name}) = 'text'"))
+    except sqlite3.Error:
+        return ""
+    finally:
+        connection.close()
+    return "\n".join(sorted(values))
+
+# Функция для получения текстовых значений архивного отчета (см. rkot.maintenance)
+def archive_contents(archive_path):
+    try:
+        return "\n".join(sorted(columnar.parquet_text_values(archive_path)))
+    except (ImportError, OSError, ValueError): # Нет pyarrow или архивный файл поврежден
+        return ""
+
+# Функция для записи полей реестра и содержимого отчета в индекс
+def write_report(connection, report_id):
+    row = connection.execute(
+        f"SELECT {', '.join(REGISTRY_FIELDS)}, db_path, archive_path FROM reports WHERE id = ?",
+        (report_id,)).fetchone()
+    connection.execute("DELETE FROM reports_search WHERE rowid = ?", (report_id,))
+    if row is None:
+        return
+    registry = "\n".join(value for value in row[:-2] if value)
+    db_path, archive_path = row[-2:]
+    contents = archive_contents(archive_path) if archive_path else report_contents(db_path) if db_path else ""
+    connection.execute("INSERT INTO reports_search (rowid, registry, contents) VALUES (?, ?, ?)",
+                       (report_id, registry, contents))
+
+# Функция для обновления отчета в индексе после загрузки или сохранения
+def index_report(registry_path, report_id):
+    connection = connect(registry_path)
+    try:
+        if is_enabled(connection):
+            write_report(connection, report_id)
+    finally:
+        connection.close()
+
+# Функция для удаления отчета из индекса
+def remove_report(registry_path, report_id):
+    connection = connect(registry_path)
+    try:
+        if is_enabled(connection):
+            connection.execute("DELETE FROM reports_search WHERE rowid = ?", (report_id,))
+    finally:
+        connection.close()
+
+# Функция для поиска отчетов по подстроке в полях реестра и содержимом таблиц.
+# Возвращает множество идентификаторов отчетов или None, если индекс не может обработать запрос
+def search(registry_path, term):
+    term = term.strip()
+    if len(term) < MIN_TERM_LENGTH:
+        return None
+    connection = connect(registry_path)
+    try:
+        if not is_enabled(connection):
+            return None
+        phrase = '"' + term.replace('"', '""') + '"'
+        return {report_id for (report_id,) in connection.execute(
+            "SELECT rowid FROM reports_search WHERE reports_search MATCH ?", (phrase,))}
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        connection.close()
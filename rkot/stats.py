@@ -0,0 +1,148 @@
+# Статистика таблиц отчетов для обзора реестра без чтения файлов отчетов.
+# Для каждого отчета хранятся количество строк, числовых значений и пустых ячеек (в столбцах row_count,
+# value_count и empty_count таблицы reports), а для каждого столбца таблицы отчета - количество значений
+# и пустых ячеек, минимальное, максимальное и среднее числовое значение (таблица report_column_stats).
+# Статистика вычисляется одним агрегатным запросом при загрузке (в процессе загрузки файла) и после
+# сохранения измененных данных. Для отчетов, загруженных предыдущей версией программы, она вычисляется
+# при запуске (ensure_stats)
+from collections import namedtuple
+import os
+import sqlite3
+
+from rkot import diagnostics
+from rkot.schema import quote
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_column_stats (
+    report_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    column_name TEXT NOT NULL,
+    value_count INTEGER NOT NULL,
+    null_count INTEGER NOT NULL,
+    value_min REAL,
+    value_max REAL,
+    value_mean REAL,
+    PRIMARY KEY (report_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_report_column_stats_column ON report_column_stats (column_name, value_max);
+"""
+
+# Статистика отчета: количество строк, числовых значений и пустых ячеек, список статистики столбцов
+# в порядке столбцов таблицы: (имя, числовых значений, пустых ячеек, минимум, максимум, среднее)
+ReportStats = namedtuple('ReportStats', 'row_count value_count empty_count columns')
+
+# Функция для создания таблицы статистики столбцов, если она не существует (при открытии реестра, см. rkot.registry)
+def ensure_schema(registry_path):
+    connection = connect(registry_path)
+    try:
+        connection.executescript(SCHEMA)
+    finally:
+        connection.close()
+
+# Функция для подключения к реестру без автоматического открытия транзакций
+def connect(registry_path):
+    return sqlite3.connect(registry_path, isolation_level=None)
+
+# Функция для вычисления статистики таблицы new_table файла отчета одним проходом по таблице.
+# Числовыми считаются значения с типом integer или real (текст в столбцах значений не учитывается)
+def compute(db_path):
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        names = [row[1] for row in connection.execute("PRAGMA table_info(new_table)")]
+        aggregates = ["COUNT(*)"]
+        for name in names:
+            column = quote(name)
+            number = f"CASE WHEN typeof({column}) IN ('integer', 'real') THEN {column} END"
+            aggregates += [f"COUNT({column})", f"COUNT({number})", f"MIN({number})", f"MAX({number})",
+                           f"AVG({number})"]
+        row = connection.execute(f"SELECT {', '.join(aggregates)} FROM new_table").fetchone()
+    finally:
+        connection.close()
+    row_count, values = row[0], row[1:]
+    columns = []
+    for i, name in enumerate(names):
+        filled, numbers, value_min, value_max, value_mean = values[i * 5:i * 5 + 5]
+        columns.append((name, numbers, row_count - filled, value_min, value_max, value_mean))
+    return ReportStats(row_count, sum(column[1] for column in columns), sum(column[2] for column in columns),
+                       columns)
+
+# Функция для записи статистики отчета в реестр одной транзакцией
+def write(connection, report_id, report_stats):
+    row_count, value_count, empty_count, columns = report_stats
+    connection.execute("BEGIN")
+    try:
+        connection.execute("UPDATE reports SET row_count = ?, value_count = ?, empty_count = ? WHERE id = ?",
+                           (row_count, value_count, empty_count, report_id))
+        connection.execute("DELETE FROM report_column_stats WHERE report_id = ?", (report_id,))
+        connection.executemany(
+            "INSERT INTO report_column_stats (report_id, position, column_name, value_count, null_count, "
+            "value_min, value_max, value_mean) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(report_id, position, *column) for position, column in enumerate(columns)])
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+# Функция для обновления статистики отчета после загрузки или изменения данных.
+# report_stats - статистика, вычисленная при загрузке (если не передана, вычисляется по файлу отчета)
+def update_report(registry_path, report_id, db_path, report_stats=None):
+    if report_stats is None:
+        if not db_path or not os.path.exists(db_path):
+            return
+        report_stats = compute(db_path)
+    connection = connect(registry_path)
+    try:
+        write(connection, report_id, report_stats)
+    finally:
+        connection.close()
+
+# Функция для удаления статистики столбцов удаленного отчета
+def remove_report(registry_path, report_id):
+    connection = connect(registry_path)
+    try:
+        connection.execute("DELETE FROM report_column_stats WHERE report_id = ?", (report_id,))
+    finally:
+        connection.close()
+
+# Функция для вычисления статистики отчетов, для которых она еще не вычислена (загруженных предыдущей
+# версией программы). Отчеты без файла БД (в том числе архивные) пропускаются. Возвращает количество отчетов
+def ensure_stats(registry_path, report_ids=None):
+    connection = connect(registry_path)
+    try:
+        reports = connection.execute("SELECT id, db_path FROM reports WHERE row_count IS NULL").fetchall()
+        if report_ids is not None:
+            report_ids = set(report_ids)
+            reports = [report for report in reports if report[0] in report_ids]
+        reports = [(report_id, db_path) for report_id, db_path in reports if db_path and os.path.exists(db_path)]
+        if reports:
+            with diagnostics.span("Расчет статистики отчетов") as info:
+                for report_id, db_path in reports:
+                    try:
+                        report_stats = compute(db_path)
+                    except sqlite3.Error:
+                        continue # Файл без таблицы отчета
+                    write(connection, report_id, report_stats)
+                info["rows"] = len(reports)
+    finally:
+        connection.close()
+    return len(reports)
+
+# Функция для получения статистики столбцов отчета: список (имя, числовых значений, пустых ячеек,
+# минимум, максимум, среднее) в порядке столбцов таблицы
+def column_stats(registry_path, report_id):
+    connection = connect(registry_path)
+    try:
+        return connection.execute(
+            "SELECT column_name, value_count, null_count, value_min, value_max, value_mean "
+            "FROM report_column_stats WHERE report_id = ? ORDER BY position", (report_id,)).fetchall()
+    finally:
+        connection.close()
+
+# Функция для получения имен столбцов с числовыми значениями по всем отчетам (для отбора по значениям)
+def value_columns(registry_path):
+    connection = connect(registry_path)
+    try:
+        return [row[0] for row in connection.execute(
+            "SELECT DISTINCT column_name FROM report_column_stats WHERE value_count > 0 ORDER BY column_name")]
+    finally:
+        connection.close()
@@ -0,0 +1,134 @@
+# Сводное хранилище измерений: одна таблица measurements в reports.db со строками всех отчетов.
+# Файлы database_*.db остаются основным местом хранения (их открывает и редактирует окно просмотра),
+# сводная таблица повторяет их содержимое и позволяет одним индексированным запросом выбрать
+# значения по оператору, федеральному округу или месту контроля за все периоды.
+# Режим включается командой "python -m rkot migrate", после чего таблица поддерживается
+# в актуальном состоянии при загрузке, сохранении и удалении отчетов.
+import os
+import sqlite3
+
+from rkot.schema import quote
+
+# Значения хранятся по ячейкам: строка отчета (row_id), название показателя из первого столбца
+# (parameter), имя столбца (для протокола РКОТ - оператор связи) и значение. Пустые ячейки не хранятся
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    report_id INTEGER NOT NULL,
+    row_id INTEGER NOT NULL,
+    column_name TEXT NOT NULL,
+    parameter TEXT,
+    value,
+    PRIMARY KEY (report_id, row_id, column_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_measurements_column ON measurements (column_name, parameter);
+CREATE INDEX IF NOT EXISTS ix_measurements_parameter ON measurements (parameter);
+"""
+
+# Функция для подключения к реестру без автоматического открытия транзакций
+def connect(registry_path):
+    return sqlite3.connect(registry_path, isolation_level=None)
+
+# Функция для проверки, включено ли сводное хранилище (создана ли таблица measurements)
+def is_enabled(registry_path):
+    connection = connect(registry_path)
+    try:
+        return connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'measurements'").fetchone() is not None
+    finally:
+        connection.close()
+
+# Функция для копирования строк отчета в сводную таблицу вместо ранее скопированных.
+# Копирование выполняется внутри SQLite (INSERT ... SELECT из присоединенного файла отчета)
+def copy_report(connection, report_id, db_path):
+    connection.execute("ATTACH DATABASE ? AS source", (db_path,))
+    try:
+        columns = [row[1] for row in connection.execute("PRAGMA source.table_info(new_table)")]
+        connection.execute("BEGIN")
+        try:
+            connection.execute("DELETE FROM measurements WHERE report_id = ?", (report_id,))
+            if columns:
+                parameter = quote(columns[0])
+                for column in columns[1:]:
+                    connection.execute(
+                        f"INSERT INTO measurements (report_id, row_id, column_name, parameter, value) "
+                        f"SELECT ?, rowid, ?, {parameter}, {quote(column)} FROM source.new_table "
+                        f"WHERE {quote(column)} IS NOT NULL", (report_id, column))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.execute("DETACH DATABASE source")
+
+# Функция для обновления строк отчета в сводной таблице, если хранилище включено
+def sync_report(registry_path, report_id, db_path):
+    if not is_enabled(registry_path):
+        return
+    connection = connect(registry_path)
+    try:
+        copy_report(connection, report_id, db_path)
+    finally:
+        connection.close()
+
+# Функция для удаления строк отчета из сводной таблицы
+def remove_report(registry_path, report_id):
+    if not is_enabled(registry_path):
+        return
+    connection = connect(registry_path)
+    try:
+        connection.execute("DELETE FROM measurements WHERE report_id = ?", (report_id,))
+    finally:
+        connection.close()
+
+# Функция для переноса всех существующих отчетов в сводную таблицу (включает режим сводного хранилища).
+# Повторный запуск безопасен: строки каждого отчета заменяются, строки архивных отчетов (см. rkot.maintenance)
+# остаются прежними. Возвращает (отчетов, строк)
+def migrate(registry_path, progress=None):
+    connection = connect(registry_path)
+    try:
+        connection.executescript(SCHEMA)
+        reports = connection.execute("SELECT id, db_path, archive_path FROM reports ORDER BY id").fetchall()
+        migrated = 0
+        for done, (report_id, db_path, archive_path) in enumerate(reports, start=1):
+            if db_path and os.path.exists(db_path):
+                copy_report(connection, report_id, db_path)
+                migrated += 1
+            elif not archive_path:
+                connection.execute("DELETE FROM measurements WHERE report_id = ?", (report_id,))
+            if progress:
+                progress(done, len(reports))
+        # Строки удаленных из реестра отчетов
+        connection.execute("DELETE FROM measurements WHERE report_id NOT IN (SELECT id FROM reports)")
+        row_count = connection.execute("SELECT COUNT(*) FROM measurements").fetchone()[0]
+    finally:
+        connection.close()
+    return migrated, row_count
+
+# Функция для выборки значений по всем отчетам одним запросом.
+# Все фильтры необязательны, parameter ищется как подстрока названия показателя
+def query_measurements(registry_path, column_name=None, parameter=None, federal_district=None,
+                       control_location=None):
+    conditions, params = [], []
+    if column_name:
+        conditions.append("m.column_name = ?")
+        params.append(column_name)
+    if parameter:
+        conditions.append("m.parameter LIKE ?")
+        params.append(f"%{parameter}%")
+    if federal_district:
+        conditions.append("r.federal_district = ?")
+        params.append(federal_district)
+    if control_location:
+        conditions.append("r.control_location = ?")
+        params.append(control_location)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = connect(registry_path)
+    try:
+        return connection.execute(
+            "SELECT r.id, r.federal_district, r.control_location, r.control_period, "
+            "m.parameter, m.column_name, m.value "
+            f"FROM measurements m JOIN reports r ON r.id = m.report_id {where} "
+            "ORDER BY r.id, m.row_id", params).fetchall()
+    finally:
+        connection.close()
@@ -0,0 +1,157 @@
+# Сводка показателей по нескольким отчетам: средние, минимальные и максимальные значения показателей
+# по операторам связи, федеральным округам, местам и периодам контроля.
+# Агрегаты каждого отчета (сумма, количество, минимум и максимум значений по показателю и оператору)
+# вычисляются запросом к таблице отчета один раз и хранятся в таблице report_kpis в reports.db.
+# Сводка по любому набору отчетов строится агрегатным запросом к report_kpis без чтения файлов отчетов.
+# Агрегаты отчета удаляются при изменении его данных и вычисляются заново при следующем обращении
+import os
+import sqlite3
+
+from rkot import diagnostics, schema
+from rkot.schema import quote
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_kpis (
+    report_id INTEGER NOT NULL,
+    parameter TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    value_sum REAL NOT NULL,
+    value_count INTEGER NOT NULL,
+    value_min REAL,
+    value_max REAL,
+    PRIMARY KEY (report_id, parameter, operator)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_report_kpis_parameter ON report_kpis (parameter, operator);
+CREATE TABLE IF NOT EXISTS report_kpis_state (report_id INTEGER PRIMARY KEY);
+"""
+
+# Измерения, по которым группируется сводка, и соответствующие им выражения запроса
+GROUPS = {
+    'operator': "k.operator",
+    'district': "r.federal_district",
+    'location': "r.control_location",
+    'period': "r.control_period",
+}
+# Порядок значений измерений в сводке (период упорядочивается по дате начала, а не по тексту)
+GROUP_ORDER = {
+    'operator': "k.operator",
+    'district': "r.federal_district",
+    'location': "r.control_location",
+    'period': "MIN(r.period_start)",
+}
+
+# Функция для подключения к реестру и создания таблиц агрегатов, если они не существуют
+def connect(registry_path):
+    connection = sqlite3.connect(registry_path, isolation_level=None)
+    connection.executescript(SCHEMA)
+    return connection
+
+# Функция для вычисления агрегатов отчета по его таблице (через присоединенный файл отчета).
+# Показатель - первый столбец таблицы, операторы - столбцы с числовыми значениями. Для таблиц,
+# загруженных до появления схемы протокола, имя оператора берется из первой текстовой ячейки столбца
+def compute_report(connection, report_id, db_path):
+    attached = bool(db_path) and os.path.exists(db_path)
+    if attached:
+        connection.execute("ATTACH DATABASE ? AS source", (db_path,))
+    try:
+        connection.execute("BEGIN")
+        try:
+            connection.execute("DELETE FROM report_kpis WHERE report_id = ?", (report_id,))
+            if attached:
+                insert_report(connection, report_id)
+            connection.execute("INSERT OR REPLACE INTO report_kpis_state (report_id) VALUES (?)", (report_id,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        if attached:
+            connection.execute("DETACH DATABASE source")
+
+# Функция для записи агрегатов таблицы source.new_table в report_kpis
+def insert_report(connection, report_id):
+    columns = connection.execute("PRAGMA source.table_info(new_table)").fetchall()
+    if not columns:
+        return
+    parameter = f"TRIM({quote(columns[0][1])})"
+    for _, name, decltype, *_ in columns[1:]:
+        value = quote(name)
+        operator = name
+        if decltype != schema.VALUE_TYPE:
+            label = connection.execute(f"SELECT {value} FROM source.new_table WHERE typeof({value}) = 'text' "
+                                       f"ORDER BY rowid LIMIT 1").fetchone()
+            operator = label[0].strip() if label and label[0].strip() else name
+        connection.execute(
+            f"INSERT INTO report_kpis (report_id, parameter, operator, value_sum, value_count, value_min, value_max) "
+            f"SELECT ?, {parameter}, ?, SUM({value}), COUNT({value}), MIN({value}), MAX({value}) "
+            f"FROM source.new_table WHERE typeof({value}) IN ('integer', 'real') AND {parameter} <> '' "
+            f"GROUP BY {parameter}", (report_id, operator))
+
+# Функция для вычисления агрегатов отчетов, для которых они еще не вычислены или были сброшены.
+# report_ids - ограничение набора отчетов (по умолчанию все отчеты реестра). Возвращает количество
+# обработанных отчетов
+def ensure_reports(connection, report_ids=None):
+    query = "SELECT id, db_path FROM reports WHERE id NOT IN (SELECT report_id FROM report_kpis_state)"
+    reports = connection.execute(query).fetchall()
+    if report_ids is not None:
+        report_ids = set(report_ids)
+        reports = [report for report in reports if report[0] in report_ids]
+    if reports:
+        with diagnostics.span("Расчет показателей сводки") as info:
+            for report_id, db_path in reports:
+                compute_report(connection, report_id, db_path)
+            info["rows"] = len(reports)
+    return len(reports)
+
+# Функция для сброса агрегатов отчета после изменения или удаления его данных
+def invalidate_report(registry_path, report_id):
+    connection = connect(registry_path)
+    try:
+        connection.execute("BEGIN")
+        connection.execute("DELETE FROM report_kpis WHERE report_id = ?", (report_id,))
+        connection.execute("DELETE FROM report_kpis_state WHERE report_id = ?", (report_id,))
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+
+# Функция для получения списка показателей, по которым есть числовые значения в выбранных отчетах
+def parameters(registry_path, report_ids=None):
+    connection = connect(registry_path)
+    try:
+        ensure_reports(connection, report_ids)
+        where, params = report_filter(report_ids)
+        return [row[0] for row in connection.execute(
+            f"SELECT DISTINCT k.parameter FROM report_kpis k {where} ORDER BY k.parameter", params)]
+    finally:
+        connection.close()
+
+# Функция для построения сводки по выбранным отчетам.
+# by - измерения группировки из GROUPS, parameter - показатель (по умолчанию все показатели).
+# Возвращает имена столбцов и строки: значения измерений, показатель, среднее, минимум, максимум,
+# количество значений и количество отчетов
+def summarize(registry_path, by=('operator',), parameter=None, report_ids=None):
+    connection = connect(registry_path)
+    try:
+        ensure_reports(connection, report_ids)
+        where, params = report_filter(report_ids)
+        if parameter is not None:
+            where += (" AND " if where else "WHERE ") + "k.parameter = ?"
+            params.append(parameter)
+        keys = ", ".join(GROUPS[group] for group in by)
+        order = ", ".join(GROUP_ORDER[group] for group in by)
+        cursor = connection.execute(
+            f"SELECT {keys}, k.parameter, SUM(k.value_sum) / SUM(k.value_count), MIN(k.value_min), "
+            f"MAX(k.value_max), SUM(k.value_count), COUNT(DISTINCT k.report_id) "
+            f"FROM report_kpis k JOIN reports r ON r.id = k.report_id {where} "
+            f"GROUP BY {keys}, k.parameter ORDER BY k.parameter, {order}", params)
+        columns = list(by) + ['parameter', 'mean', 'min', 'max', 'count', 'reports']
+        return columns, cursor.fetchall()
+    finally:
+        connection.close()
+
+# Функция для получения условия отбора агрегатов по набору отчетов
+def report_filter(report_ids):
+    if report_ids is None:
+        return "", []
+    report_ids = list(report_ids)
+    return f"WHERE k.report_id IN ({', '.join('?' * len(report_ids))})", report_ids
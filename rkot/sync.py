@@ -0,0 +1,20 @@
+# Обновление производных данных отчета (сводное хранилище, поисковый индекс, агрегаты сводки,
+# статистика таблицы) после загрузки, сохранения или удаления отчета
+from rkot import search, stats, store, summary
+
+# Функция, вызываемая после добавления отчета или изменения его данных.
+# data_changed=False означает, что изменились только поля реестра, а таблица отчета осталась прежней.
+# report_stats - статистика таблицы, вычисленная при загрузке (иначе вычисляется по файлу отчета)
+def report_updated(registry_path, report_id, db_path, data_changed=True, report_stats=None):
+    if data_changed:
+        store.sync_report(registry_path, report_id, db_path)
+        summary.invalidate_report(registry_path, report_id)
+        stats.update_report(registry_path, report_id, db_path, report_stats)
+    search.index_report(registry_path, report_id)
+
+# Функция, вызываемая после удаления отчета из реестра
+def report_removed(registry_path, report_id):
+    store.remove_report(registry_path, report_id)
+    summary.invalidate_report(registry_path, report_id)
+    stats.remove_report(registry_path, report_id)
+    search.remove_report(registry_path, report_id)
@@ -0,0 +1,281 @@
+# Проверка протоколов РКОТ при загрузке, до добавления отчета в реестр.
+# Проверки выполняются по правилам над целыми столбцами пачки строк: соответствие заголовка таблицы схеме
+# протокола (см. rkot.schema) и наличие названий операторов, числа в столбцах значений и их допустимые
+# диапазоны (доли в процентах от 0 до 100, оценки MOS от 1 до 5, количества, время и скорость не отрицательные),
+# повторяющиеся строки и время проведения контроля в шапке протокола (даты разбираются, начало не позже
+# окончания, окончание не в будущем). Пачки строк, приведенные к типам столбцов, проверяются в отдельном
+# потоке, пока загрузка читает следующие строки книги и записывает пачку в БД, поэтому проверка почти
+# не увеличивает время загрузки. Результат - построчный отчет (номер строки листа, столбец, правило,
+# значение, сообщение), который сохраняется в папке data/validation в формате CSV.
+# Отчет с ошибками загружается, в строгом режиме (RKOT_STRICT_VALIDATION=1) загрузка отклоняется
+from collections import namedtuple
+import csv
+import datetime
+import hashlib
+import math
+import os
+import queue
+import re
+import threading
+
+from rkot import schema
+from rkot.diagnostics import log
+
+STRICT = bool(int(os.environ.get('RKOT_STRICT_VALIDATION', 0)))  # Отклонять протоколы с ошибками
+MAX_ISSUES = 1000   # Количество замечаний, сохраняемых в отчете (счетчики учитывают все замечания)
+QUEUE_BATCHES = 4   # Количество пачек строк, ожидающих проверки (ограничивает расход памяти)
+
+ERROR = 'error'     # Уровень замечания: данные протокола неверны
+WARNING = 'warning' # Уровень замечания: данные сомнительны
+SEVERITY_NAMES = {ERROR: "ошибка", WARNING: "предупреждение"}
+
+PERIOD_LABEL = "время проведения контроля"  # Начало строки шапки с периодом контроля
+PERIOD_PATTERN = re.compile(r"с\s*(\S+)\s*по\s*(\S+)")
+PERIOD_DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+# Допустимые диапазоны значений: признак в названии показателя, минимум, максимум (проверяются по порядку:
+# в протоколах встречаются количества с единицей измерения [%] и доли, в названии которых упоминается MOS)
+VALUE_RANGES = (
+    ("доля", 0.0, 100.0),
+    ("количество", 0.0, math.inf),
+    ("mos", 1.0, 5.0),
+)
+DEFAULT_RANGE = (0.0, math.inf)
+
+# Замечание проверки: номер строки листа (с единицы, None - замечание к файлу), столбец, правило, уровень,
+# значение ячейки и текст сообщения
+Issue = namedtuple('Issue', 'row column rule severity value message')
+
+# Результат проверки: замечания (не более MAX_ISSUES), количество ошибок и предупреждений, период контроля
+# из шапки протокола (начало, окончание) или None и путь к файлу отчета проверки
+ValidationReport = namedtuple('ValidationReport', 'issues error_count warning_count period path',
+                              defaults=(None,))
+
+# Исключение для отклонения протокола с ошибками в строгом режиме
+class ValidationFailed(ValueError):
+    pass
+
+# Функция для получения пути к папке отчетов проверки в папке данных
+def validation_folder(data_folder):
+    return os.path.join(data_folder, "validation")
+
+# Функция для получения пути к файлу отчета проверки загружаемого файла БД
+def report_path(data_folder, db_path):
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(validation_folder(data_folder), f"{name}.csv")
+
+# Функция для записи отчета проверки в CSV файл (разделитель ";", как при выгрузке в CSV)
+def write_report(report, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(["Строка", "Столбец", "Правило", "Уровень", "Значение", "Сообщение"])
+        for issue in report.issues:
+            writer.writerow(["" if issue.row is None else issue.row, issue.column or "", issue.rule,
+                             SEVERITY_NAMES[issue.severity], "" if issue.value is None else issue.value,
+                             issue.message])
+    return report._replace(path=path)
+
+# Функция для получения строки с итогом проверки (для журнала, командной строки и окна программы)
+def describe(report):
+    text = f"ошибок: {report.error_count}, предупреждений: {report.warning_count}"
+    if report.path:
+        text += f", отчет: {report.path}"
+    return text
+
+# Функция для разбора даты из шапки протокола. Возвращает date или None
+def parse_date(text):
+    for date_format in PERIOD_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text.strip(" .,;"), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+# Функция для получения дайджеста строки для поиска повторяющихся строк. Хранится 16 байт на строку
+# вместо самой строки, совпадение дайджестов BLAKE2 разных строк практически исключено
+def row_digest(row):
+    return hashlib.blake2b(repr(tuple(row)).encode("utf-8"), digest_size=16).digest()
+
+# Функция для получения допустимого диапазона значений показателя по его названию
+def value_range(parameter):
+    if isinstance(parameter, str):
+        name = schema.normalize_name(parameter)
+        for marker, low, high in VALUE_RANGES:
+            if marker in name:
+                return low, high
+    return DEFAULT_RANGE
+
+# Проверка строк протокола, выполняемая в отдельном потоке параллельно с загрузкой.
+# Загрузка вызывает start() после чтения заголовка, передает приведенные пачки строк через функцию,
+# полученную от checked(), и по окончании записи вызывает finish(); stop() вызывается всегда
+class Validator:
+    def __init__(self, today=None, max_issues=MAX_ISSUES):
+        self.today = today or datetime.date.today()
+        self.max_issues = max_issues
+        self.counts = {ERROR: 0, WARNING: 0}
+        self.file_issues = [] # Замечания с номерами строк листа
+        self.row_issues = []  # Замечания с номерами строк таблицы (с нуля), номера листа - в finish()
+        self.period = None
+        self.report = None
+        self.thread = None
+        self.failure = None
+
+    # Метод для учета замечания. position - номер строки таблицы (с нуля), row - номер строки листа
+    def add(self, rule, severity, message, column=None, value=None, position=None, row=None):
+        self.counts[severity] += 1
+        if len(self.file_issues) + len(self.row_issues) >= self.max_issues:
+            return
+        if position is None:
+            self.file_issues.append(Issue(row, column, rule, severity, value, message))
+        else:
+            self.row_issues.append((position, Issue(None, column, rule, severity, value, message)))
+
+    # Метод для проверки шапки и заголовка таблицы и запуска потока проверки строк.
+    # preamble - строки листа до заголовка, header_columns - имена столбцов по строке заголовка,
+    # columns и types - имена и объявленные типы столбцов таблицы (после переноса названий операторов)
+    def start(self, preamble, header_columns, columns, types):
+        self.header_row = len(preamble) + 1
+        self.columns, self.types = columns, types
+        self.check_period(preamble)
+        self.check_schema(preamble, header_columns)
+        self.value_indexes = [i for i, column_type in enumerate(types or []) if column_type == schema.VALUE_TYPE]
+        self.ranges = {}         # Диапазоны значений по названию показателя
+        self.seen = {}           # Дайджест строки (см. row_digest) -> номер первой такой строки таблицы
+        self.header_found = bool(types)
+        self.queue = queue.Queue(QUEUE_BATCHES)
+        self.thread = threading.Thread(target=self.run, name="rkot-validation", daemon=True)
+        self.thread.start()
+
+    # Метод для получения функции приведения пачки строк, которая передает пачку на проверку
+    def checked(self, normalize=None):
+        def normalize_and_check(batch):
+            if normalize:
+                batch = normalize(batch)
+            self.queue.put(batch)
+            return batch
+        return normalize_and_check
+
+    def run(self):
+        position = 0
+        while (batch := self.queue.get()) is not None:
+            if self.failure is None:
+                try:
+                    self.check_batch(batch, position)
+                except Exception as e:
+                    self.failure = e # Ошибка проверки не прерывает загрузку
+            position += len(batch)
+
+    # Метод для остановки потока проверки (после окончания или прерывания загрузки)
+    def stop(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    # Метод для завершения проверки после записи таблицы. row_numbers - номера строк листа для строк,
+    # прочитанных из книги, row_count - количество записанных строк (строка названий операторов
+    # могла не попасть в таблицу). Возвращает ValidationReport
+    def finish(self, row_numbers, row_count):
+        self.stop()
+        if self.failure is not None:
+            log.warning("Проверка протокола не завершена: %s", self.failure)
+        skipped = len(row_numbers) - row_count
+        issues = self.file_issues + [issue._replace(row=row_numbers[position + skipped])
+                                     for position, issue in self.row_issues]
+        self.report = ValidationReport(issues, self.counts[ERROR], self.counts[WARNING], self.period)
+        return self.report
+
+    # Метод для проверки времени проведения контроля в шапке протокола
+    def check_period(self, preamble):
+        for number, row in enumerate(preamble, start=1):
+            text = " ".join(str(value) for value in row if value is not None)
+            if not schema.normalize_name(text).startswith(PERIOD_LABEL):
+                continue
+            match = PERIOD_PATTERN.search(text[len(PERIOD_LABEL):])
+            start, end = (parse_date(match.group(1)), parse_date(match.group(2))) if match else (None, None)
+            if start is None or end is None:
+                self.add('period', ERROR, "Не удалось разобрать даты времени проведения контроля",
+                         value=text, row=number)
+            elif start > end:
+                self.add('period', ERROR, "Начало периода контроля позже его окончания", value=text, row=number)
+            elif end > self.today:
+                self.add('period', ERROR, "Окончание периода контроля в будущем", value=text, row=number)
+            else:
+                self.period = (start, end)
+            return
+        self.add('period', WARNING, "В шапке протокола не указано время проведения контроля")
+
+    # Метод для проверки заголовка таблицы и строки названий операторов
+    def check_schema(self, preamble, header_columns):
+        if not self.types:
+            for number, row in enumerate(preamble, start=1):
+                if schema.protocol_types(row) is not None:
+                    self.add('header', ERROR, f"Заголовок таблицы протокола в строке {number}, "
+                                              f"ожидается строка {self.header_row}", row=number)
+                    return
+            self.add('header', ERROR, "Таблица не похожа на таблицу протокола РКОТ: первые столбцы заголовка "
+                                      f"должны быть \"{schema.PROTOCOL_COLUMNS[0]}\" и \"{schema.PROTOCOL_COLUMNS[1]}\"",
+                     row=self.header_row)
+            return
+        if self.columns == header_columns:
+            self.add('columns', ERROR, "Нет строки названий операторов под заголовком таблицы",
+                     row=self.header_row + 1)
+            return
+        for column, column_type in zip(self.columns, self.types):
+            if column_type == schema.VALUE_TYPE and column.startswith("Unnamed: "):
+                self.add('columns', WARNING, "Столбец значений без названия оператора", column=column,
+                         row=self.header_row + 1)
+
+    # Метод для проверки пачки строк. Правила применяются к столбцам целиком, для каждого найденного
+    # замечания вычисляется номер строки таблицы (position - номер первой строки пачки)
+    def check_batch(self, batch, position):
+        if not self.types:
+            if not self.header_found:
+                self.find_header(batch, position)
+            return
+        columns = list(zip(*batch))
+        ranges = [self.ranges.get(parameter) or self.ranges.setdefault(parameter, value_range(parameter))
+                  for parameter in columns[0]]
+        for i in self.value_indexes:
+            bad = [offset for offset, (value, (low, high)) in enumerate(zip(columns[i], ranges))
+                   if value is not None and (type(value) is not float or not low <= value <= high)]
+            for offset in bad:
+                value = columns[i][offset]
+                if type(value) is not float:
+                    self.add('number', ERROR, "Значение не является числом", self.columns[i], value,
+                             position + offset)
+                else:
+                    low, high = ranges[offset]
+                    message = f"Значение меньше {low:g}" if value < low else f"Значение больше {high:g}"
+                    self.add('range', ERROR, message, self.columns[i], value, position + offset)
+
+        # Повторяющиеся строки: учитываются только строки со значениями
+        filled = [any(value is not None for value in values)
+                  for values in zip(*(columns[i] for i in self.value_indexes))]
+        for offset, row in enumerate(batch):
+            if not filled[offset]:
+                continue
+            first = self.seen.setdefault(row_digest(row), position + offset)
+            if first != position + offset:
+                self.add('duplicate', WARNING, f"Строка повторяет строку таблицы {first + 1}", self.columns[0],
+                         row[0], position + offset)
+
+    # Метод для поиска заголовка протокола в строках таблицы (заголовок ниже ожидаемой строки).
+    # Строки приведены к ширине ожидаемой строки заголовка, поэтому сравниваются только имеющиеся ячейки
+    def find_header(self, batch, position):
+        expected = [schema.normalize_name(name) for name in schema.PROTOCOL_COLUMNS]
+        for offset, row in enumerate(batch):
+            values = [schema.normalize_name(value) for value in row[:len(expected)] if value is not None]
+            if values and values == expected[:len(values)]:
+                self.header_found = True
+                self.add('header', ERROR, f"Заголовок таблицы протокола ниже строки {self.header_row}",
+                         position=position + offset)
+                return
+
+# Функция для проверки протокола без загрузки в реестр (строки читаются пачками, таблица не записывается).
+# Возвращает ValidationReport
+def validate_file(excel_path, today=None):
+    from rkot.ingest import excel_to_sqlite
+
+    validator = Validator(today)
+    excel_to_sqlite(excel_path, None, validator=validator)
+    return validator.report
@@ -0,0 +1,79 @@
+# Общие фикстуры тестов: временная папка данных, файлы отчетов и главное окно без экрана
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Окна создаются без графической среды
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rkot import schema  # noqa: E402
+from rkot.ingest import write_table  # noqa: E402
+
+# Столбцы таблицы протокола с названиями операторов, содержащими кавычки и другие спецсимволы
+PROTOCOL_COLUMNS = list(schema.PROTOCOL_COLUMNS) + ['ПАО "МТС"', "ООО «Т2 Мобайл»", "Beeline; MegaFon"]
+PROTOCOL_ROWS = [
+    ["Доля обрывов голосовых соединений [%]", "не более 5", 0.5, 1.5, 2.5],
+    ["Среднее время доставки SMS сообщений [сек]", None, 6.1, 7.2, None],
+]
+
+OPERATORS = ["Beeline", "MegaFon RUS", "MTS-RUS"]
+PERIOD_LINE = "Время проведения контроля:  с 03.06.2019 по 23.07.2019"
+
+# Функция для создания excel файла в формате протокола РКОТ: 16 строк шапки, строка заголовка таблицы,
+# строка названий операторов и строки показателей. preamble - строки шапки (по умолчанию с периодом контроля)
+def make_protocol(path, rows=PROTOCOL_ROWS, preamble=None, operators=OPERATORS):
+    import openpyxl
+
+    if preamble is None:
+        preamble = [["Приложение № 1 к Отчету"]] + [[None]] * 11 + [[PERIOD_LINE]] + [[None]] * 3
+    book = openpyxl.Workbook()
+    sheet = book.active
+    for row in preamble:
+        sheet.append(row)
+    sheet.append(list(schema.PROTOCOL_COLUMNS) + ["Значение"] * len(operators))
+    sheet.append(["Показатели качества услуг подвижной радиотелефонной связи", None] + operators)
+    for row in rows:
+        sheet.append(list(row))
+    book.save(path)
+    return str(path)
+
+# Папка данных во временном каталоге (RKOT_DATA_DIR), пустой реестр создается при первом обращении
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    folder = tmp_path / "data"
+    folder.mkdir()
+    monkeypatch.setenv("RKOT_DATA_DIR", str(folder))
+    return str(folder)
+
+# Функция для создания файла БД отчета с таблицей протокола
+def make_report_db(db_path, columns=PROTOCOL_COLUMNS, rows=PROTOCOL_ROWS):
+    types = schema.protocol_types(columns)
+    write_table(db_path, columns, iter([list(row) for row in rows]), len(rows), types)
+    return db_path
+
+# Сессия реестра в папке данных
+@pytest.fixture
+def session(data_folder):
+    from rkot.registry import Session, open_registry
+
+    engine = open_registry(data_folder)
+    session = Session(bind=engine)
+    yield session
+    session.close()
+    engine.dispose()
+
+# Главное окно программы (требуется PyQt6)
+@pytest.fixture
+def main_window(data_folder):
+    pytest.importorskip("PyQt6")
+    from PyQt6.QtWidgets import QApplication
+    import main
+
+    main.app = QApplication.instance() or QApplication([])
+    main.full_window_width, main.full_window_height = 800, 600
+    window = main.MainWindow()
+    yield window
+    window.session.close()
+    window.engine.dispose()
+    window.close()
@@ -0,0 +1,57 @@
+# Загрузка протоколов в окне программы
+import datetime
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt6")
+from PyQt6.QtCore import QThreadPool  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from rkot.registry import ReportData  # noqa: E402
+
+from conftest import PROTOCOL_ROWS, make_protocol  # noqa: E402
+
+# Загрузки, начатые в одну секунду, записываются в разные файлы отчетов
+def test_concurrent_imports_use_distinct_files(main_window, tmp_path):
+    first = make_protocol(tmp_path / "first.xlsx")
+    second = make_protocol(tmp_path / "second.xlsx", rows=[row[:2] + [42.0, 43.0, 44.0] for row in PROTOCOL_ROWS])
+    results = []
+    main_window.excel_to_db(first, results.append)
+    main_window.excel_to_db(second, results.append)
+    QThreadPool.globalInstance().waitForDone()
+    QApplication.processEvents()
+
+    assert len(results) == 2
+    assert len({result.db_path for result in results}) == 2
+    for result in results:
+        main_window.register_report(result, datetime.datetime.now())
+    reports = main_window.session.query(ReportData).all()
+    assert len(reports) == 2
+    values = set()
+    for report in reports:
+        assert os.path.exists(report.db_path)
+        connection = sqlite3.connect(report.db_path)
+        try:
+            values.add(connection.execute('SELECT "Beeline" FROM new_table WHERE rowid = 2').fetchone()[0])
+        finally:
+            connection.close()
+    assert values == {0.5, 42.0}
+
+# Отчет, загруженный из пустой строки ("Добавить"), занимает ее место в таблице
+def test_import_replaces_placeholder_row(main_window, tmp_path):
+    model = main_window.registry_model
+    main_window.add_row()
+    main_window.add_row()
+    assert model.rowCount() == 2
+    placeholder = model.rows[0]
+    results = []
+    main_window.excel_to_db(make_protocol(tmp_path / "protocol.xlsx"), results.append)
+    QThreadPool.globalInstance().waitForDone()
+    QApplication.processEvents()
+
+    main_window.register_report(results[0], datetime.datetime.now(), placeholder)
+    assert model.rowCount() == 2
+    assert [model.report_id(row) is None for row in range(model.rowCount())] == [True, False]
+    assert all(row is not placeholder for row in model.rows)
@@ -0,0 +1,131 @@
+# Атомарная запись файлов отчетов, удаление и архивирование отчетов, проверка папки данных
+import os
+import sqlite3
+
+import pytest
+
+from rkot import integrity, schema
+from rkot.registry import ReportData
+
+from conftest import PROTOCOL_COLUMNS, PROTOCOL_ROWS, make_report_db
+
+# Функция для добавления файла отчета в реестр
+def register(session, db_path):
+    report = ReportData(file_name=os.path.basename(db_path), db_path=db_path)
+    session.add(report)
+    session.commit()
+    return report
+
+# Функция для чтения значений первого столбца оператора из файла отчета
+def values(db_path):
+    connection = sqlite3.connect(db_path)
+    try:
+        query = f"SELECT {schema.quote(PROTOCOL_COLUMNS[2])} FROM new_table ORDER BY rowid"
+        return [row[0] for row in connection.execute(query)]
+    finally:
+        connection.close()
+
+# Функция для создания файла отметок "другого процесса" со списком файлов
+def write_marks(folder, names, pid=999999):
+    path = os.path.join(folder, f"{integrity.LOCK_PREFIX}{pid}_0000{integrity.LOCK_SUFFIX}")
+    with open(path, "wb") as file:
+        file.write("".join(name + "\n" for name in names).encode("utf-8"))
+    return path
+
+def test_place_database(data_folder):
+    db_path = os.path.join(data_folder, "database_placed.db")
+    partial = make_report_db(integrity.partial_path(db_path))
+    integrity.place_database(partial, db_path)
+    assert not os.path.exists(partial)
+    assert values(db_path) == [0.5, 6.1]
+
+def test_collect_garbage_removes_orphans(session, data_folder):
+    kept = register(session, make_report_db(os.path.join(data_folder, "database_kept.db")))
+    orphans = [make_report_db(os.path.join(data_folder, name))
+               for name in ("database_orphan.db", "database_partial.db.partial", "database_gone.db.deleted")]
+    register(session, os.path.join(data_folder, "database_missing.db"))
+
+    assert integrity.collect_garbage(session, data_folder) == (len(orphans), 1)
+    assert os.path.exists(kept.db_path)
+    assert not any(os.path.exists(path) for path in orphans)
+    assert [report.id for report in session.query(ReportData)] == [kept.id]
+
+# Файлы, записываемые этим процессом, не удаляются, сколько бы ни длилась загрузка
+def test_collect_garbage_keeps_files_being_written(session, data_folder):
+    db_path = integrity.new_db_path(data_folder)
+    make_report_db(integrity.partial_path(db_path))
+    written = make_report_db(integrity.new_db_path(data_folder))
+    old = os.path.getmtime(written) - 24 * 3600
+    os.utime(written, (old, old))
+
+    assert integrity.collect_garbage(session, data_folder) == (0, 0)
+    assert os.path.exists(integrity.partial_path(db_path))
+    assert os.path.exists(written)
+
+# Отметки другого процесса учитываются, пока он держит блокировку, и удаляются после его завершения
+def test_collect_garbage_honours_other_process_marks(session, data_folder):
+    db_path = make_report_db(os.path.join(data_folder, "database_other.db"))
+    marks = write_marks(data_folder, [os.path.basename(db_path)])
+    with open(marks, "rb") as file:
+        assert integrity.lock_file(file)
+        assert integrity.collect_garbage(session, data_folder) == (0, 0)
+        assert os.path.exists(db_path)
+        integrity.unlock_file(file)
+
+    assert integrity.collect_garbage(session, data_folder) == (1, 0)
+    assert not os.path.exists(db_path)
+    assert not os.path.exists(marks)
+
+# Отчет, добавленный в реестр во время проверки (после просмотра папки), не удаляется
+def test_collect_garbage_registration_race(session, data_folder, monkeypatch):
+    db_path = make_report_db(os.path.join(data_folder, "database_race.db"))
+    protected_paths = integrity.protected_paths
+
+    def register_during_check(marks):
+        register(session, db_path)
+        return protected_paths(marks)
+
+    monkeypatch.setattr(integrity, "protected_paths", register_during_check)
+    assert integrity.collect_garbage(session, data_folder) == (0, 0)
+    assert os.path.exists(db_path)
+
+def test_delete_report(session, data_folder):
+    report = register(session, make_report_db(os.path.join(data_folder, "database_deleted.db")))
+    db_path = report.db_path
+    integrity.delete_report(session, report)
+    assert not os.path.exists(db_path)
+    assert not os.path.exists(db_path + integrity.DELETED_SUFFIX)
+    assert session.query(ReportData).count() == 0
+
+# Если удаление записи не зафиксировано, файл отчета возвращается на место
+def test_delete_report_restores_file(session, data_folder, monkeypatch):
+    report = register(session, make_report_db(os.path.join(data_folder, "database_restored.db")))
+    db_path = report.db_path
+
+    def fail():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(session, "commit", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        integrity.delete_report(session, report)
+    monkeypatch.undo()
+    assert values(db_path) == [0.5, 6.1]
+    assert not os.path.exists(db_path + integrity.DELETED_SUFFIX)
+    assert session.query(ReportData).count() == 1
+
+def test_archive_and_restore(session, data_folder):
+    pytest.importorskip("pyarrow")
+    from rkot import maintenance
+
+    report = register(session, make_report_db(os.path.join(data_folder, "database_archived.db")))
+    db_path = report.db_path
+    maintenance.archive_report(session, report, data_folder)
+    assert not os.path.exists(db_path)
+    assert os.path.exists(report.archive_path)
+    assert integrity.collect_garbage(session, data_folder) == (0, 0)
+
+    archive_path = report.archive_path
+    assert maintenance.restore_report(session, report) == len(PROTOCOL_ROWS)
+    assert report.archive_path is None
+    assert not os.path.exists(archive_path)
+    assert values(db_path) == [0.5, 6.1]
@@ -0,0 +1,67 @@
+# Имена столбцов с кавычками и другими спецсимволами во всех запросах к таблице отчета
+import csv
+import os
+
+import pytest
+
+from rkot import columnar, schema, search, stats, store, summary, sync
+from rkot.export import export_reports_table, report_source
+from rkot.registry import ReportData, registry_path
+
+from conftest import PROTOCOL_COLUMNS, PROTOCOL_ROWS, make_report_db
+
+@pytest.mark.parametrize("name, expected", [
+    ("Beeline", '"Beeline"'),
+    ('ПАО "МТС"', '"ПАО ""МТС"""'),
+    ('"', '""""'),
+    ("a; DROP TABLE new_table; --", '"a; DROP TABLE new_table; --"'),
+])
+def test_quote(name, expected):
+    assert schema.quote(name) == expected
+
+# Отчет со столбцами операторов, имена которых содержат кавычки, зарегистрированный в реестре
+@pytest.fixture
+def report(session, data_folder):
+    db_path = make_report_db(os.path.join(data_folder, "database_quoted.db"))
+    report = ReportData(file_name=os.path.basename(db_path), db_path=db_path, federal_district="УФО")
+    session.add(report)
+    session.commit()
+    return report
+
+def test_report_table_keeps_names(report):
+    assert [column[0] for column in stats.compute(report.db_path).columns] == PROTOCOL_COLUMNS
+
+def test_derived_tables(report, data_folder):
+    registry = registry_path(data_folder)
+    store.migrate(registry)
+    indexed = search.ensure_index(registry) # False, если SQLite собран без FTS5
+    sync.report_updated(registry, report.id, report.db_path)
+
+    columns = stats.column_stats(registry, report.id)
+    assert [column[0] for column in columns] == PROTOCOL_COLUMNS
+    assert columns[2][1:5] == (2, 0, 0.5, 6.1)
+
+    measurements = store.query_measurements(registry, column_name='ПАО "МТС"')
+    assert [row[-1] for row in measurements] == [0.5, 6.1]
+
+    _, rows = summary.summarize(registry)
+    assert {row[0] for row in rows} == set(PROTOCOL_COLUMNS[2:])
+    if indexed:
+        assert search.search(registry, "МТС") == {report.id}
+
+def test_export_csv(report, tmp_path):
+    path = str(tmp_path / "reports.csv")
+    export_reports_table([report_source(report)], path)
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        header, *rows = list(csv.reader(file, delimiter=";"))
+    for name in PROTOCOL_COLUMNS:
+        assert name in header
+    assert len(rows) == len(PROTOCOL_ROWS)
+
+def test_parquet_round_trip(report, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "report.parquet")
+    assert columnar.sqlite_to_parquet(report.db_path, path) == len(PROTOCOL_ROWS)
+    columns, _, total, rows = columnar.read_parquet(path)
+    assert columns == PROTOCOL_COLUMNS
+    assert [row[2:] for row in rows] == [row[2:] for row in PROTOCOL_ROWS]
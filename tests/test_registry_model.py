@@ -0,0 +1,36 @@
+# Модель реестра главного окна: подсказка со статистикой столбцов отчета
+import os
+
+import pytest
+
+pytest.importorskip("PyQt6")
+from PyQt6.QtCore import Qt  # noqa: E402
+
+from rkot import stats, sync  # noqa: E402
+from rkot.registry import ReportData  # noqa: E402
+
+from conftest import PROTOCOL_COLUMNS, make_report_db  # noqa: E402
+
+# Статистика читается из реестра один раз и перечитывается после перезагрузки модели
+def test_stats_tooltip_is_cached(main_window, data_folder, monkeypatch):
+    db_path = make_report_db(os.path.join(data_folder, "database_tooltip.db"))
+    report = ReportData(file_name=os.path.basename(db_path), db_path=db_path)
+    main_window.session.add(report)
+    main_window.session.commit()
+    sync.report_updated(main_window.registry_path, report.id, db_path)
+
+    model = main_window.registry_model
+    model.reload()
+    calls = []
+    column_stats = stats.column_stats
+    monkeypatch.setattr(stats, "column_stats", lambda *args: calls.append(args) or column_stats(*args))
+
+    index = model.index(model.row_of(report.id), 6)
+    tooltip = model.data(index, Qt.ItemDataRole.ToolTipRole)
+    assert tooltip.splitlines()[2].startswith(f"{PROTOCOL_COLUMNS[2]}: значений 2, пустых 0")
+    assert model.data(index, Qt.ItemDataRole.ToolTipRole) == tooltip
+    assert len(calls) == 1
+
+    model.reload()
+    model.data(model.index(model.row_of(report.id), 6), Qt.ItemDataRole.ToolTipRole)
+    assert len(calls) == 2
@@ -0,0 +1,34 @@
+# Сохранение изменений отчета в окне просмотра
+import os
+import sqlite3
+
+from rkot.engines import release_engine
+from rkot.registry import ReportData
+
+from conftest import PROTOCOL_COLUMNS, make_report_db
+
+# Измененные ячейки столбцов, имена которых содержат кавычки, записываются в файл отчета
+def test_save_edited_cells_in_quoted_columns(main_window, data_folder):
+    import main
+
+    db_path = make_report_db(os.path.join(data_folder, "database_quoted.db"))
+    report = ReportData(file_name=os.path.basename(db_path), db_path=db_path)
+    main_window.session.add(report)
+    main_window.session.commit()
+
+    dialog = main.DataViewDialog(db_path, report.id, main_window.engine, main_window)
+    model = dialog.model
+    for column in (2, 3, 4):
+        assert model.setData(model.index(0, column), "9,5")
+    dialog.saveData()
+    release_engine(db_path)
+
+    connection = sqlite3.connect(db_path)
+    try:
+        names = [row[1] for row in connection.execute("PRAGMA table_info(new_table)")]
+        values = connection.execute("SELECT * FROM new_table ORDER BY rowid").fetchall()
+    finally:
+        connection.close()
+    assert names == PROTOCOL_COLUMNS
+    assert values[0][2:] == (9.5, 9.5, 9.5)
+    assert values[1][2:] == (6.1, 7.2, None)
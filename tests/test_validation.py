@@ -0,0 +1,93 @@
+# Правила проверки протоколов РКОТ (rkot.validation)
+import datetime
+
+import pytest
+
+from rkot import ingest, validation
+
+from conftest import PERIOD_LINE, PROTOCOL_ROWS, make_protocol
+
+TODAY = datetime.date(2024, 1, 1)
+FIRST_ROW = 19 # Первая строка показателей: 16 строк шапки, заголовок, строка названий операторов
+
+# Функция для проверки протокола, созданного по аргументам make_protocol
+def validate(tmp_path, **protocol):
+    return validation.validate_file(make_protocol(tmp_path / "protocol.xlsx", **protocol), today=TODAY)
+
+# Функция для получения замечаний отчета проверки: {(правило, строка листа, столбец)}
+def issues(report):
+    return {(issue.rule, issue.row, issue.column) for issue in report.issues}
+
+# Функция для получения шапки протокола с заданной строкой периода контроля
+def preamble(period_line):
+    return [["Приложение № 1 к Отчету"]] + [[None]] * 11 + [[period_line]] + [[None]] * 3
+
+def test_valid_protocol(tmp_path):
+    report = validate(tmp_path)
+    assert report.issues == []
+    assert report.period == (datetime.date(2019, 6, 3), datetime.date(2019, 7, 23))
+
+# Проверка без загрузки не записывает таблицу
+def test_validate_file_does_not_write_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "write_table", pytest.fail)
+    assert validate(tmp_path).error_count == 0
+
+def test_values(tmp_path):
+    rows = [
+        ["Доля обрывов голосовых соединений [%]", None, "н/д", 150, "abc"],
+        ["Средняя оценка MOS", None, 4.2, 0.5, None],
+        ["Количество тестовых соединений", None, -1, 10, "1 000"],
+    ]
+    report = validate(tmp_path, rows=rows)
+    assert issues(report) == {
+        ("range", FIRST_ROW, "MegaFon RUS"),
+        ("number", FIRST_ROW, "MTS-RUS"),
+        ("range", FIRST_ROW + 1, "MegaFon RUS"),
+        ("range", FIRST_ROW + 2, "Beeline"),
+    }
+    assert report.error_count == 4
+
+def test_duplicate_rows(tmp_path):
+    report = validate(tmp_path, rows=PROTOCOL_ROWS + [PROTOCOL_ROWS[0]])
+    assert issues(report) == {("duplicate", FIRST_ROW + 2, "Параметры качества")}
+    assert (report.error_count, report.warning_count) == (0, 1)
+
+# Строки с равным hash() (в CPython hash(-1.0) == hash(-2.0)) не считаются повторяющимися
+def test_duplicate_rows_compared_exactly(tmp_path):
+    rows = [["Время доставки [сек]", None, -1.0, 1.0, 1.0], ["Время доставки [сек]", None, -2.0, 1.0, 1.0]]
+    assert hash(tuple(rows[0])) == hash(tuple(rows[1]))
+    report = validate(tmp_path, rows=rows)
+    assert "duplicate" not in {issue.rule for issue in report.issues}
+
+def test_missing_operator_row(tmp_path):
+    report = validate(tmp_path, operators=[None, None, None])
+    assert ("columns", FIRST_ROW - 1, None) in issues(report)
+
+# Заголовок таблицы выше или ниже ожидаемой строки
+@pytest.mark.parametrize("shift, row", [(-1, 16), (1, 18)])
+def test_shifted_header(tmp_path, shift, row):
+    lines = preamble(PERIOD_LINE)
+    lines = lines[:shift] if shift < 0 else lines + [["Таблица 1"]] * shift
+    report = validate(tmp_path, preamble=lines)
+    assert {issue.rule for issue in report.issues} == {"header"}
+    assert report.issues[-1].row == row
+
+@pytest.mark.parametrize("period_line, severity", [
+    ("Время проведения контроля: с 23.07.2019 по 03.06.2019", validation.ERROR),
+    ("Время проведения контроля: с 03.06.2023 по 23.07.2024", validation.ERROR),
+    ("Время проведения контроля: июнь 2019", validation.ERROR),
+    ("Приложение", validation.WARNING),
+])
+def test_period(tmp_path, period_line, severity):
+    report = validate(tmp_path, preamble=preamble(period_line))
+    assert [(issue.rule, issue.severity) for issue in report.issues] == [("period", severity)]
+    assert report.period is None
+
+# В строгом режиме протокол с ошибками не загружается, файл отчета не создается
+def test_strict_import(tmp_path, data_folder):
+    excel_path = make_protocol(tmp_path / "protocol.xlsx", rows=[["Доля [%]", None, 101, 1, 1]])
+    db_path = tmp_path / "data" / "database_strict.db"
+    with pytest.raises(validation.ValidationFailed):
+        ingest.import_file(excel_path, str(db_path), strict=True)
+    assert not db_path.exists()
+    assert not (tmp_path / "data" / "database_strict.db.partial").exists()